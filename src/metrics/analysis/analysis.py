@@ -1,7 +1,9 @@
-from typing import List, Union
+from typing import Any, List, Optional, Tuple, Union
+import numpy as np
 import pandas as pd
 
 from metrics.analysis.experiment import Experiment
+from metrics.analysis.group_index import GroupIndex
 from metrics.analysis.simulation import Simulation
 from metrics.feature.continuous_feature import ContinuousFeature
 from metrics.feature.discrete_feature import DiscreteFeature
@@ -78,69 +80,179 @@ class Analysis:
         sample_data = sample.sample_data(sample_locations, simulation_data)
         return sample_data
 
-    def calculate_features(self, data: pd.DataFrame) -> pd.DataFrame:
+    def calculate_features(
+        self,
+        data: Union[pd.DataFrame, GroupIndex],
+        extracted_data: Optional[
+            Tuple[str, str, List[Tuple[int, pd.DataFrame, pd.DataFrame]]]
+        ] = None,
+    ) -> pd.DataFrame:
         """
         Calculate statistical comparison of features between a sample and the simulation population.
 
+        Reference and observation data are extracted once and shared by all features.
+
         Parameters
         ----------
         data :
-            Simulation data.
+            Simulation data, or group index over simulation data.
+        extracted_data :
+            Reference and observation data extracted with ``extract_data``, or None to extract
+            them from the simulation data.
 
         Returns
         -------
         :
-            Stats data calculated with the given features.
+            Stats data calculated with the given features, with missing values as null.
         """
-        stats_df = pd.concat(
-            [self.calculate_feature(data, feature) for feature in self.features],
+        if extracted_data is None:
+            extracted_data = self.extract_data(data)
+
+        return pd.concat(
+            [self.calculate_feature(data, feature, extracted_data) for feature in self.features],
             axis=0,
         )
-        return stats_df.fillna(value="NULL")
 
-    def calculate_feature(
-        self, data: pd.DataFrame, feature: Union[ContinuousFeature, DiscreteFeature]
-    ) -> pd.DataFrame:
+    def extract_data(
+        self, data: Union[pd.DataFrame, GroupIndex]
+    ) -> Tuple[str, str, List[Tuple[int, pd.DataFrame, pd.DataFrame]]]:
         """
-        Calculate statistical comparison of a feature between a sample and the simulation
-        population.
+        Extract reference and observation data of each seed from simulation data.
+
+        Rows of the analysis key and time points are sliced from a group index over key, time,
+        and seed, which is built from the simulation data if it is not given.
 
         Parameters
         ----------
         data :
-            Simulation data.
-        feature :
-            Feature object.
+            Simulation data, or group index over simulation data.
+
+        Returns
+        -------
+        :
+            Reference key, observation key, and the seed, reference data, and observation data
+            of each seed in the reference data.
         """
+        index = data if isinstance(data, GroupIndex) else GroupIndex(data)
         object_dict: dict = self.experiment.create_experiment_dict()
 
-        reference: Union[SampleNeedle, SamplePunch, Simulation] = object_dict["reference"]
-        observation: Union[SampleNeedle, SamplePunch, Simulation] = object_dict["observation"]
+        reference = self.extract_source_data(
+            self.key, object_dict["reference"], index, self.timepoint
+        )
+        observation = self.extract_source_data(
+            self.key, object_dict["observation"], index, self.observation_timepoint
+        )
+
+        return self.pair_seed_data(reference, observation)
+
+    @staticmethod
+    def extract_source_data(
+        key: str,
+        source: Union[SampleNeedle, SamplePunch, Simulation],
+        index: GroupIndex,
+        timepoint: float,
+        sample_locations: Optional[List[tuple]] = None,
+    ) -> Tuple[str, GroupIndex, Tuple[Any, ...]]:
+        """
+        Extract data of a sample or simulation at a time point, for splitting by seed.
+
+        Parameters
+        ----------
+        key :
+            Simulation key.
+        source :
+            Sample or simulation object.
+        index :
+            Group index over key, time, and seed of the simulation data.
+        timepoint :
+            Time point of the data.
+        sample_locations :
+            Sample coordinates, or None to select them from the sample object.
+
+        Returns
+        -------
+        :
+            Source key, and a group index and key and time prefix whose next group column is
+            the seed.
+        """
+        prefix: Tuple[Any, ...] = (key, timepoint)
+
+        if isinstance(source, (SampleNeedle, SamplePunch)):
+            simulation_data = index.get_group(*prefix)
+
+            if sample_locations is None:
+                sample_data = Analysis.extract_sample_data(source, simulation_data)
+            else:
+                sample_data = source.sample_data(sample_locations, simulation_data)
 
-        simulation_data = data[(data["time"] == self.timepoint) & (data["key"] == self.key)]
-        if isinstance(reference, (SampleNeedle, SamplePunch)):
-            reference_data = self.extract_sample_data(reference, simulation_data)
-            reference_key = reference.get_sample_key()
-        elif isinstance(reference, Simulation):
-            reference_data = simulation_data
-            reference_key = "simulation"
+            prefix = ()
+            return source.get_sample_key(), GroupIndex(sample_data, ["seed"]), prefix
+
+        return "simulation", index, prefix
+
+    @staticmethod
+    def pair_seed_data(
+        reference: Tuple[str, GroupIndex, Tuple[Any, ...]],
+        observation: Tuple[str, GroupIndex, Tuple[Any, ...]],
+    ) -> Tuple[str, str, List[Tuple[int, pd.DataFrame, pd.DataFrame]]]:
+        """
+        Pair reference and observation data of each seed in the reference data.
+
+        Parameters
+        ----------
+        reference :
+            Reference data extracted with ``extract_source_data``.
+        observation :
+            Observation data extracted with ``extract_source_data``.
 
-        observation_simulation_data = data[
-            (data["time"] == self.observation_timepoint) & (data["key"] == self.key)
+        Returns
+        -------
+        :
+            Reference key, observation key, and the seed, reference data, and observation data
+            of each seed in the reference data.
+        """
+        reference_key, reference_index, reference_prefix = reference
+        observation_key, observation_index, observation_prefix = observation
+
+        seed_data = [
+            (
+                seed,
+                reference_seed_data,
+                observation_index.get_group(*observation_prefix, seed),
+            )
+            for seed, reference_seed_data in reference_index.iter_groups(*reference_prefix)
         ]
-        if isinstance(observation, (SampleNeedle, SamplePunch)):
-            observation_data = self.extract_sample_data(observation, observation_simulation_data)
-            observation_key = observation.get_sample_key()
-        elif isinstance(observation, Simulation):
-            observation_data = observation_simulation_data
-            observation_key = "simulation"
 
-        analysis_data = []
+        return reference_key, observation_key, seed_data
 
-        for seed, reference_seed_data in reference_data.groupby("seed"):
-            observation_seed_data = observation_data[observation_data["seed"] == seed]
+    def calculate_feature(
+        self,
+        data: Union[pd.DataFrame, GroupIndex],
+        feature: Union[ContinuousFeature, DiscreteFeature],
+        extracted_data: Optional[
+            Tuple[str, str, List[Tuple[int, pd.DataFrame, pd.DataFrame]]]
+        ] = None,
+    ) -> pd.DataFrame:
+        """
+        Calculate statistical comparison of a feature between a sample and the simulation
+        population.
 
-            data_list = [
+        Parameters
+        ----------
+        data :
+            Simulation data, or group index over simulation data.
+        feature :
+            Feature object.
+        extracted_data :
+            Reference and observation data extracted with ``extract_data``, or None to extract
+            them from the simulation data.
+        """
+        if extracted_data is None:
+            extracted_data = self.extract_data(data)
+
+        reference_key, observation_key, seed_data = extracted_data
+        data_lists = [
+            [
                 self.experiment.comparison_group,
                 self.key,
                 seed,
@@ -150,15 +262,62 @@ class Analysis:
                 observation_key,
                 feature.name,
             ]
+            for seed, _, _ in seed_data
+        ]
 
-            output_data = feature.write_feature_data(
-                data_list, observation_seed_data, reference_seed_data
+        if all(
+            feature.name in reference_seed_data.columns
+            and feature.name in observation_seed_data.columns
+            for _, reference_seed_data, observation_seed_data in seed_data
+        ):
+            observation_values, observation_offsets = self.group_values(
+                [observation_seed_data for _, _, observation_seed_data in seed_data], feature.name
+            )
+            reference_values, reference_offsets = self.group_values(
+                [reference_seed_data for _, reference_seed_data, _ in seed_data], feature.name
             )
-            analysis_data.extend(output_data)
+            analysis_data = feature.write_grouped_feature_data(
+                data_lists,
+                observation_values,
+                observation_offsets,
+                reference_values,
+                reference_offsets,
+            )
+        else:
+            analysis_data = []
+
+            for data_list, (_, reference_seed_data, observation_seed_data) in zip(
+                data_lists, seed_data
+            ):
+                output_data = feature.write_feature_data(
+                    data_list, observation_seed_data, reference_seed_data
+                )
+                analysis_data.extend(output_data)
 
         columns = [analysis_feature.name for analysis_feature in self.get_feature_list()]
         return pd.DataFrame(analysis_data, columns=columns)
 
+    @staticmethod
+    def group_values(frames: List[pd.DataFrame], name: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Concatenate values of a column of grouped data.
+
+        Parameters
+        ----------
+        frames :
+            Data of each group.
+        name :
+            Name of the column.
+
+        Returns
+        -------
+        :
+            Concatenated values of all groups, and offsets of the groups in the values.
+        """
+        values = [frame[name].to_numpy() for frame in frames]
+        offsets = np.concatenate([[0], np.cumsum([len(group_values) for group_values in values])])
+        return np.concatenate(values) if values else np.empty(0), offsets.astype(np.int64)
+
     @staticmethod
     def get_feature_list() -> List[Feature]:
         """
@@ -178,9 +337,63 @@ class Analysis:
             Feature("reference_key", "TEXT", False),
             Feature("obervation_key", "TEXT", False),
             Feature("feature", "TEXT", False),
-            Feature("category", "TEXT", False),
-            Feature("pvalue", "REAL", False),
-            Feature("divergence", "REAL", False),
+            Feature("category", "TEXT", True),
+            Feature("pvalue", "REAL", True),
+            Feature("divergence", "REAL", True),
         ]
 
         return feature_columns
+
+    @staticmethod
+    def get_data_columns(features: List[Union[ContinuousFeature, DiscreteFeature]]) -> List[str]:
+        """
+        Return names of the simulation columns used to calculate the given features.
+
+        Rows are grouped by key, time, and seed, and samples are extracted by coordinate, so
+        these columns are always included.
+
+        Parameters
+        ----------
+        features :
+            Feature objects.
+
+        Returns
+        -------
+        :
+            List of simulation column names.
+        """
+        columns = ["key", "seed", "time", "coordinate"]
+        columns.extend(feature.name for feature in features if feature.name not in columns)
+        return columns
+
+    @staticmethod
+    def get_index_list() -> List[Tuple[str, ...]]:
+        """
+        Return a list of column tuples to index.
+
+        Statistics are selected by feature, comparison group, and time points, or by key and
+        seed.
+
+        Returns
+        -------
+        :
+           List of indexed column tuples.
+        """
+        return [
+            ("feature", "comparison_group", "reference_time", "obervation_time"),
+            ("key", "seed"),
+        ]
+
+    @staticmethod
+    def get_primary_key() -> Tuple[str, ...]:
+        """
+        Return the columns that uniquely identify a statistic.
+
+        Statistics have no unique key, so the table cannot be clustered.
+
+        Returns
+        -------
+        :
+           Empty tuple.
+        """
+        return ()
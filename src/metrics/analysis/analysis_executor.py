@@ -0,0 +1,285 @@
+from typing import Any, Dict, List, Optional, Tuple, Type, Union
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory, util
+from types import TracebackType
+
+import numpy as np
+import pandas as pd
+
+from metrics.analysis.analysis_plan import AnalysisPlan
+from metrics.analysis.group_index import GroupIndex
+
+
+class AnalysisExecutor:
+    """
+    Executor for the statistics jobs of an analysis plan in a process pool.
+
+    Simulation data of each time point are sorted by key, time, and seed, and their columns are
+    copied once into shared memory blocks (categorical columns as codes). Worker processes
+    attach to the blocks without copying, extract the plan sources once per time point, and
+    calculate one (comparison, feature) job per task. Results are gathered in plan order, so
+    the output does not depend on the number of workers.
+
+    With one worker, jobs are run in the calling process with ``AnalysisPlan.run``.
+
+    Attributes
+    ----------
+    plan : AnalysisPlan
+        Plan of extractions and statistics jobs.
+    workers : int
+        Number of worker processes.
+    executor : Optional[ProcessPoolExecutor]
+        Process pool, or None if the executor is not open or has one worker.
+    """
+
+    worker_plan: Optional[AnalysisPlan] = None
+    """Optional[AnalysisPlan]: Plan of the worker process."""
+
+    worker_state: Dict[str, Any] = {}
+    """dict: Attached data, group index, and extractions of the worker process."""
+
+    def __init__(self, plan: AnalysisPlan, workers: int = 1):
+        self.plan = plan
+        self.workers = workers
+        self.executor: Optional[ProcessPoolExecutor] = None
+
+    def __enter__(self) -> "AnalysisExecutor":
+        if self.workers > 1:
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=AnalysisExecutor.init_worker,
+                initargs=(self.plan,),
+            )
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def __str__(self) -> str:
+        attributes = [("workers", self.workers)]
+
+        attribute_strings = [f"{key:10} = {value}" for key, value in attributes]
+        string = "\n\t".join(attribute_strings)
+        return "ANALYSIS EXECUTOR\n\t" + string
+
+    def run(self, data: pd.DataFrame, timepoint: float) -> List[Tuple[int, pd.DataFrame]]:
+        """
+        Run the statistics jobs of a time point.
+
+        Parameters
+        ----------
+        data :
+            Simulation data at the time point.
+        timepoint :
+            Time point of the simulation data.
+
+        Returns
+        -------
+        :
+            Order of each job in the plan, and the stats data calculated by the job.
+        """
+        index = GroupIndex(data)
+        jobs = self.plan.jobs.get(timepoint, [])
+
+        if self.executor is None or not jobs:
+            return self.plan.run(index, timepoint)
+
+        num_features = len(self.plan.features)
+        tasks = [
+            (position, feature_index)
+            for position in range(len(jobs))
+            for feature_index in range(num_features)
+        ]
+        blocks, descriptor = self.share_data(index.data)
+
+        try:
+            frames = list(
+                self.executor.map(
+                    AnalysisExecutor.run_task,
+                    [descriptor] * len(tasks),
+                    [timepoint] * len(tasks),
+                    [position for position, _ in tasks],
+                    [feature_index for _, feature_index in tasks],
+                )
+            )
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+        return [
+            (order, pd.concat(frames[position * num_features : (position + 1) * num_features]))
+            for position, (order, _) in enumerate(jobs)
+        ]
+
+    @staticmethod
+    def share_data(
+        data: pd.DataFrame,
+    ) -> Tuple[List[shared_memory.SharedMemory], List[Tuple[str, str, str, int, Optional[list]]]]:
+        """
+        Copy columns of data into shared memory blocks.
+
+        Categorical columns are stored as codes, and object columns are stored as codes of
+        categories created from their values.
+
+        Parameters
+        ----------
+        data :
+            Data to share.
+
+        Returns
+        -------
+        :
+            Shared memory blocks, and the column name, block name, dtype, length, and categories
+            (or None) of each column.
+        """
+        blocks = []
+        descriptor = []
+
+        for name, series in data.items():
+            categories = None
+
+            if series.dtype == object:
+                series = series.astype("category")
+
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                categories = series.cat.categories.tolist()
+                values = series.cat.codes.to_numpy()
+            else:
+                values = series.to_numpy()
+
+            block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+            np.ndarray(values.shape, values.dtype, buffer=block.buf)[:] = values
+
+            blocks.append(block)
+            descriptor.append((name, block.name, values.dtype.str, len(values), categories))
+
+        return blocks, descriptor
+
+    @staticmethod
+    def attach_data(
+        descriptor: List[Tuple[str, str, str, int, Optional[list]]]
+    ) -> Tuple[List[shared_memory.SharedMemory], pd.DataFrame]:
+        """
+        Attach to data shared with ``share_data`` without copying the columns.
+
+        Parameters
+        ----------
+        descriptor :
+            Column name, block name, dtype, length, and categories (or None) of each column.
+
+        Returns
+        -------
+        :
+            Attached shared memory blocks, and the data backed by the blocks.
+        """
+        blocks = []
+        columns = {}
+
+        for name, block_name, dtype, length, categories in descriptor:
+            block = shared_memory.SharedMemory(name=block_name)
+            values: Union[np.ndarray, pd.Categorical] = np.ndarray(
+                (length,), np.dtype(dtype), buffer=block.buf
+            )
+
+            if categories is not None:
+                values = pd.Categorical.from_codes(values, categories)
+
+            blocks.append(block)
+            columns[name] = values
+
+        # With copy=False, pandas keeps one block per column instead of consolidating columns
+        # of the same dtype into a new (copied) block, so every column stays backed by its
+        # shared memory block.
+        return blocks, pd.DataFrame(columns, copy=False)
+
+    @staticmethod
+    def init_worker(plan: Optional[AnalysisPlan]) -> None:
+        """
+        Initialize a worker process with the analysis plan.
+
+        Attached blocks are released when the worker process exits.
+
+        Parameters
+        ----------
+        plan :
+            Plan of extractions and statistics jobs, or None to reset the worker.
+        """
+        AnalysisExecutor.worker_plan = plan
+        AnalysisExecutor.worker_state = {}
+
+        if plan is not None:
+            util.Finalize(None, AnalysisExecutor.release_worker, exitpriority=0)
+
+    @staticmethod
+    def release_worker() -> None:
+        """
+        Close the shared memory blocks attached by the worker process and clear its state.
+
+        Called when the worker process exits, and when tasks of the next time point arrive.
+        """
+        blocks = AnalysisExecutor.worker_state.get("blocks", [])
+        AnalysisExecutor.worker_state.clear()
+
+        for block in blocks:
+            block.close()
+
+    @staticmethod
+    def run_task(
+        descriptor: List[Tuple[str, str, str, int, Optional[list]]],
+        timepoint: float,
+        position: int,
+        feature_index: int,
+    ) -> pd.DataFrame:
+        """
+        Calculate one feature of one statistics job in a worker process.
+
+        The shared data, group index, and extractions are kept for the tasks of the same time
+        point, and released when a task of the next time point arrives.
+
+        Parameters
+        ----------
+        descriptor :
+            Column name, block name, dtype, length, and categories (or None) of each column.
+        timepoint :
+            Time point of the simulation data.
+        position :
+            Position of the job in the plan jobs of the time point.
+        feature_index :
+            Index of the feature in the plan features.
+
+        Returns
+        -------
+        :
+            Stats data calculated for the feature.
+        """
+        plan = AnalysisExecutor.worker_plan
+        state = AnalysisExecutor.worker_state
+        key = descriptor[0][1] if descriptor else ""
+
+        if plan is None:
+            raise ValueError("Worker process is not initialized with an analysis plan.")
+
+        if state.get("key") != key:
+            AnalysisExecutor.release_worker()
+
+            blocks, data = AnalysisExecutor.attach_data(descriptor)
+            index = GroupIndex(data)
+            state.update(
+                key=key,
+                blocks=blocks,
+                index=index,
+                extracted=plan.extract(index, timepoint),
+            )
+
+        _, experiment = plan.jobs[timepoint][position]
+        feature = plan.features[feature_index]
+
+        return plan.run_job(state["index"], timepoint, experiment, state["extracted"], [feature])
@@ -0,0 +1,195 @@
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from metrics.analysis.analysis import Analysis
+from metrics.analysis.experiment import Experiment
+from metrics.analysis.group_index import GroupIndex
+from metrics.analysis.simulation import Simulation
+from metrics.feature.continuous_feature import ContinuousFeature
+from metrics.feature.discrete_feature import DiscreteFeature
+from metrics.sample.sample_needle import SampleNeedle
+from metrics.sample.sample_punch import SamplePunch
+
+
+class AnalysisPlan:
+    """
+    Plan of unique sample extractions and statistics jobs for analysis of a simulation.
+
+    The analysis configuration is expanded once into the time points where reference and
+    observation times match, the unique samples of all comparisons, the unique extractions of
+    each sample at each time point, and the unique statistics jobs of each comparison at each
+    time point. Each job depends on the extractions of its reference and observation, so every
+    sample is created, located, and extracted once per time point, regardless of how many
+    comparisons it appears in.
+
+    Attributes
+    ----------
+    simulation : Simulation
+        Simulation object.
+    features : List[Union[ContinuousFeature, DiscreteFeature]]
+        Feature objects.
+    timepoints : List[float]
+        Unique time points in both the reference and observation time points.
+    experiments : List[Experiment]
+        Experiments of unique comparisons.
+    sources : Dict[str, Union[SampleNeedle, SamplePunch, Simulation]]
+        Sample or simulation objects, keyed by comparison name.
+    locations : Dict[str, List[tuple]]
+        Sample coordinates, keyed by comparison name of the sample.
+    extractions : Dict[float, List[str]]
+        Comparison names of sources extracted at each time point.
+    jobs : Dict[float, List[Tuple[int, Experiment]]]
+        Order and experiment of statistics jobs at each time point.
+    """
+
+    def __init__(
+        self,
+        simulation: Simulation,
+        features: List[Union[ContinuousFeature, DiscreteFeature]],
+        timepoints: List[float],
+        observation_timepoints: List[float],
+        samples: Dict[str, dict],
+        comparisons: dict,
+    ):
+        self.simulation = simulation
+        self.features = features
+
+        observation_set = set(observation_timepoints)
+        self.timepoints = list(
+            dict.fromkeys(timepoint for timepoint in timepoints if timepoint in observation_set)
+        )
+
+        unique_comparisons = {
+            tuple(comparison.items()): comparison for comparison in comparisons.values()
+        }
+        self.experiments = [
+            Experiment(comparison, samples, simulation)
+            for comparison in unique_comparisons.values()
+        ]
+
+        self.sources: Dict[str, Union[SampleNeedle, SamplePunch, Simulation]] = {}
+        self.locations: Dict[str, List[tuple]] = {}
+
+        for experiment in self.experiments:
+            names = [name for name in experiment.comparison.values() if name not in self.sources]
+
+            if not names:
+                continue
+
+            roles = {name: name for name in names}
+            objects = Experiment(roles, samples, simulation).create_experiment_dict()
+            self.sources.update(objects)
+
+            for name in names:
+                if isinstance(objects[name], (SampleNeedle, SamplePunch)):
+                    self.locations[name] = objects[name].select_sample_locations()
+
+        self.extractions: Dict[float, List[str]] = {
+            timepoint: list(self.sources) for timepoint in self.timepoints
+        }
+        self.jobs: Dict[float, List[Tuple[int, Experiment]]] = {
+            timepoint: [
+                (experiment_index * len(self.timepoints) + timepoint_index, experiment)
+                for experiment_index, experiment in enumerate(self.experiments)
+            ]
+            for timepoint_index, timepoint in enumerate(self.timepoints)
+        }
+
+    def __str__(self) -> str:
+        attributes = [
+            ("timepoints", self.timepoints),
+            ("sources", list(self.sources)),
+            ("extractions", sum(len(names) for names in self.extractions.values())),
+            ("jobs", sum(len(jobs) for jobs in self.jobs.values())),
+        ]
+
+        attribute_strings = [f"{key:10} = {value}" for key, value in attributes]
+        string = "\n\t".join(attribute_strings)
+        return "ANALYSIS PLAN\n\t" + string
+
+    def run(self, index: GroupIndex, timepoint: float) -> List[Tuple[int, pd.DataFrame]]:
+        """
+        Run the extractions and statistics jobs of a time point.
+
+        Parameters
+        ----------
+        index :
+            Group index over key, time, and seed of the simulation data at the time point.
+        timepoint :
+            Time point of the simulation data.
+
+        Returns
+        -------
+        :
+            Order of each job in the plan, and the stats data calculated by the job.
+        """
+        extracted = self.extract(index, timepoint)
+
+        return [
+            (order, self.run_job(index, timepoint, experiment, extracted))
+            for order, experiment in self.jobs.get(timepoint, [])
+        ]
+
+    def extract(
+        self, index: GroupIndex, timepoint: float
+    ) -> Dict[str, Tuple[str, GroupIndex, Tuple[Any, ...]]]:
+        """
+        Run the extractions of a time point.
+
+        Parameters
+        ----------
+        index :
+            Group index over key, time, and seed of the simulation data at the time point.
+        timepoint :
+            Time point of the simulation data.
+
+        Returns
+        -------
+        :
+            Data extracted with ``Analysis.extract_source_data``, keyed by comparison name.
+        """
+        return {
+            name: Analysis.extract_source_data(
+                self.simulation.key, self.sources[name], index, timepoint, self.locations.get(name)
+            )
+            for name in self.extractions.get(timepoint, [])
+        }
+
+    def run_job(
+        self,
+        index: GroupIndex,
+        timepoint: float,
+        experiment: Experiment,
+        extracted: Dict[str, Tuple[str, GroupIndex, Tuple[Any, ...]]],
+        features: Optional[List[Union[ContinuousFeature, DiscreteFeature]]] = None,
+    ) -> pd.DataFrame:
+        """
+        Run a statistics job of a time point on extracted data.
+
+        Parameters
+        ----------
+        index :
+            Group index over key, time, and seed of the simulation data at the time point.
+        timepoint :
+            Time point of the simulation data.
+        experiment :
+            Experiment of the job.
+        extracted :
+            Data extracted with ``extract``, keyed by comparison name.
+        features :
+            Feature objects to calculate, or None to calculate all features of the plan.
+
+        Returns
+        -------
+        :
+            Stats data calculated by the job.
+        """
+        extracted_data = Analysis.pair_seed_data(
+            extracted[experiment.comparison["reference"]],
+            extracted[experiment.comparison["observation"]],
+        )
+        analysis = Analysis(
+            self.simulation.key, experiment, timepoint, timepoint, features or self.features
+        )
+        return analysis.calculate_features(index, extracted_data)
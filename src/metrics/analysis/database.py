@@ -1,22 +1,59 @@
-from typing import Union
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Type, Union
+from contextlib import contextmanager
+from types import TracebackType
+import itertools
+import logging
+import time
 
 import sqlite3
+import numpy as np
 import pandas as pd
 
 from metrics.analysis.simulation import Simulation
 from metrics.analysis.analysis import Analysis
+from metrics.analysis.database_query import DatabaseQuery
+from metrics.analysis.database_reader import DatabaseReader
+
+logger = logging.getLogger(__name__)
 
 
 class Database:
     """
     Wrapper for interacting with SQLite3 database.
 
+    Each method opens, commits, and closes its own connection by default. Used as a context
+    manager, the database keeps a single connection open until the context exits, and writes
+    made inside a ``transaction()`` block are committed together.
+
     Attributes
     ----------
     file :
         Database file name.
+    connection :
+        Open connection to the database file, or None if each call opens its own connection.
+    transaction_depth :
+        Number of nested transaction blocks currently open.
+    ingesting :
+        True if an ``ingest()`` block is open, False otherwise.
     """
 
+    INGEST_PRAGMAS = {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -262144,
+        "temp_store": "MEMORY",
+    }
+    """dict: PRAGMA settings applied while ingesting data."""
+
+    BATCH_SIZE = 50000
+    """int: Number of rows inserted per batch."""
+
+    CHUNK_SIZE = 100000
+    """int: Number of rows read per chunk when streaming query results."""
+
+    ATTACH_LIMIT = 8
+    """int: Number of shard databases attached at once when merging (SQLite allows 10)."""
+
     def __init__(self, database_file: str):
         if database_file == ":memory:":
             raise AttributeError("Cannot use in-memory database.")
@@ -28,6 +65,32 @@ class Database:
             raise AttributeError("Cannot have space in database name.")
 
         self.file = database_file
+        self.connection: Optional[sqlite3.Connection] = None
+        self.transaction_depth = 0
+        self.ingesting = False
+
+    def __enter__(self) -> "Database":
+        if self.connection is None:
+            self.connection = self.get_connection()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        if self.connection is None:
+            return
+
+        if exc_type is None:
+            self.connection.commit()
+        else:
+            self.connection.rollback()
+
+        self.connection.close()
+        self.connection = None
+        self.transaction_depth = 0
 
     def __str__(self) -> str:
         attributes = [("file", self.file)]
@@ -48,30 +111,187 @@ class Database:
         connection = sqlite3.connect(self.file, uri=True)
         return connection
 
-    def create_table(self, table_name: str, table_spec: Union[Simulation, Analysis]) -> None:
+    @contextmanager
+    def connect(self) -> Iterator[sqlite3.Connection]:
+        """
+        Provide a connection for a single database operation.
+
+        If no connection is open, a new connection is opened, then committed and closed after
+        the operation. Otherwise the open connection is used, and changes are committed after the
+        operation unless a transaction is in progress.
+
+        Returns
+        -------
+        :
+            Connection to the database file.
+        """
+        if self.connection is None:
+            connection = self.get_connection()
+            try:
+                yield connection
+                connection.commit()
+            finally:
+                connection.close()
+            return
+
+        yield self.connection
+
+        if self.transaction_depth == 0:
+            self.connection.commit()
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Group database operations into a single transaction.
+
+        Changes are committed when the outermost transaction block exits, or rolled back if an
+        exception is raised or the block is abandoned (such as by a closed generator). If the
+        database is not already open as a context manager, a connection is kept open for the
+        duration of the block.
+
+        Returns
+        -------
+        :
+            Connection to the database file.
+        """
+        if self.connection is None:
+            with self:
+                with self.transaction() as connection:
+                    yield connection
+            return
+
+        self.transaction_depth += 1
+        completed = False
+
+        try:
+            yield self.connection
+            completed = True
+        finally:
+            self.transaction_depth -= 1
+            if self.transaction_depth == 0 and completed:
+                self.connection.commit()
+            elif self.transaction_depth == 0:
+                self.connection.rollback()
+
+    @contextmanager
+    def ingest(self) -> Iterator[sqlite3.Connection]:
+        """
+        Open a bulk ingest block for high-throughput writes.
+
+        PRAGMA settings that favor write throughput (write-ahead journal, relaxed
+        synchronization, larger page cache) are applied, and all writes in the block are made in
+        a single transaction. The previous settings are restored when the block exits. The
+        number of ingested rows and rows per second are logged.
+
+        Returns
+        -------
+        :
+            Connection to the database file.
+        """
+        if self.connection is None:
+            with self:
+                with self.ingest() as connection:
+                    yield connection
+            return
+
+        cursor = self.connection.cursor()
+        settings = {
+            pragma: cursor.execute(f"PRAGMA {pragma};").fetchone()[0]
+            for pragma in self.INGEST_PRAGMAS
+        }
+
+        for pragma, value in self.INGEST_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {pragma} = {value};")
+
+        self.ingesting = True
+        start = time.perf_counter()
+        num_rows = self.connection.total_changes
+
+        try:
+            with self.transaction() as connection:
+                yield connection
+        finally:
+            self.ingesting = False
+            for pragma, value in settings.items():
+                cursor.execute(f"PRAGMA {pragma} = {value};")
+
+        num_rows = self.connection.total_changes - num_rows
+        elapsed = time.perf_counter() - start
+        logger.info(
+            "Ingested %d rows into %s in %.2f s (%.0f rows/s).",
+            num_rows,
+            self.file,
+            elapsed,
+            num_rows / elapsed if elapsed else 0,
+        )
+
+    def create_table(
+        self,
+        table_name: str,
+        table_spec: Union[Type[Simulation], Type[Analysis]],
+        create_indexes: bool = True,
+        clustered: bool = False,
+    ) -> None:
         """
         Creates table in connected database.
 
+        Indexes of the table specification are created with the table, unless they are deferred
+        to be built with ``create_indexes()`` after the data is loaded. In the clustered layout,
+        rows are stored in order of the primary key of the table specification (``WITHOUT
+        ROWID``), so lookups by key, seed, and time read contiguous pages.
+
         Parameters
         ----------
         table_name :
             The name of the table.
         table_spec :
-            Object specifying the table columns (Simulation or Analysis object).
+            Class specifying the table columns (Simulation or Analysis class).
+        create_indexes :
+            True to create the indexes with the table, False to defer them.
+        clustered :
+            True to store rows clustered by the primary key, False otherwise.
+        """
+        query = DatabaseQuery.make_create_table_query(table_name, table_spec, clustered)
+
+        with self.connect() as connection:
+            cursor = connection.cursor()
+            cursor.execute(query)
+
+        if create_indexes:
+            self.create_indexes(table_name, table_spec, clustered)
+
+    def create_indexes(
+        self,
+        table_name: str,
+        table_spec: Union[Type[Simulation], Type[Analysis]],
+        clustered: bool = False,
+    ) -> None:
+        """
+        Creates indexes of the table specification, if they do not exist.
+
+        Parameters
+        ----------
+        table_name :
+            The name of the table.
+        table_spec :
+            Class specifying the table indexes (Simulation or Analysis class).
+        clustered :
+            True if rows of the table are clustered by the primary key, False otherwise.
         """
-        connection = self.get_connection()
-        cursor = connection.cursor()
-        query = Database.make_create_table_query(table_name, table_spec)
+        queries = DatabaseQuery.make_create_index_queries(table_name, table_spec, clustered)
 
-        cursor.execute(query)
-        connection.commit()
-        connection.close()
+        with self.connect() as connection:
+            cursor = connection.cursor()
+            for query in queries:
+                cursor.execute(query)
 
     def add_dataframe(self, table_name: str, dataframe: pd.DataFrame) -> None:
         """
         Adds data into specified table.
 
-        If table exists, then data is appended to the existing table.
+        If table exists, then data is appended to the existing table. Inside a transaction, the
+        table must already exist and rows are inserted without committing, since ``to_sql``
+        commits on its own.
 
         Parameters
         ----------
@@ -80,118 +300,366 @@ class Database:
         dataframe :
             Data to add to table.
         """
-        connection = self.get_connection()
+        if self.transaction_depth > 0:
+            self.insert_dataframe(table_name, dataframe)
+            return
 
-        dataframe.to_sql(name=table_name, con=connection, if_exists="append", index=False)
+        with self.connect() as connection:
+            dataframe.to_sql(name=table_name, con=connection, if_exists="append", index=False)
 
-        connection.commit()
-        connection.close()
+    def insert_dataframe(
+        self, table_name: str, dataframe: pd.DataFrame, batch_size: Optional[int] = None
+    ) -> None:
+        """
+        Inserts data into an existing table.
+
+        Rows are inserted in batches with a single prepared statement. Missing values, including
+        NaN, are stored as NULL. While ingesting, the progress and rows per second of each batch
+        are logged.
 
-    def load_dataframe(self, table_name: str, key: str) -> pd.DataFrame:
+        Parameters
+        ----------
+        table_name :
+            The name of the table.
+        dataframe :
+            Data to add to table.
+        batch_size :
+            Number of rows inserted per batch, or None to use the default batch size.
+        """
+        query = DatabaseQuery.make_insert_query(table_name, list(dataframe.columns))
+        columns = [
+            series.tolist()
+            if isinstance(series.dtype, np.dtype) and series.dtype.kind in "biuf"
+            else series.astype(object).where(series.notna(), None).tolist()
+            for _, series in dataframe.items()
+        ]
+        rows = zip(*columns)
+        batch_size = batch_size or self.BATCH_SIZE
+
+        num_rows = 0
+        start = time.perf_counter()
+
+        with self.connect() as connection:
+            cursor = connection.cursor()
+            for batch in iter(lambda: list(itertools.islice(rows, batch_size)), []):
+                cursor.executemany(query, batch)
+                num_rows += len(batch)
+
+                if self.ingesting:
+                    elapsed = time.perf_counter() - start
+                    logger.info(
+                        "Inserted %d of %d rows into %s (%.0f rows/s).",
+                        num_rows,
+                        len(dataframe),
+                        table_name,
+                        num_rows / elapsed if elapsed else 0,
+                    )
+
+    def merge(
+        self,
+        shard_files: List[str],
+        table_name: str,
+        table_spec: Union[Type[Simulation], Type[Analysis]],
+        clustered: bool = False,
+        create_indexes: bool = True,
+        ingest: bool = False,
+    ) -> None:
+        """
+        Merge a table from shard databases into this database.
+
+        Shards are attached to the connection and their rows are copied with ``INSERT ...
+        SELECT`` in shard order, within a single transaction for up to ATTACH_LIMIT shards.
+        Shards without the table are skipped. Indexes are built once all rows are merged.
+        Shards can not be attached inside a transaction block, so merges must be made outside
+        of one.
+
+        Parameters
+        ----------
+        shard_files :
+            File paths to the shard database files.
+        table_name :
+            The name of the table.
+        table_spec :
+            Class specifying the table columns (Simulation or Analysis class).
+        clustered :
+            True to store rows clustered by the primary key, False otherwise.
+        create_indexes :
+            True to create the table indexes after merging, False otherwise.
+        ingest :
+            True to merge rows in bulk ingest mode, False otherwise.
+        """
+        if self.connection is None:
+            with self:
+                self.merge(shard_files, table_name, table_spec, clustered, create_indexes, ingest)
+            return
+
+        DatabaseQuery.validate_identifier(table_name)
+        columns = ",".join(feature.name for feature in table_spec.get_feature_list())
+
+        self.create_table(table_name, table_spec, False, clustered)
+
+        for start in range(0, len(shard_files), self.ATTACH_LIMIT):
+            batch = shard_files[start : start + self.ATTACH_LIMIT]
+            aliases = [f"shard_{index}" for index in range(len(batch))]
+            cursor = self.connection.cursor()
+
+            for shard_file, alias in zip(batch, aliases):
+                cursor.execute(f"ATTACH DATABASE ? AS {alias};", (shard_file,))
+
+            try:
+                with self.ingest() if ingest else self.transaction():
+                    for alias in aliases:
+                        exists = cursor.execute(
+                            f"SELECT 1 FROM {alias}.sqlite_master "
+                            "WHERE type = 'table' AND name = ?;",
+                            (table_name,),
+                        ).fetchone()
+
+                        if exists:
+                            cursor.execute(
+                                f"INSERT INTO main.{table_name} ({columns}) "
+                                f"SELECT {columns} FROM {alias}.{table_name};"
+                            )
+            finally:
+                for alias in aliases:
+                    cursor.execute(f"DETACH DATABASE {alias};")
+
+        if create_indexes:
+            with self.ingest() if ingest else self.transaction():
+                self.create_indexes(table_name, table_spec, clustered)
+
+    def load_dataframe(
+        self,
+        table_name: str,
+        key: str,
+        table_spec: Optional[Union[Type[Simulation], Type[Analysis]]] = None,
+        columns: Optional[List[str]] = None,
+    ) -> pd.DataFrame:
         """
         Load data for specified simulation key.
 
+        If a table specification is given, columns are converted to the in-memory dtypes of
+        its features.
+
         Parameters
         ----------
         table_name :
             The name of the table.
         key :
             Simulation key.
+        table_spec :
+            Object specifying the table columns (Simulation or Analysis object).
+        columns :
+            Names of the columns to select, or None to select all columns.
 
         Returns
         -------
         :
             Selected data from the SQLite table.
         """
-        connection = self.get_connection()
-        query = self.make_select_from_query(table_name, key)
-        data = pd.read_sql_query(sql=query, con=connection)
+        return self.load(table_name, {"key": key}, table_spec=table_spec, columns=columns)
+
+    def load(
+        self,
+        table_name: str,
+        filters: Optional[Dict[str, Any]] = None,
+        ranges: Optional[Dict[str, Tuple[Any, Any]]] = None,
+        table_spec: Optional[Union[Type[Simulation], Type[Analysis]]] = None,
+        columns: Optional[List[str]] = None,
+    ) -> pd.DataFrame:
+        """
+        Load rows matching filters on column values.
 
-        connection.commit()
-        connection.close()
-        return data
+        Filters select rows where the column equals the value, or any of the values if a list
+        is given. Ranges select rows where the column is between the lower and upper bounds
+        (inclusive), where a bound of None is open. Values are bound as query parameters, so
+        the filters can use table indexes. Only the given columns are read from the table.
 
-    def delete_data_from_table(self, table_name: str) -> None:
-        """
-        Delete data in specified table if it exists.
+        If a table specification is given, rows are read from the cursor into typed arrays
+        (see ``DatabaseReader.read_cursor``) and columns are converted to the in-memory dtypes
+        of its features. Otherwise, column types are inferred by pandas.
 
         Parameters
         ----------
         table_name :
-            Name of the table.
-        """
-        connection = self.get_connection()
-        cursor = connection.cursor()
-        query = f"DELETE FROM {table_name} WHERE 1=1;"
-
-        cursor.execute(query)
-
-        connection.commit()
-        connection.close()
+            The name of the table.
+        filters :
+            Values or lists of values to select, keyed by column name.
+        ranges :
+            Lower and upper bounds to select, keyed by column name.
+        table_spec :
+            Object specifying the table columns (Simulation or Analysis object).
+        columns :
+            Names of the columns to select, or None to select all columns.
 
-    def drop_table(self, table_name: str) -> None:
+        Returns
+        -------
+        :
+            Selected data from the SQLite table.
         """
-        Drop table.
+        query, parameters = DatabaseQuery.make_select_query(table_name, filters, ranges, columns)
+
+        with self.connect() as connection:
+            if table_spec is None:
+                return pd.read_sql_query(sql=query, con=connection, params=parameters)
+
+            cursor = connection.execute(query, parameters)
+            data = DatabaseReader.read_cursor(cursor, table_spec)
+
+        return DatabaseReader.set_dtypes(data, table_spec)
+
+    def iter_chunks(
+        self,
+        table_name: str,
+        filters: Optional[Dict[str, Any]] = None,
+        ranges: Optional[Dict[str, Tuple[Any, Any]]] = None,
+        table_spec: Optional[Union[Type[Simulation], Type[Analysis]]] = None,
+        columns: Optional[List[str]] = None,
+        chunk_size: Optional[int] = None,
+        order_by: Optional[List[str]] = None,
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Iterate through chunks of rows matching filters on column values.
+
+        Rows are selected as in ``load``, but are read from the cursor a chunk at a time, so
+        peak memory is bounded by the chunk size rather than the size of the result.
 
         Parameters
         ----------
         table_name :
-            Name of the table.
-        """
-        connection = self.get_connection()
-        cursor = connection.cursor()
-
-        query = f"DROP TABLE IF EXISTS {table_name};"
-        cursor.execute(query)
-
-        connection.commit()
-        connection.close()
+            The name of the table.
+        filters :
+            Values or lists of values to select, keyed by column name.
+        ranges :
+            Lower and upper bounds to select, keyed by column name.
+        table_spec :
+            Class specifying the table columns (Simulation or Analysis class).
+        columns :
+            Names of the columns to select, or None to select all columns.
+        chunk_size :
+            Number of rows per chunk, defaults to CHUNK_SIZE.
+        order_by :
+            Names of the columns to order rows by, or None for table order.
 
-    @staticmethod
-    def make_create_table_query(table_name: str, table_spec: Union[Simulation, Analysis]) -> str:
+        Returns
+        -------
+        :
+            Iterator of selected data chunks from the SQLite table.
         """
-        Return query string that creates the SQLite table.
+        query, parameters = DatabaseQuery.make_select_query(
+            table_name, filters, ranges, columns, order_by
+        )
+
+        chunk_size = chunk_size or self.CHUNK_SIZE
+
+        with self.connect() as connection:
+            if table_spec is None:
+                yield from pd.read_sql_query(
+                    sql=query, con=connection, params=parameters, chunksize=chunk_size
+                )
+                return
+
+            cursor = connection.execute(query, parameters)
+
+            while True:
+                chunk = DatabaseReader.read_cursor(cursor, table_spec, chunk_size)
+
+                if chunk.empty:
+                    break
+
+                yield DatabaseReader.set_dtypes(chunk, table_spec)
+
+    def iter_groups(
+        self,
+        table_name: str,
+        group_by: List[str],
+        filters: Optional[Dict[str, Any]] = None,
+        ranges: Optional[Dict[str, Tuple[Any, Any]]] = None,
+        table_spec: Optional[Union[Type[Simulation], Type[Analysis]]] = None,
+        columns: Optional[List[str]] = None,
+        chunk_size: Optional[int] = None,
+    ) -> Iterator[Tuple[Tuple[Any, ...], pd.DataFrame]]:
+        """
+        Iterate through groups of rows with the same values in the group columns.
+
+        Rows are streamed in chunks ordered by the group columns (for example, seed and time),
+        and each group is yielded once all of its rows have been read. Peak memory is bounded
+        by the chunk size plus the size of the largest group.
 
         Parameters
         ----------
         table_name :
             The name of the table.
+        group_by :
+            Names of the columns to group rows by.
+        filters :
+            Values or lists of values to select, keyed by column name.
+        ranges :
+            Lower and upper bounds to select, keyed by column name.
         table_spec :
-            Object specifying the table columns (Simulation or Analysis object).
+            Class specifying the table columns (Simulation or Analysis class).
+        columns :
+            Names of the columns to select, or None to select all columns.
+        chunk_size :
+            Number of rows per chunk, defaults to CHUNK_SIZE.
 
         Returns
         -------
         :
-            Query string for creating table.
+            Iterator of group column values and selected data for each group.
         """
-        feature_list = table_spec.get_feature_list()
+        chunks = self.iter_chunks(
+            table_name, filters, ranges, table_spec, columns, chunk_size, order_by=group_by
+        )
+        by: Union[str, List[str]] = group_by[0] if len(group_by) == 1 else group_by
+        pending: List[pd.DataFrame] = []
+        pending_key: Optional[Tuple[Any, ...]] = None
+
+        for chunk in chunks:
+            for key, group in chunk.groupby(by, sort=False, observed=True):
+                group_key = key if isinstance(key, tuple) else (key,)
 
-        table_columns = []
-        for feature in feature_list:
-            table_columns.append(feature.make_query())
+                if pending_key is not None and group_key != pending_key:
+                    group_data = pd.concat(pending, ignore_index=True)
+                    yield pending_key, DatabaseReader.set_dtypes(group_data, table_spec)
+                    pending = []
 
-        query = f"CREATE TABLE IF NOT EXISTS {table_name} ({','.join(table_columns)});"
-        return query
+                pending.append(group)
+                pending_key = group_key
 
-    @staticmethod
-    def make_select_from_query(table_name: str, key: str) -> str:
+        if pending_key is not None:
+            group_data = pd.concat(pending, ignore_index=True)
+            yield pending_key, DatabaseReader.set_dtypes(group_data, table_spec)
+
+    def delete_data_from_table(self, table_name: str) -> None:
         """
-        Return query string that selects rows with the specified key.
+        Delete data in specified table if it exists.
 
         Parameters
         ----------
         table_name :
-            The name of the table.
-        key :
-            Simulation key.
+            Name of the table.
+        """
+        query = f"DELETE FROM {table_name} WHERE 1=1;"
 
-        Returns
-        -------
-        :
-            Query string for selecting from database table.
+        with self.connect() as connection:
+            cursor = connection.cursor()
+            cursor.execute(query)
+
+    def drop_table(self, table_name: str) -> None:
         """
-        query = f"SELECT * FROM {table_name} WHERE key= '{key}';"
-        return query
+        Drop table.
+
+        Parameters
+        ----------
+        table_name :
+            Name of the table.
+        """
+        query = f"DROP TABLE IF EXISTS {table_name};"
+
+        with self.connect() as connection:
+            cursor = connection.cursor()
+            cursor.execute(query)
 
     def execute_query(self, query: str) -> pd.DataFrame:
         """
@@ -207,10 +675,7 @@ class Database:
         :
             Dataframe with query results.
         """
-        connection = self.get_connection()
-
-        data = pd.read_sql_query(sql=query, con=connection)
+        with self.connect() as connection:
+            data = pd.read_sql_query(sql=query, con=connection)
 
-        connection.commit()
-        connection.close()
         return data
@@ -0,0 +1,208 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type, Union
+import re
+
+import numpy as np
+
+from metrics.analysis.simulation import Simulation
+from metrics.analysis.analysis import Analysis
+
+IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+
+class DatabaseQuery:
+    """
+    Builders for the SQLite queries used by the database.
+
+    Table and column names are validated as plain SQL identifiers before they are placed in
+    a query, and values are returned separately to be bound as query parameters.
+    """
+
+    @staticmethod
+    def make_create_table_query(
+        table_name: str,
+        table_spec: Union[Type[Simulation], Type[Analysis]],
+        clustered: bool = False,
+    ) -> str:
+        """
+        Return query string that creates the SQLite table.
+
+        Parameters
+        ----------
+        table_name :
+            The name of the table.
+        table_spec :
+            Class specifying the table columns (Simulation or Analysis class).
+        clustered :
+            True to store rows clustered by the primary key, False otherwise.
+
+        Returns
+        -------
+        :
+            Query string for creating table.
+        """
+        feature_list = table_spec.get_feature_list()
+
+        table_columns = []
+        for feature in feature_list:
+            table_columns.append(feature.make_query())
+
+        if not clustered:
+            query = f"CREATE TABLE IF NOT EXISTS {table_name} ({','.join(table_columns)});"
+            return query
+
+        primary_key = table_spec.get_primary_key()
+        if not primary_key:
+            raise ValueError("Clustered tables require a primary key.")
+
+        table_columns.append(f"PRIMARY KEY ({','.join(primary_key)})")
+        query = (
+            f"CREATE TABLE IF NOT EXISTS {table_name} ({','.join(table_columns)}) WITHOUT ROWID;"
+        )
+        return query
+
+    @staticmethod
+    def make_create_index_queries(
+        table_name: str,
+        table_spec: Union[Type[Simulation], Type[Analysis]],
+        clustered: bool = False,
+    ) -> List[str]:
+        """
+        Return query strings that create the indexes of the SQLite table.
+
+        If the table is clustered, indexes covered by a prefix of the primary key are skipped.
+
+        Parameters
+        ----------
+        table_name :
+            The name of the table.
+        table_spec :
+            Class specifying the table indexes (Simulation or Analysis class).
+        clustered :
+            True if rows of the table are clustered by the primary key, False otherwise.
+
+        Returns
+        -------
+        :
+            Query strings for creating indexes.
+        """
+        queries = []
+        primary_key = tuple(table_spec.get_primary_key()) if clustered else ()
+
+        for index_columns in table_spec.get_index_list():
+            if tuple(index_columns) == primary_key[: len(index_columns)]:
+                continue
+
+            index_name = f"{table_name}_{'_'.join(index_columns)}"
+            queries.append(
+                f"CREATE INDEX IF NOT EXISTS {index_name} "
+                f"ON {table_name} ({','.join(index_columns)});"
+            )
+
+        return queries
+
+    @staticmethod
+    def make_insert_query(table_name: str, columns: List[str]) -> str:
+        """
+        Return query string that inserts rows into the SQLite table.
+
+        Parameters
+        ----------
+        table_name :
+            The name of the table.
+        columns :
+            The names of the columns.
+
+        Returns
+        -------
+        :
+            Query string with one placeholder per column.
+        """
+        placeholders = ",".join(["?"] * len(columns))
+        query = f"INSERT INTO {table_name} ({','.join(columns)}) VALUES ({placeholders});"
+        return query
+
+    @staticmethod
+    def make_select_query(
+        table_name: str,
+        filters: Optional[Dict[str, Any]] = None,
+        ranges: Optional[Dict[str, Tuple[Any, Any]]] = None,
+        columns: Optional[List[str]] = None,
+        order_by: Optional[List[str]] = None,
+    ) -> Tuple[str, List[Any]]:
+        """
+        Return query string and parameters that select rows matching the filters.
+
+        Parameters
+        ----------
+        table_name :
+            The name of the table.
+        filters :
+            Values or lists of values to select, keyed by column name.
+        ranges :
+            Lower and upper bounds to select, keyed by column name.
+        columns :
+            Names of the columns to select, or None to select all columns.
+        order_by :
+            Names of the columns to order rows by, or None for table order.
+
+        Returns
+        -------
+        :
+            Query string with placeholders, and the values bound to the placeholders.
+        """
+        conditions = []
+        parameters: List[Any] = []
+
+        for column, value in (filters or {}).items():
+            DatabaseQuery.validate_identifier(column)
+
+            if isinstance(value, Iterable) and not isinstance(value, (str, bytes)):
+                values = list(value)
+                conditions.append(column + " IN (" + ",".join(["?"] * len(values)) + ")")
+                parameters.extend(values)
+            else:
+                conditions.append(column + " = ?")
+                parameters.append(value)
+
+        for column, (lower, upper) in (ranges or {}).items():
+            DatabaseQuery.validate_identifier(column)
+
+            if lower is not None:
+                conditions.append(column + " >= ?")
+                parameters.append(lower)
+            if upper is not None:
+                conditions.append(column + " <= ?")
+                parameters.append(upper)
+
+        for identifier in [table_name] + list(columns or []) + list(order_by or []):
+            DatabaseQuery.validate_identifier(identifier)
+
+        selected = ", ".join(columns) if columns else "*"
+        query = "SELECT " + selected + " FROM " + table_name
+
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+
+        if order_by:
+            query += " ORDER BY " + ", ".join(order_by)
+
+        parameters = [
+            value.item() if isinstance(value, np.generic) else value for value in parameters
+        ]
+        return query + ";", parameters
+
+    @staticmethod
+    def validate_identifier(identifier: str) -> None:
+        """
+        Check that a table or column name is a plain SQL identifier.
+
+        Names cannot be bound as query parameters, so only names made of letters, digits, and
+        underscores are allowed in queries.
+
+        Parameters
+        ----------
+        identifier :
+            Table or column name.
+        """
+        if not IDENTIFIER.fullmatch(identifier):
+            raise ValueError(f"Invalid table or column name {identifier!r}.")
@@ -0,0 +1,158 @@
+from typing import Optional, Type, Union
+
+import sqlite3
+import numpy as np
+import pandas as pd
+
+from metrics.analysis.simulation import Simulation
+from metrics.analysis.analysis import Analysis
+from metrics.feature.feature import Feature
+
+
+class DatabaseReader:
+    """
+    Readers that convert rows selected from the SQLite database into typed columns.
+    """
+
+    BATCH_SIZE = 50000
+    """int: Number of rows fetched from the cursor per batch."""
+
+    @classmethod
+    def read_cursor(
+        cls,
+        cursor: sqlite3.Cursor,
+        table_spec: Union[Type[Simulation], Type[Analysis]],
+        num_rows: Optional[int] = None,
+    ) -> pd.DataFrame:
+        """
+        Read rows from a cursor into typed arrays.
+
+        Arrays are allocated with a NumPy dtype given by the affinity of the corresponding
+        table feature (see ``get_affinity_dtype``) and filled in batches of rows fetched from
+        the cursor. Arrays start at one batch and double in size as rows arrive, so the number
+        of rows does not need to be counted with a separate query. NULL values in REAL columns
+        are read as NaN.
+
+        Parameters
+        ----------
+        cursor :
+            Cursor of an executed select query.
+        table_spec :
+            Class specifying the table columns (Simulation or Analysis class).
+        num_rows :
+            Maximum number of rows to read, or None to read all rows.
+
+        Returns
+        -------
+        :
+            Data read from the cursor.
+        """
+        features = {feature.name: feature for feature in table_spec.get_feature_list()}
+        names = [description[0] for description in cursor.description]
+        dtypes = [cls.get_affinity_dtype(features.get(name)) for name in names]
+
+        capacity = cls.BATCH_SIZE if num_rows is None else min(cls.BATCH_SIZE, num_rows)
+        arrays = [np.empty(capacity, dtype=dtype) for dtype in dtypes]
+
+        start = 0
+        while num_rows is None or start < num_rows:
+            batch_size = cls.BATCH_SIZE if num_rows is None else num_rows - start
+            rows = cursor.fetchmany(min(cls.BATCH_SIZE, batch_size))
+
+            if not rows:
+                break
+
+            end = start + len(rows)
+
+            if end > capacity:
+                capacity = max(end, 2 * capacity)
+                capacity = capacity if num_rows is None else min(capacity, num_rows)
+                arrays = [cls.resize_array(array, start, capacity) for array in arrays]
+
+            for array, values in zip(arrays, zip(*rows)):
+                array[start:end] = values
+
+            start = end
+
+        return pd.DataFrame({name: array[:start] for name, array in zip(names, arrays)})
+
+    @staticmethod
+    def resize_array(array: np.ndarray, num_values: int, capacity: int) -> np.ndarray:
+        """
+        Copy the filled values of an array into a new array with the given capacity.
+
+        Parameters
+        ----------
+        array :
+            Array to resize.
+        num_values :
+            Number of filled values at the start of the array.
+        capacity :
+            Size of the new array.
+
+        Returns
+        -------
+        :
+            New array with the filled values.
+        """
+        resized = np.empty(capacity, dtype=array.dtype)
+        resized[:num_values] = array[:num_values]
+        return resized
+
+    @staticmethod
+    def get_affinity_dtype(feature: Optional[Feature]) -> np.dtype:
+        """
+        Return NumPy dtype used to read values of a column with the affinity of the feature.
+
+        INTEGER columns are read as 64-bit integers, unless they can be null, and REAL columns
+        as 64-bit floats (where NULL is read as NaN). All other columns are read as objects.
+
+        Parameters
+        ----------
+        feature :
+            Feature object of the column, or None if the column is not a table feature.
+
+        Returns
+        -------
+        :
+            NumPy dtype for the column values.
+        """
+        if feature is None:
+            return np.dtype(object)
+
+        if feature.affinity == "INTEGER" and not feature.is_null:
+            return np.dtype(np.int64)
+
+        if feature.affinity in ("INTEGER", "REAL"):
+            return np.dtype(np.float64)
+
+        return np.dtype(object)
+
+    @staticmethod
+    def set_dtypes(
+        data: pd.DataFrame, table_spec: Optional[Union[Type[Simulation], Type[Analysis]]] = None
+    ) -> pd.DataFrame:
+        """
+        Convert columns to the in-memory dtypes of the table features.
+
+        Parameters
+        ----------
+        data :
+            Data loaded from the SQLite table.
+        table_spec :
+            Class specifying the table columns (Simulation or Analysis class).
+
+        Returns
+        -------
+        :
+            Data with converted columns, or the given data if no table specification is given.
+        """
+        if table_spec is None:
+            return data
+
+        dtypes = {
+            feature.name: feature.dtype
+            for feature in table_spec.get_feature_list()
+            if feature.dtype is not None and feature.name in data.columns
+        }
+        return data.astype(dtypes)
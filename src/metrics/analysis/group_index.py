@@ -0,0 +1,104 @@
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+class GroupIndex:
+    """
+    Index of contiguous groups of rows in data sorted by group columns.
+
+    Rows are sorted once by the group columns (stable, so rows within a group keep their
+    order), and the start and stop positions of every group and group prefix are recorded.
+    Groups are returned as positional slices of the sorted data, without scanning or copying
+    the rows.
+
+    Attributes
+    ----------
+    data : pd.DataFrame
+        Data sorted by the group columns.
+    columns : List[str]
+        Names of the group columns.
+    bounds : Dict[Tuple[Any, ...], Tuple[int, int]]
+        Start and stop positions of rows, keyed by group column values (or prefixes).
+    children : Dict[Tuple[Any, ...], List[Any]]
+        Values of the next group column, keyed by group column values (or prefixes).
+    """
+
+    COLUMNS = ["key", "time", "seed"]
+    """list: Default group columns."""
+
+    def __init__(self, data: pd.DataFrame, columns: Optional[List[str]] = None):
+        self.columns = list(columns or self.COLUMNS)
+
+        codes = [pd.factorize(data[column], sort=True)[0] for column in self.columns]
+        order = np.lexsort(codes[::-1])
+
+        if not np.array_equal(order, np.arange(len(order))):
+            data = data.take(order)
+            codes = [code[order] for code in codes]
+
+        self.data = data
+        self.bounds: Dict[Tuple[Any, ...], Tuple[int, int]] = {(): (0, len(data))}
+        self.children: Dict[Tuple[Any, ...], List[Any]] = {}
+
+        values = [data[column].to_numpy() for column in self.columns]
+        changed = np.zeros(len(data), dtype=bool)
+        changed[:1] = True
+
+        for depth, code in enumerate(codes, start=1):
+            changed[1:] |= code[1:] != code[:-1]
+            starts = np.flatnonzero(changed)
+            stops = np.append(starts[1:], len(data))
+
+            for start, stop in zip(starts, stops):
+                group = tuple(value[start] for value in values[:depth])
+                self.bounds[group] = (int(start), int(stop))
+                self.children.setdefault(group[:-1], []).append(group[-1])
+
+    def __str__(self) -> str:
+        attributes = [
+            ("columns", self.columns),
+            ("rows", len(self.data)),
+            ("groups", len(self.bounds)),
+        ]
+
+        attribute_strings = [f"{key:10} = {value}" for key, value in attributes]
+        string = "\n\t".join(attribute_strings)
+        return "GROUP INDEX\n\t" + string
+
+    def get_group(self, *values: Any) -> pd.DataFrame:
+        """
+        Get rows of a group, given values of the first group columns.
+
+        Parameters
+        ----------
+        values :
+            Values of the group columns, in order. Fewer values than group columns select all
+            groups with the given prefix.
+
+        Returns
+        -------
+        :
+            Slice of the sorted data, or an empty slice if there is no such group.
+        """
+        start, stop = self.bounds.get(tuple(values), (0, 0))
+        return self.data.iloc[start:stop]
+
+    def iter_groups(self, *values: Any) -> Iterator[Tuple[Any, pd.DataFrame]]:
+        """
+        Iterate through groups of the next group column, given values of the first group
+        columns.
+
+        Parameters
+        ----------
+        values :
+            Values of the first group columns, in order.
+
+        Returns
+        -------
+        :
+            Iterator of sorted values of the next group column and rows of each group.
+        """
+        for value in self.children.get(tuple(values), []):
+            yield value, self.get_group(*values, value)
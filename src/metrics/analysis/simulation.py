@@ -1,11 +1,14 @@
-from typing import List, Union
+from typing import Dict, Generator, Iterator, List, Optional, Set, Tuple, Union
+from collections import Counter
 from os import path
 import ntpath
-import json
 
 import pandas as pd
 import numpy as np
 
+from metrics.analysis.simulation_cache import SimulationCache
+from metrics.analysis.simulation_decoder import SimulationDecoder
+from metrics.analysis.simulation_reader import SimulationReader
 from metrics.feature.continuous_feature import ContinuousFeature
 from metrics.feature.discrete_feature import DiscreteFeature
 from metrics.feature.feature import Feature
@@ -31,19 +34,44 @@ class Simulation:
         Time point(s) (in days) in the simulation file.
     max_radius :
         Maximum radius of the simulation.
+    archives :
+        Archive and member name of the simulation files, keyed by file suffix.
+    cache :
+        Cache of parsed timepoints, or None if parsed timepoints are not cached.
+    lazy :
+        True if the simulation file header is only read when first needed, False otherwise.
+    decoder :
+        Decoder for the JSON contents of simulation files.
     """
 
-    def __init__(self, simulation_file: str):
+    PARAM_INDICES = {"max_height": 3, "meta_pref": 8, "migra_threshold": 9}
+    """dict: Indices of cell parameters in the parameter file, keyed by feature name."""
+
+    def __init__(
+        self,
+        simulation_file: str,
+        archives: Optional[Dict[str, Tuple[str, str]]] = None,
+        cache: Optional[SimulationCache] = None,
+        lazy: bool = False,
+        decoder: Optional[SimulationDecoder] = None,
+    ):
         self.file = simulation_file
+        self.archives = archives or {}
+        self.cache = cache
+        self.lazy = lazy
+        self.decoder = decoder or SimulationDecoder()
+        self.source_hash: Optional[str] = None
         self.path: str = ""
         self.key: str = ""
         self.seed: int = 0
         self.extension: str = ""
-        self.timepoints: List[float] = []
-        self.max_radius: int = 0
+        self._timepoints: Optional[List[float]] = None
+        self._max_radius: Optional[int] = None
 
         self.parse_file()
-        self.parse_config()
+
+        if not lazy:
+            self.parse_config()
 
     def __str__(self) -> str:
         attributes = [
@@ -59,6 +87,36 @@ class Simulation:
         string = "\n\t".join(attribute_strings)
         return "SIMULATION\n\t" + string
 
+    @property
+    def timepoints(self) -> List[float]:
+        """
+        Time point(s) (in days) in the simulation file, read from the header on first access.
+        """
+        if self._timepoints is None:
+            self.parse_config()
+        if self._timepoints is None:
+            raise ValueError("The simulation file header has no time points.")
+        return self._timepoints
+
+    @timepoints.setter
+    def timepoints(self, timepoints: List[float]) -> None:
+        self._timepoints = timepoints
+
+    @property
+    def max_radius(self) -> int:
+        """
+        Maximum radius of the simulation, read from the header on first access.
+        """
+        if self._max_radius is None:
+            self.parse_config()
+        if self._max_radius is None:
+            raise ValueError("The simulation file header has no maximum radius.")
+        return self._max_radius
+
+    @max_radius.setter
+    def max_radius(self, max_radius: int) -> None:
+        self._max_radius = max_radius
+
     def load_simulation(self, suffix: str = "") -> dict:
         """
         Load simulation file into memory.
@@ -73,13 +131,80 @@ class Simulation:
         :
             Loaded simulation file.
         """
-        file_name = (
-            f"{self.path}/{self.key}{suffix}/{self.key}_{self.seed:02}{suffix}{self.extension}"
-        )
-        with open(file_name, "r", encoding="utf-8") as json_file:
-            loaded_simulation = json.load(json_file)
+        reader = self.get_reader(suffix)
+        with reader.open_file() as json_file:
+            loaded_simulation = self.decoder.load(json_file, reader.file_name)
         return loaded_simulation
 
+    def get_file_name(self, suffix: str = "") -> str:
+        """
+        Get path to the simulation file.
+
+        Parameters
+        ----------
+        suffix :
+            Suffix of the file.
+
+        Returns
+        -------
+        :
+            Path and file name for the simulation file with the given suffix.
+        """
+        return f"{self.path}/{self.key}{suffix}/{self.key}_{self.seed:02}{suffix}{self.extension}"
+
+    def get_reader(self, suffix: str = "") -> SimulationReader:
+        """
+        Get incremental reader for the simulation file.
+
+        If an archive is given for the suffix, the file is read directly from the archive.
+
+        Parameters
+        ----------
+        suffix :
+            Suffix of the file.
+
+        Returns
+        -------
+        :
+            Reader for the simulation file with the given suffix.
+        """
+        if suffix in self.archives:
+            archive_file, member_name = self.archives[suffix]
+            return SimulationReader(member_name, archive_file=archive_file, decoder=self.decoder)
+
+        return SimulationReader(self.get_file_name(suffix), decoder=self.decoder)
+
+    def get_source_hash(self) -> str:
+        """
+        Get hash of the simulation and parameter source files.
+
+        Sources are identified by path, size, and modification time; contents are only hashed
+        if the cache is set to hash contents.
+
+        Returns
+        -------
+        :
+            Hash of the source files, computed once per simulation object.
+        """
+        if self.source_hash is None:
+            file_names = []
+            member_names = []
+
+            for suffix in ("", ".PARAM"):
+                if suffix in self.archives:
+                    archive_file, member_name = self.archives[suffix]
+                    file_names.append(archive_file)
+                    member_names.append(member_name)
+                else:
+                    file_names.append(self.get_file_name(suffix))
+
+            hash_contents = self.cache is not None and self.cache.hash_contents
+            self.source_hash = SimulationCache.hash_files(
+                file_names, "|".join(member_names), hash_contents
+            )
+
+        return self.source_hash
+
     def parse_file(self) -> None:
         """
         Parse out attributes from file name.
@@ -94,11 +219,14 @@ class Simulation:
 
     def parse_config(self) -> None:
         """
-        Parse out attributes from loaded simulation file.
+        Parse out attributes from simulation file header.
+
+        Only the config and the time of each timepoint are read; cells are not decoded. The
+        header is taken from the timepoint index of the file when available.
         """
-        loaded_simulation = self.load_simulation()
-        self.timepoints = [tp["time"] for tp in loaded_simulation["timepoints"]]
-        self.max_radius = loaded_simulation["config"]["size"]["radius"]
+        header = self.get_reader().read_header()
+        self.timepoints = [tp["time"] for tp in header["timepoints"]]
+        self.max_radius = header["config"]["size"]["radius"]
 
     def parse_timepoint(self, timepoint: float) -> pd.DataFrame:
         """
@@ -114,62 +242,203 @@ class Simulation:
         :
             Dataframe with simulation data.
         """
+        return next(self.parse_timepoints([timepoint]))
+
+    def parse_timepoints(self, timepoints: List[float]) -> Iterator[pd.DataFrame]:
+        """
+        Parse data from simulation for multiple time points.
+
+        The simulation and parameter files are streamed once, one timepoint at a time,
+        regardless of the number of time points requested. Reading stops after the last
+        requested time point. If a cache is set, cached time points are loaded from the cache
+        and newly parsed time points are saved to it.
+
+        Parameters
+        ----------
+        timepoints :
+            Time points to parse simulation.
+
+        Returns
+        -------
+        :
+            Dataframes with simulation data, in the order of the given time points.
+        """
+        for timepoint in timepoints:
+            if timepoint not in self.timepoints:
+                raise ValueError("The timepoint not included in simulation file.")
+
+        return self._parse_timepoints(timepoints)
+
+    def _parse_timepoints(self, timepoints: List[float]) -> Iterator[pd.DataFrame]:
+        requested = [self.timepoints.index(timepoint) for timepoint in timepoints]
+        remaining = Counter(requested)
+        parsed: Dict[int, pd.DataFrame] = {}
+
+        if self.cache is not None:
+            for time_index in remaining:
+                cached_df = self.cache.load(self.get_source_hash(), self.timepoints[time_index])
+                if cached_df is not None:
+                    parsed[time_index] = self.set_feature_dtypes(cached_df)
+
+        streamed_timepoints = self._stream_timepoints(set(remaining) - set(parsed))
+
+        try:
+            while requested:
+                if requested[0] not in parsed:
+                    try:
+                        time_index, streamed_df = next(streamed_timepoints)
+                    except StopIteration as error:
+                        raise ValueError(
+                            f"The timepoints of {self.get_reader().file_name} are missing from "
+                            f"{self.get_reader(suffix='.PARAM').file_name}."
+                        ) from error
+                    parsed[time_index] = streamed_df
+                    continue
+
+                yield_index = requested.pop(0)
+                remaining[yield_index] -= 1
+                if remaining[yield_index]:
+                    yield parsed[yield_index]
+                else:
+                    yield parsed.pop(yield_index)
+        finally:
+            streamed_timepoints.close()
+
+    def _stream_timepoints(
+        self, time_indices: Set[int]
+    ) -> Generator[Tuple[int, pd.DataFrame], None, None]:
+        if not time_indices:
+            return
+
+        param_names = [
+            feature.name
+            for feature in self.get_feature_list()
+            if feature.name in self.PARAM_INDICES
+        ]
+        param_indices = [self.PARAM_INDICES[name] for name in param_names]
 
-        loaded_simulation = self.load_simulation()
-        loaded_param_simulation = self.load_simulation(suffix=".PARAM")
-
-        if timepoint not in self.timepoints:
-            raise ValueError("The timepoint not included in simulation file.")
-
-        time_index = self.timepoints.index(timepoint)
-
-        parsed_data = []
-        sim_timepoint = loaded_simulation["timepoints"][time_index]["cells"]
-        param_timepoint = loaded_param_simulation["timepoints"][time_index]["cells"]
-
-        for (location, cells), (_, param_cells) in zip(sim_timepoint, param_timepoint):
-            u = int(location[0])
-            v = int(location[1])
-            w = int(location[2])
-            z = int(location[3])
-            szudzik_coordinate = self.get_szudzik_pair(u, v)
-
-            for cell, param_cell in zip(cells, param_cells):
-                population = cell[1]
-                state = cell[2]
-                position = cell[3]
-                volume = np.round(cell[4])
-                cycle = np.round(np.mean(cell[5]))
-                max_height = param_cell[4][3]
-                meta_pref = param_cell[4][8]
-                migra_threshold = param_cell[4][9]
-
-                data_list = [
-                    self.key,
-                    self.seed,
-                    timepoint,
-                    szudzik_coordinate,
-                    u,
-                    v,
-                    w,
-                    z,
-                    position,
-                    str(population),
-                    str(state),
-                    volume,
-                    cycle,
-                    max_height,
-                    meta_pref,
-                    migra_threshold,
-                ]
-
-                parsed_data.append(data_list)
-
-        columns = [feature.name for feature in self.get_feature_list()]
-        return pd.DataFrame(parsed_data, columns=columns)
+        sim_timepoints = self.get_reader().read_timepoints(time_indices)
+        param_timepoints = self.get_reader(suffix=".PARAM").read_cell_fields(
+            time_indices, param_indices
+        )
+
+        try:
+            for (time_index, sim_timepoint), (_, param_fields) in zip(
+                sim_timepoints, param_timepoints
+            ):
+                timepoint = self.timepoints[time_index]
+                param_columns = dict(zip(param_names, param_fields.T))
+                parsed_df = self.parse_cells(timepoint, sim_timepoint["cells"], param_columns)
+
+                if self.cache is not None:
+                    self.cache.save(self.get_source_hash(), timepoint, parsed_df)
+
+                yield time_index, parsed_df
+        finally:
+            sim_timepoints.close()
+            param_timepoints.close()
+
+    def parse_cells(
+        self, timepoint: float, sim_cells: list, param_columns: Dict[str, np.ndarray]
+    ) -> pd.DataFrame:
+        """
+        Parse cells of a single time point into a dataframe.
+
+        Parameters
+        ----------
+        timepoint :
+            Time point of the cells.
+        sim_cells :
+            Locations and cells from the simulation file.
+        param_columns :
+            Cell parameters from the parameter file, keyed by feature name.
+
+        Returns
+        -------
+        :
+            Dataframe with simulation data.
+        """
+        cells = [cell for _, location_cells in sim_cells for cell in location_cells]
+        num_cells = len(cells)
+
+        if any(len(column) != num_cells for column in param_columns.values()):
+            raise ValueError("The simulation and parameter files have different cells.")
+
+        cells_per_location = np.fromiter(
+            (len(location_cells) for _, location_cells in sim_cells),
+            dtype=np.int64,
+            count=len(sim_cells),
+        )
+        locations = np.array([location for location, _ in sim_cells], dtype=np.int64).reshape(-1, 4)
+        coordinates = self.get_szudzik_pairs(locations[:, 0], locations[:, 1])
+        cell_locations = np.repeat(np.arange(len(sim_cells)), cells_per_location)
+
+        cycle_lengths = np.fromiter(
+            (len(cell[5]) for cell in cells), dtype=np.int64, count=num_cells
+        )
+        cycle_values = np.fromiter(
+            (value for cell in cells for value in cell[5]),
+            dtype=np.float64,
+            count=int(cycle_lengths.sum()),
+        )
+        cycle_sums = np.bincount(
+            np.repeat(np.arange(num_cells), cycle_lengths),
+            weights=cycle_values,
+            minlength=num_cells,
+        )
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cycles = np.round(cycle_sums / cycle_lengths)
+
+        columns = {
+            "key": np.full(num_cells, self.key, dtype=object),
+            "seed": np.full(num_cells, self.seed, dtype=np.int64),
+            "time": np.full(num_cells, timepoint, dtype=np.float64),
+            "coordinate": coordinates[cell_locations],
+            "u": locations[cell_locations, 0],
+            "v": locations[cell_locations, 1],
+            "w": locations[cell_locations, 2],
+            "z": locations[cell_locations, 3],
+            "p": np.array([cell[3] for cell in cells], dtype=np.int64),
+            "population": np.array([cell[1] for cell in cells]).astype(str).astype(object),
+            "state": np.array([cell[2] for cell in cells]).astype(str).astype(object),
+            "volume": np.round(np.array([cell[4] for cell in cells], dtype=np.float64)),
+            "cycle": cycles,
+            **param_columns,
+        }
+
+        return self.set_feature_dtypes(
+            pd.DataFrame(
+                {feature.name: columns[feature.name] for feature in self.get_feature_list()}
+            )
+        )
+
+    @staticmethod
+    def set_feature_dtypes(dataframe: pd.DataFrame) -> pd.DataFrame:
+        """
+        Convert simulation data columns to the compact in-memory dtypes of the features.
+
+        Text columns become categoricals, position columns small integers, and rounded volume and
+        cycle columns single precision floats. Columns not in the feature list are unchanged.
+
+        Parameters
+        ----------
+        dataframe :
+            Simulation data.
+
+        Returns
+        -------
+        :
+            Simulation data with compact dtypes.
+        """
+        dtypes = {
+            feature.name: feature.dtype
+            for feature in Simulation.get_feature_list()
+            if feature.dtype is not None and feature.name in dataframe.columns
+        }
+        return dataframe.astype(dtypes)
 
     @staticmethod
-    def get_szudzik_pair(u: int, v: int) -> float:
+    def get_szudzik_pair(u: int, v: int) -> int:
         """
         Convert positions with positive or negative UV coordinates into a coordinate ID with
         signed Szudzik pairing function.
@@ -188,20 +457,62 @@ class Simulation:
         :
             The unique ID of the position coordinate.
         """
-        if u >= 0:
-            new_u = 2 * u
-        else:
-            new_u = (-2 * u) - 1
+        return int(Simulation.get_szudzik_pairs(np.array(u), np.array(v)))
 
-        if v >= 0:
-            new_v = 2 * v
-        else:
-            new_v = (-2 * v) - 1
+    @staticmethod
+    def get_szudzik_pairs(u: np.ndarray, v: np.ndarray) -> np.ndarray:
+        """
+        Convert arrays of UV coordinates into coordinate IDs with signed Szudzik pairing function.
 
-        if new_u >= new_v:
-            return (new_u**2 + new_u + new_v) * 0.5
+        Parameters
+        ----------
+        u :
+            U coordinates of the positions.
+        v :
+            V coordinates of the positions.
+
+        Returns
+        -------
+        :
+            The unique IDs of the position coordinates.
+        """
+        u = np.asarray(u, dtype=np.int64)
+        v = np.asarray(v, dtype=np.int64)
 
-        return (new_v**2 + new_u) * 0.5
+        new_u = np.where(u >= 0, 2 * u, -2 * u - 1)
+        new_v = np.where(v >= 0, 2 * v, -2 * v - 1)
+
+        return np.where(new_u >= new_v, new_u * new_u + new_u + new_v, new_v * new_v + new_u)
+
+    @staticmethod
+    def get_szudzik_unpairs(coordinates: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Convert coordinate IDs back into UV coordinates with inverse signed Szudzik pairing.
+
+        Parameters
+        ----------
+        coordinates :
+            The unique IDs of the position coordinates.
+
+        Returns
+        -------
+        :
+            U and V coordinates of the positions.
+        """
+        coordinates = np.asarray(coordinates, dtype=np.int64)
+
+        root = np.floor(np.sqrt(coordinates)).astype(np.int64)
+        root -= root * root > coordinates
+        root += (root + 1) * (root + 1) <= coordinates
+        remainder = coordinates - root * root
+
+        new_u = np.where(remainder < root, remainder, root)
+        new_v = np.where(remainder < root, root, remainder - root)
+
+        u = np.where(new_u % 2 == 0, new_u // 2, -(new_u + 1) // 2)
+        v = np.where(new_v % 2 == 0, new_v // 2, -(new_v + 1) // 2)
+
+        return u, v
 
     @staticmethod
     def get_feature_list() -> List[Feature]:
@@ -214,24 +525,51 @@ class Simulation:
            List of Feature objects.
         """
         return [
-            Feature("key", "TEXT", False),
-            Feature("seed", "INTEGER", False),
-            Feature("time", "REAL", False),
-            Feature("coordinate", "INTEGER", False),
-            Feature("u", "INTEGER", False),
-            Feature("v", "INTEGER", False),
-            Feature("w", "INTEGER", False),
-            Feature("z", "INTEGER", False),
-            Feature("p", "INTEGER", False),
-            DiscreteFeature("population", "TEXT", False),
-            DiscreteFeature("state", "TEXT", False),
-            ContinuousFeature("volume", "REAL", False),
-            ContinuousFeature("cycle", "REAL", True),
-            ContinuousFeature("max_height", "REAL", False),
-            ContinuousFeature("meta_pref", "REAL", False),
-            ContinuousFeature("migra_threshold", "REAL", False),
+            Feature("key", "TEXT", False, "category"),
+            Feature("seed", "INTEGER", False, "int16"),
+            Feature("time", "REAL", False, "float64"),
+            Feature("coordinate", "INTEGER", False, "int64"),
+            Feature("u", "INTEGER", False, "int16"),
+            Feature("v", "INTEGER", False, "int16"),
+            Feature("w", "INTEGER", False, "int16"),
+            Feature("z", "INTEGER", False, "int8"),
+            Feature("p", "INTEGER", False, "int8"),
+            DiscreteFeature("population", "TEXT", False, "category"),
+            DiscreteFeature("state", "TEXT", False, "category"),
+            ContinuousFeature("volume", "REAL", False, "float32"),
+            ContinuousFeature("cycle", "REAL", True, "float32"),
+            ContinuousFeature("max_height", "REAL", False, "float64"),
+            ContinuousFeature("meta_pref", "REAL", False, "float64"),
+            ContinuousFeature("migra_threshold", "REAL", False, "float64"),
         ]
 
+    @staticmethod
+    def get_index_list() -> List[Tuple[str, ...]]:
+        """
+        Return a list of column tuples to index.
+
+        The index on key, seed, time, and coordinate serves lookups by any prefix of these
+        columns, such as all cells of a seed at a time point.
+
+        Returns
+        -------
+        :
+           List of indexed column tuples.
+        """
+        return [("key", "seed", "time", "coordinate")]
+
+    @staticmethod
+    def get_primary_key() -> Tuple[str, ...]:
+        """
+        Return the columns that uniquely identify a cell.
+
+        Returns
+        -------
+        :
+           Primary key columns.
+        """
+        return ("key", "seed", "time", "coordinate", "z", "p")
+
     @staticmethod
     def get_feature_object(feature_name: str) -> Union[ContinuousFeature, DiscreteFeature]:
         """
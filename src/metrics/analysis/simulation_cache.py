@@ -0,0 +1,244 @@
+from typing import List, Optional, Tuple
+import functools
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+
+class SimulationCache:
+    """
+    Binary columnar cache of parsed simulation timepoints.
+
+    Each parsed timepoint is stored as an ``.npz`` file with one array per column, in a folder
+    named by the hash of the source simulation files. Sources are identified by their path,
+    size, and modification time, or also by their contents if ``hash_contents`` is set, so
+    stale entries are never loaded. Entries are touched when loaded, and the least
+    recently used entries are evicted once the total size exceeds the limit.
+
+    The total size is counted once and then updated as entries are saved, so the cache
+    directory is only walked again when the count crosses the limit. Each process keeps its own
+    count; the walk before evicting recounts entries saved by other processes.
+
+    Attributes
+    ----------
+    path :
+        Directory of the cache.
+    size_limit :
+        Maximum total size of the cache in bytes, or None if the size is not limited.
+    hash_contents :
+        True if the contents of source files are hashed, False to identify sources by their
+        path, size, and modification time only.
+    total_size :
+        Total size of the cache in bytes as last counted, or None if not yet counted.
+    """
+
+    EVICTION_TARGET = 0.9
+    """float: Fraction of the size limit the cache is reduced to when entries are evicted."""
+
+    def __init__(self, path: str, size_limit: Optional[int] = None, hash_contents: bool = False):
+        self.path = path
+        self.size_limit = size_limit
+        self.hash_contents = hash_contents
+        self.total_size: Optional[int] = None
+
+    def __str__(self) -> str:
+        attributes = [
+            ("path", self.path),
+            ("size_limit", self.size_limit),
+            ("hash_contents", self.hash_contents),
+        ]
+
+        attribute_strings = [f"{key:10} = {value}" for key, value in attributes]
+        string = "\n\t".join(attribute_strings)
+        return "SIMULATION CACHE\n\t" + string
+
+    @staticmethod
+    def hash_files(
+        file_names: List[str],
+        identifier: str = "",
+        hash_contents: bool = False,
+        chunk_size: int = 2**22,
+    ) -> str:
+        """
+        Hash the path, size, and modification time of source files.
+
+        Contents are only read if ``hash_contents`` is set, so the hash of large sources (such
+        as archives) is computed from their metadata alone by default.
+
+        Parameters
+        ----------
+        file_names :
+            Paths to the source files.
+        identifier :
+            Additional identifier included in the hash (such as archive member names).
+        hash_contents :
+            True to also hash the contents of the source files, False otherwise.
+        chunk_size :
+            Number of bytes read from a file at a time.
+
+        Returns
+        -------
+        :
+            Hexadecimal digest of the identifier, file metadata, and contents if hashed.
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(identifier.encode())
+
+        for file_name in file_names:
+            file_stat = os.stat(file_name)
+            digest.update(
+                f"{os.path.abspath(file_name)}|{file_stat.st_size}|{file_stat.st_mtime_ns}".encode()
+            )
+
+            if not hash_contents:
+                continue
+
+            with open(file_name, "rb") as source_file:
+                for chunk in iter(functools.partial(source_file.read, chunk_size), b""):
+                    digest.update(chunk)
+
+        return digest.hexdigest()
+
+    def get_entry_path(self, source_hash: str, timepoint: float) -> str:
+        """
+        Get path to the cache entry of a timepoint.
+
+        Parameters
+        ----------
+        source_hash :
+            Hash of the source files.
+        timepoint :
+            Time point of the entry.
+
+        Returns
+        -------
+        :
+            Path to the cache entry.
+        """
+        return os.path.join(self.path, source_hash, f"{float(timepoint)!r}.npz")
+
+    def load(self, source_hash: str, timepoint: float) -> Optional[pd.DataFrame]:
+        """
+        Load a cached timepoint.
+
+        Parameters
+        ----------
+        source_hash :
+            Hash of the source files.
+        timepoint :
+            Time point to load.
+
+        Returns
+        -------
+        :
+            Cached dataframe, or None if the timepoint is not cached.
+        """
+        entry_path = self.get_entry_path(source_hash, timepoint)
+
+        try:
+            with np.load(entry_path, allow_pickle=False) as entry:
+                columns = {name: entry[name] for name in entry.files}
+            os.utime(entry_path)
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+
+        for name, column in columns.items():
+            if column.dtype.kind == "U":
+                columns[name] = column.astype(object)
+
+        return pd.DataFrame(columns)
+
+    def save(self, source_hash: str, timepoint: float, dataframe: pd.DataFrame) -> None:
+        """
+        Save a parsed timepoint to the cache and evict entries if over the size limit.
+
+        Parameters
+        ----------
+        source_hash :
+            Hash of the source files.
+        timepoint :
+            Time point of the data.
+        dataframe :
+            Parsed data to cache.
+        """
+        entry_path = self.get_entry_path(source_hash, timepoint)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+
+        columns = {}
+        for name in dataframe.columns:
+            column = dataframe[name].to_numpy()
+            columns[name] = column.astype(str) if column.dtype == object else column
+
+        file_descriptor, temporary_path = tempfile.mkstemp(
+            dir=os.path.dirname(entry_path), suffix=".tmp"
+        )
+        with os.fdopen(file_descriptor, "wb") as entry_file:
+            np.savez(entry_file, **columns)
+
+        try:
+            replaced_size = os.path.getsize(entry_path)
+        except OSError:
+            replaced_size = 0
+        os.replace(temporary_path, entry_path)
+
+        if self.size_limit is None:
+            return
+
+        if self.total_size is None:
+            self.total_size = sum(size for _, size, _ in self.list_entries())
+        else:
+            self.total_size += os.path.getsize(entry_path) - replaced_size
+
+        if self.total_size > self.size_limit:
+            self.evict()
+
+    def list_entries(self) -> List[Tuple[float, int, str]]:
+        """
+        List the entries in the cache.
+
+        Returns
+        -------
+        :
+            Access time, size, and path of each entry.
+        """
+        entries = []
+
+        for root, _, files in os.walk(self.path):
+            for file in files:
+                if not file.endswith(".npz"):
+                    continue
+                entry_path = os.path.join(root, file)
+                try:
+                    entry_stat = os.stat(entry_path)
+                except FileNotFoundError:
+                    continue
+                entries.append((entry_stat.st_mtime, entry_stat.st_size, entry_path))
+
+        return entries
+
+    def evict(self) -> None:
+        """
+        Remove least recently used entries until the cache is within the eviction target.
+
+        Emptied directories are kept, since other processes may be saving entries into them.
+        """
+        if self.size_limit is None:
+            return
+
+        entries = self.list_entries()
+        total_size = sum(size for _, size, _ in entries)
+        target_size = self.size_limit * self.EVICTION_TARGET
+
+        for _, size, entry_path in sorted(entries):
+            if total_size <= target_size:
+                break
+            try:
+                os.remove(entry_path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+        self.total_size = total_size
@@ -0,0 +1,178 @@
+from typing import IO, Any, Optional, Union
+import importlib
+import importlib.util
+import json
+import logging
+import mmap
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class SimulationDecoder:
+    """
+    Decoder for JSON contents of simulation files.
+
+    The ``json`` backend uses the standard library decoder. Faster optional backends (such as
+    ``orjson``) are used if they are installed, and the ``auto`` backend selects the fastest
+    installed backend. If a selected backend is not installed, the standard library decoder is
+    used instead. Files can be read as bytes or through a memory map; simulation readers map
+    plain (not archived) files and decode timepoints from views of the map.
+
+    Decode times are logged for each file, along with the number of bytes decoded.
+
+    Attributes
+    ----------
+    backend : {"auto", "json", "orjson"}
+        Name of the decoding backend.
+    use_mmap :
+        True if plain files are read through a memory map when possible, False otherwise.
+    """
+
+    BACKENDS = ["orjson", "json"]
+    """list: Decoding backends, from fastest to slowest."""
+
+    def __init__(self, backend: str = "auto", use_mmap: bool = False):
+        if backend != "auto" and backend not in self.BACKENDS:
+            raise ValueError(f"Decoder backend must be one of {['auto'] + self.BACKENDS}")
+
+        self.backend = backend
+        self.use_mmap = use_mmap
+        self.backend_name: Optional[str] = None
+
+    def __str__(self) -> str:
+        attributes = [
+            ("backend", self.backend),
+            ("use_mmap", self.use_mmap),
+            ("active", self.get_backend_name()),
+        ]
+
+        attribute_strings = [f"{key:10} = {value}" for key, value in attributes]
+        string = "\n\t".join(attribute_strings)
+        return "SIMULATION DECODER\n\t" + string
+
+    def get_backend_name(self) -> str:
+        """
+        Get name of the installed backend used for decoding.
+
+        The backend is resolved on first use.
+
+        Returns
+        -------
+        :
+            Name of the selected backend, or of the fastest installed backend for ``auto``.
+        """
+        if self.backend_name is None:
+            candidates = self.BACKENDS if self.backend == "auto" else [self.backend]
+            installed = [
+                candidate
+                for candidate in candidates
+                if candidate == "json" or importlib.util.find_spec(candidate) is not None
+            ]
+
+            if not installed:
+                logger.warning("Decoder backend %s is not installed, using json.", self.backend)
+
+            self.backend_name = installed[0] if installed else "json"
+
+        return self.backend_name
+
+    def decode(self, contents: Union[bytes, bytearray, memoryview]) -> Any:
+        """
+        Decode JSON contents.
+
+        Parameters
+        ----------
+        contents :
+            JSON encoded contents.
+
+        Returns
+        -------
+        :
+            Decoded contents.
+        """
+        backend = self.get_backend_name()
+
+        if backend == "json":
+            return json.loads(bytes(contents) if isinstance(contents, memoryview) else contents)
+
+        return importlib.import_module(backend).loads(contents)
+
+    def load(self, stream: IO[bytes], name: Optional[str] = None) -> Any:
+        """
+        Read and decode the JSON contents of a binary stream.
+
+        If memory mapping is enabled and the stream is backed by a file, the file is mapped
+        instead of read into memory. Otherwise the stream is read as bytes.
+
+        Parameters
+        ----------
+        stream :
+            Binary stream with JSON contents.
+        name :
+            Name of the stream used in the decode time log message.
+
+        Returns
+        -------
+        :
+            Decoded contents.
+        """
+        start = time.perf_counter()
+        mapped = self.map_stream(stream) if self.use_mmap else None
+
+        if mapped is None:
+            contents = stream.read()
+            decoded = self.decode(contents)
+            num_bytes = len(contents)
+        else:
+            with mapped, memoryview(mapped) as mapped_contents:
+                decoded = self.decode(mapped_contents)
+                num_bytes = len(mapped_contents)
+
+        if name is None:
+            name = str(getattr(stream, "name", "stream"))
+
+        elapsed = time.perf_counter() - start
+        self.log_decode_time(name, num_bytes, elapsed)
+        return decoded
+
+    def log_decode_time(self, name: str, num_bytes: int, elapsed: float) -> None:
+        """
+        Log time spent decoding a file.
+
+        Parameters
+        ----------
+        name :
+            Name of the decoded file.
+        num_bytes :
+            Number of bytes decoded.
+        elapsed :
+            Time spent decoding, in seconds.
+        """
+        logger.info(
+            "Decoded %s (%d bytes) in %.3f s with %s.",
+            name,
+            num_bytes,
+            elapsed,
+            self.get_backend_name(),
+        )
+
+    @staticmethod
+    def map_stream(stream: IO[bytes]) -> Optional[mmap.mmap]:
+        """
+        Map the file backing a stream into memory.
+
+        Parameters
+        ----------
+        stream :
+            Binary stream.
+
+        Returns
+        -------
+        :
+            Read-only memory map of the file, or None if the stream is not backed by a file.
+        """
+        try:
+            return mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        except (AttributeError, OSError, ValueError, TypeError):
+            return None
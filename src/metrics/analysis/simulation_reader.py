@@ -0,0 +1,910 @@
+from typing import IO, Any, Generator, Iterable, Iterator, List, Optional, Tuple, Union
+from contextlib import ExitStack, contextmanager
+from os import path
+import io
+import json
+import os
+import re
+import tarfile
+import time
+
+import numpy as np
+
+from metrics.analysis.simulation_decoder import SimulationDecoder
+
+BRACKET_STEPS = np.zeros(256, dtype=np.int8)
+BRACKET_STEPS[[ord("["), ord("{")]] = 1
+BRACKET_STEPS[[ord("]"), ord("}")]] = -1
+
+STRING_TOKENS = re.compile(rb'["\\]')
+SCALAR_END = re.compile(rb"[,\]}\s]")
+WHITESPACE = b" \t\n\r"
+PARAMETER_FIELD = 4
+CELL_TOKENS = [("[", 4), ("]", 3), (",", 4), ("[", 5), ("]", 4), (",", 5)]
+
+
+class SimulationReader:
+    """
+    Incremental reader for ARCADE simulation files.
+
+    Simulation files are JSON objects with a ``timepoints`` array, where each timepoint holds
+    the ``cells`` at that time. The reader walks the file in chunks and decodes one timepoint
+    at a time, so memory use is bounded by a single timepoint rather than the whole file.
+
+    If an archive is given, the file is read as a member of the ``.tar.xz`` archive and
+    decompressed as it is streamed, without extracting it to disk.
+
+    Attributes
+    ----------
+    file_name :
+        Path and file name for the simulation file, or member name if reading from an archive.
+    chunk_size :
+        Number of bytes read from the file at a time.
+    archive_file :
+        Path to the archive containing the simulation file.
+    decoder :
+        Decoder for the JSON contents of timepoints.
+    """
+
+    def __init__(
+        self,
+        file_name: str,
+        chunk_size: int = 2**20,
+        archive_file: Optional[str] = None,
+        decoder: Optional[SimulationDecoder] = None,
+    ):
+        self.file_name = file_name
+        self.chunk_size = chunk_size
+        self.archive_file = archive_file
+        self.decoder = decoder or SimulationDecoder()
+
+    @contextmanager
+    def open_file(self) -> Iterator[IO[bytes]]:
+        """
+        Open simulation file for binary reading.
+
+        Returns
+        -------
+        :
+            Opened simulation file.
+        """
+        with ExitStack() as stack:
+            if self.archive_file is None:
+                stream: IO[bytes] = stack.enter_context(open(self.file_name, "rb"))
+            else:
+                archive = stack.enter_context(tarfile.open(self.archive_file, "r|xz"))
+                stream = stack.enter_context(self.extract_member(archive))
+
+            yield stream
+
+    def extract_member(self, archive: tarfile.TarFile) -> IO[bytes]:
+        """
+        Find the simulation file in a streamed archive.
+
+        Parameters
+        ----------
+        archive :
+            Archive opened for streaming.
+
+        Returns
+        -------
+        :
+            Stream of the simulation file member.
+        """
+        for member in archive:
+            if path.normpath(member.name) != path.normpath(self.file_name):
+                continue
+
+            member_stream = archive.extractfile(member)
+            if member_stream is None:
+                break
+            return member_stream
+
+        raise FileNotFoundError(f"No file {self.file_name} in archive {self.archive_file}.")
+
+    def read_header(self) -> dict:
+        """
+        Read simulation file without decoding cells.
+
+        Returns
+        -------
+        :
+            Loaded simulation file, where timepoints exclude the ``cells`` entry.
+        """
+        index = self.load_index()
+        if index is None:
+            index = self.scan_index()
+        return index["header"]
+
+    def read_timepoints(
+        self, time_indices: Iterable[int]
+    ) -> Generator[Tuple[int, dict], None, None]:
+        """
+        Read selected timepoints of the simulation file.
+
+        Parameters
+        ----------
+        time_indices :
+            Indices of the timepoints to read.
+
+        Returns
+        -------
+        :
+            Index and decoded timepoint, in file order.
+        """
+        num_bytes = 0
+        elapsed = 0.0
+
+        try:
+            for time_index, timepoint in self.read_timepoint_bytes(time_indices):
+                start = time.perf_counter()
+                decoded = self.decoder.decode(timepoint)
+                elapsed += time.perf_counter() - start
+                num_bytes += len(timepoint)
+                yield time_index, decoded
+        finally:
+            if num_bytes:
+                self.decoder.log_decode_time(self.file_name, num_bytes, elapsed)
+
+    def read_cell_fields(
+        self, time_indices: Iterable[int], field_indices: List[int]
+    ) -> Generator[Tuple[int, np.ndarray], None, None]:
+        """
+        Read selected numeric fields of the cell parameter lists of selected timepoints.
+
+        Only the requested fields are converted; the rest of each timepoint is never decoded
+        into Python objects. Null fields are returned as NaN.
+
+        Parameters
+        ----------
+        time_indices :
+            Indices of the timepoints to read.
+        field_indices :
+            Indices of the fields in the parameter list of each cell.
+
+        Returns
+        -------
+        :
+            Index and array of fields with one row per cell, in file order.
+        """
+        for time_index, timepoint in self.read_timepoint_bytes(time_indices):
+            yield time_index, extract_cell_fields(timepoint, field_indices)
+
+    def read_timepoint_bytes(
+        self, time_indices: Iterable[int]
+    ) -> Iterator[Tuple[int, Union[bytes, memoryview]]]:
+        """
+        Read raw contents of selected timepoints of the simulation file.
+
+        Each timepoint is read by seeking to its byte range in the timepoint index. If the
+        decoder uses memory maps and the file is not in an archive, the file is mapped instead
+        and each timepoint is a view of its byte range in the map, which is released once the
+        next timepoint is requested. If the index is not available, the file is streamed once
+        instead, building the index while selected timepoints are read and unselected
+        timepoints are skipped.
+
+        Parameters
+        ----------
+        time_indices :
+            Indices of the timepoints to read.
+
+        Returns
+        -------
+        :
+            Index and JSON encoded timepoint, in file order.
+        """
+        selected = sorted(set(time_indices))
+        if not selected:
+            return
+
+        index = self.load_index()
+
+        if index is None:
+            yield from self.scan_timepoints(selected)
+            return
+
+        with self.open_file() as stream:
+            use_mmap = self.decoder.use_mmap and self.archive_file is None
+            mapped = SimulationDecoder.map_stream(stream) if use_mmap else None
+
+            if mapped is not None:
+                with mapped, memoryview(mapped) as contents:
+                    for time_index in selected:
+                        start, end = index["offsets"][time_index]
+                        with contents[start:end] as timepoint:
+                            yield time_index, timepoint
+                return
+
+            position = 0
+            for time_index in selected:
+                start, end = index["offsets"][time_index]
+                skip_bytes(stream, position, start)
+                yield time_index, stream.read(end - start)
+                position = end
+
+    def get_index_file(self) -> str:
+        """
+        Get path to the timepoint index sidecar file.
+
+        Returns
+        -------
+        :
+            Path to the index file, next to the simulation file or its archive.
+        """
+        if self.archive_file is None:
+            return f"{self.file_name}.index.json"
+        return f"{self.archive_file}.{path.basename(self.file_name)}.index.json"
+
+    def get_source(self) -> Optional[List[int]]:
+        """
+        Get size and modification time of the simulation file, or of its archive.
+
+        Returns
+        -------
+        :
+            Size and modification time in nanoseconds, or None if the file cannot be found.
+        """
+        try:
+            source_stat = os.stat(self.archive_file or self.file_name)
+        except OSError:
+            return None
+        return [source_stat.st_size, source_stat.st_mtime_ns]
+
+    def load_index(self) -> Optional[dict]:
+        """
+        Load the timepoint index from its sidecar file.
+
+        Returns
+        -------
+        :
+            Timepoint index, or None if the index is missing or outdated.
+        """
+        source = self.get_source()
+        if source is None:
+            return None
+
+        try:
+            with open(self.get_index_file(), "r", encoding="utf-8") as index_json:
+                index = json.load(index_json)
+            if index["source"] == source:
+                return index
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+        return None
+
+    def save_index(self, index: dict, source: Optional[List[int]]) -> None:
+        """
+        Write the timepoint index to its sidecar file, if possible.
+
+        Parameters
+        ----------
+        index :
+            Timepoint index with the file header and byte offsets of each timepoint.
+        source :
+            Size and modification time of the file when it was scanned.
+        """
+        if source is None:
+            return
+
+        try:
+            with open(self.get_index_file(), "w", encoding="utf-8") as index_json:
+                json.dump({**index, "source": source}, index_json)
+        except OSError:
+            pass
+
+    def scan_index(self) -> dict:
+        """
+        Scan simulation file for the header and byte ranges of each timepoint.
+
+        Cells are skipped without being decoded. The index is written to its sidecar file, so
+        the scan is only done once per version of the simulation file.
+
+        Returns
+        -------
+        :
+            Timepoint index with the file header and byte offsets of each timepoint.
+        """
+        index: dict = {}
+        for _ in self.scan_timepoints([], index):
+            pass
+        return index
+
+    def scan_timepoints(
+        self, selected: List[int], index: Optional[dict] = None
+    ) -> Iterator[Tuple[int, bytes]]:
+        """
+        Stream the simulation file once, building the timepoint index and reading timepoints.
+
+        The whole file is scanned so the index is complete. The last selected timepoint is
+        yielded after the scan, once the index is written to its sidecar file.
+
+        Parameters
+        ----------
+        selected :
+            Sorted indices of the timepoints to read.
+        index :
+            Dictionary updated with the file header and byte offsets of each timepoint.
+
+        Returns
+        -------
+        :
+            Index and JSON encoded timepoint, in file order.
+        """
+        source = self.get_source()
+        scanned: dict = {"header": {}, "offsets": []}
+        selected_set = set(selected)
+        last: Optional[Tuple[int, bytes]] = None
+
+        with self.open_file() as stream:
+            scanner = JsonScanner(stream, self.chunk_size)
+
+            for key in scanner.iter_object():
+                if key != "timepoints":
+                    scanned["header"][key] = json.loads(scanner.read_value())
+                    continue
+
+                scanned["header"][key] = []
+                for time_index in scanner.iter_array():
+                    scanner.peek()
+                    start = scanner.tell()
+
+                    if time_index not in selected_set:
+                        scanned["header"][key].append(read_timepoint_header(scanner))
+                        scanned["offsets"].append([start, scanner.tell()])
+                        continue
+
+                    timepoint = scanner.read_value()
+                    scanned["header"][key].append(
+                        read_timepoint_header(
+                            JsonScanner(io.BytesIO(timepoint), len(timepoint) + 1)
+                        )
+                    )
+                    scanned["offsets"].append([start, scanner.tell()])
+
+                    if time_index == selected[-1]:
+                        last = (time_index, timepoint)
+                    else:
+                        yield time_index, timepoint
+
+        self.save_index(scanned, source)
+
+        if index is not None:
+            index.update(scanned)
+
+        if last is not None:
+            yield last
+
+
+class JsonScanner:
+    """
+    Buffered scanner over the structure of a JSON stream.
+
+    The scanner locates the boundaries of JSON values without decoding them. Nested arrays and
+    objects are matched by a vectorized bracket count over each chunk, falling back to token
+    scanning only within strings.
+
+    Attributes
+    ----------
+    stream :
+        Binary stream with JSON contents.
+    chunk_size :
+        Number of bytes read from the stream at a time.
+    """
+
+    def __init__(self, stream: IO[bytes], chunk_size: int):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.buffer = bytearray()
+        self.position = 0
+        self.offset = 0
+
+    def fill(self) -> bool:
+        """
+        Read the next chunk from the stream into the buffer.
+
+        Returns
+        -------
+        :
+            True if data was read, False at the end of the stream.
+        """
+        chunk = self.stream.read(self.chunk_size)
+        if not chunk:
+            return False
+        self.buffer.extend(chunk)
+        return True
+
+    def tell(self) -> int:
+        """
+        Get absolute position in the stream.
+
+        Returns
+        -------
+        :
+            Number of bytes before the current position.
+        """
+        return self.offset + self.position
+
+    def compact(self) -> None:
+        """
+        Drop consumed data from the buffer.
+        """
+        if self.position > self.chunk_size:
+            del self.buffer[: self.position]
+            self.offset += self.position
+            self.position = 0
+
+    def peek(self) -> int:
+        """
+        Skip whitespace and return the next byte without consuming it.
+
+        Returns
+        -------
+        :
+            Next non-whitespace byte.
+        """
+        while True:
+            while self.position < len(self.buffer):
+                if self.buffer[self.position] not in WHITESPACE:
+                    return self.buffer[self.position]
+                self.position += 1
+            if not self.fill():
+                raise ValueError("Unexpected end of simulation file.")
+
+    def expect(self, token: bytes) -> None:
+        """
+        Consume the expected structural token.
+
+        Parameters
+        ----------
+        token :
+            Expected token.
+        """
+        if self.peek() != token[0]:
+            raise ValueError(f"Expected {token!r} at byte {self.offset + self.position}.")
+        self.position += 1
+
+    def iter_object(self) -> Iterator[str]:
+        """
+        Iterate through the keys of the object at the current position.
+
+        The value of each key must be consumed before advancing the iterator.
+
+        Returns
+        -------
+        :
+            Keys of the object.
+        """
+        self.expect(b"{")
+        if self.peek() == ord("}"):
+            self.position += 1
+            return
+
+        while True:
+            key = json.loads(self.read_value())
+            self.expect(b":")
+            yield key
+            if self.peek() == ord("}"):
+                self.position += 1
+                return
+            self.expect(b",")
+
+    def iter_array(self) -> Iterator[int]:
+        """
+        Iterate through the elements of the array at the current position.
+
+        Each element must be consumed before advancing the iterator.
+
+        Returns
+        -------
+        :
+            Indices of the elements.
+        """
+        self.expect(b"[")
+        if self.peek() == ord("]"):
+            self.position += 1
+            return
+
+        index = 0
+        while True:
+            yield index
+            index += 1
+            if self.peek() == ord("]"):
+                self.position += 1
+                return
+            self.expect(b",")
+
+    def read_value(self) -> bytes:
+        """
+        Consume the value at the current position.
+
+        Returns
+        -------
+        :
+            Raw contents of the value.
+        """
+        start, end = self.find_value()
+        value = bytes(self.buffer[start:end])
+        self.position = end
+        self.compact()
+        return value
+
+    def skip_value(self) -> None:
+        """
+        Consume the value at the current position without copying it.
+
+        Scanned contents of arrays and objects are dropped from the buffer as the value is
+        skipped, so skipping a large value only holds about one chunk in memory.
+        """
+        if self.peek() in b"[{":
+            self.position = self.find_container_end(self.position, discard=True)
+        else:
+            _, self.position = self.find_value()
+        self.compact()
+
+    def find_value(self) -> Tuple[int, int]:
+        """
+        Find the boundaries of the value at the current position.
+
+        Returns
+        -------
+        :
+            Start and end positions of the value in the buffer.
+        """
+        first = self.peek()
+        start = self.position
+
+        if first in b"[{":
+            return start, self.find_container_end(start)
+        if first == ord('"'):
+            return start, self.find_string_end(start + 1)
+        return start, self.find_scalar_end(start)
+
+    def find_container_end(self, start: int, discard: bool = False) -> int:
+        """
+        Find the end of the array or object beginning at the given position.
+
+        Parameters
+        ----------
+        start :
+            Position of the opening bracket.
+        discard :
+            True to drop scanned contents from the buffer, False to keep the whole value.
+
+        Returns
+        -------
+        :
+            Position after the matching closing bracket.
+        """
+        depth = 0
+        scan = start
+
+        while True:
+            if scan >= len(self.buffer):
+                if discard and scan > self.chunk_size:
+                    del self.buffer[:scan]
+                    self.offset += scan
+                    self.position = 0
+                    scan = 0
+                if not self.fill():
+                    raise ValueError("Unexpected end of simulation file.")
+
+            quote = self.buffer.find(b'"', scan)
+            stop = len(self.buffer) if quote < 0 else quote
+
+            end, depth = count_brackets(self.buffer, scan, stop, depth)
+            if end >= 0:
+                return end
+
+            scan = stop if quote < 0 else self.find_string_end(quote + 1)
+
+    def find_string_end(self, start: int) -> int:
+        """
+        Find the end of the string with contents beginning at the given position.
+
+        Parameters
+        ----------
+        start :
+            Position after the opening quote.
+
+        Returns
+        -------
+        :
+            Position after the closing quote.
+        """
+        scan = start
+
+        while True:
+            match = STRING_TOKENS.search(self.buffer, scan)
+
+            if match is None or match.end() >= len(self.buffer) and match.group() == b"\\":
+                if not self.fill():
+                    raise ValueError("Unexpected end of simulation file.")
+                continue
+
+            if match.group() == b'"':
+                return match.end()
+
+            scan = match.end() + 1
+
+    def find_scalar_end(self, start: int) -> int:
+        """
+        Find the end of the number or literal beginning at the given position.
+
+        Parameters
+        ----------
+        start :
+            Position of the first character.
+
+        Returns
+        -------
+        :
+            Position after the last character.
+        """
+        while True:
+            match = SCALAR_END.search(self.buffer, start)
+            if match is not None:
+                return match.start()
+            if not self.fill():
+                return len(self.buffer)
+
+
+def read_timepoint_header(scanner: JsonScanner) -> dict:
+    """
+    Read the timepoint object at the current position of a scanner, skipping its cells.
+
+    Parameters
+    ----------
+    scanner :
+        Scanner positioned at the start of a timepoint.
+
+    Returns
+    -------
+    :
+        Timepoint entries other than ``cells``.
+    """
+    timepoint = {}
+
+    for key in scanner.iter_object():
+        if key == "cells":
+            scanner.skip_value()
+        else:
+            timepoint[key] = json.loads(scanner.read_value())
+
+    return timepoint
+
+
+def extract_cell_fields(
+    timepoint: Union[bytes, memoryview], field_indices: List[int], chunk_size: int = 2**20
+) -> np.ndarray:
+    """
+    Extract numeric fields from the cell parameter lists of an encoded timepoint.
+
+    Cells are nested as ``[[location, [[..., [fields]], ...]], ...]``, where the field list is
+    the fifth element of each cell at depth four of the ``cells`` array. Cell elements are
+    located from the commas at depth four, and the positions of the field lists and of the
+    commas separating their fields are found from the bracket depth of every byte. Only the
+    requested fields are converted to numbers.
+
+    Bracket depths are counted in chunks, so only the positions of brackets and commas are
+    kept for the whole timepoint. Cells with strings are decoded with ``json`` instead.
+
+    Parameters
+    ----------
+    timepoint :
+        JSON encoded timepoint.
+    field_indices :
+        Indices of the fields in the parameter list of each cell.
+    chunk_size :
+        Number of bytes scanned at a time.
+
+    Returns
+    -------
+    :
+        Array of fields with one row per cell and one column per field index.
+    """
+    contents = memoryview(timepoint)
+    scanner = JsonScanner(io.BytesIO(timepoint), chunk_size)
+    start = end = 0
+
+    for key in scanner.iter_object():
+        if key != "cells":
+            scanner.skip_value()
+            continue
+        scanner.peek()
+        start = scanner.tell()
+        scanner.skip_value()
+        end = scanner.tell()
+
+    del scanner
+    cells = contents[start:end]
+    tokens = locate_tokens(cells, CELL_TOKENS, chunk_size)
+
+    if tokens is None:
+        lists = [
+            cell[PARAMETER_FIELD]
+            for _, location_cells in json.loads(cells.tobytes())
+            for cell in location_cells
+        ]
+        return np.array(
+            [[fields[index] for index in field_indices] for fields in lists], dtype=np.float64
+        ).reshape(-1, len(field_indices))
+
+    cell_opens, cell_closes, cell_commas, list_opens, list_closes, commas = tokens
+    del tokens
+
+    # Select the array in the parameter field of each cell among the arrays at depth five
+    first_cell_commas = np.searchsorted(cell_commas, cell_opens)
+    if np.any(np.searchsorted(cell_commas, cell_closes) - first_cell_commas < PARAMETER_FIELD):
+        raise ValueError(f"Cells have no parameter list at index {PARAMETER_FIELD}.")
+
+    field_starts = cell_commas[first_cell_commas + PARAMETER_FIELD - 1]
+    field_ends = np.minimum(
+        np.append(cell_commas, len(cells))[first_cell_commas + PARAMETER_FIELD], cell_closes
+    )
+    del cell_opens, cell_closes, cell_commas, first_cell_commas
+
+    selected = np.searchsorted(list_opens, field_starts)
+    if np.any(selected >= len(list_opens)) or np.any(
+        list_opens[np.minimum(selected, max(len(list_opens) - 1, 0))] > field_ends
+    ):
+        raise ValueError(f"Cells have no parameter list at index {PARAMETER_FIELD}.")
+
+    opens = list_opens[selected]
+    closes = list_closes[selected]
+    del list_opens, list_closes, selected, field_starts, field_ends
+
+    first_commas = np.searchsorted(commas, opens)
+    num_commas = np.searchsorted(commas, closes) - first_commas
+    fields = np.empty((len(opens), len(field_indices)), dtype=np.float64)
+
+    for column, field_index in enumerate(field_indices):
+        if np.any(num_commas < field_index):
+            raise ValueError(f"Cell parameter lists have no field at index {field_index}.")
+
+        if field_index == 0:
+            starts = opens + 1
+        else:
+            starts = commas[first_commas + field_index - 1] + 1
+
+        following = np.minimum(first_commas + field_index, max(len(commas) - 1, 0))
+        ends = np.where(num_commas > field_index, commas[following] if len(commas) else 0, closes)
+
+        values = (
+            b" ".join([cells[start:end].tobytes() for start, end in zip(starts, ends)])
+            .replace(b"null", b"nan")
+            .split()
+        )
+
+        if len(values) != len(opens):
+            raise ValueError(f"Cell parameter lists have an empty field at index {field_index}.")
+
+        fields[:, column] = np.array(values, dtype=np.float64)
+
+    return fields
+
+
+def locate_tokens(
+    contents: memoryview, tokens: List[Tuple[str, int]], chunk_size: int
+) -> Optional[List[np.ndarray]]:
+    """
+    Locate structural characters at given bracket depths in JSON contents without strings.
+
+    The bracket depth of each byte is counted in chunks, carrying the depth across chunk
+    boundaries, so memory use for the depths and character masks is bounded by the chunk size.
+    Positions are stored as 32-bit integers unless the contents are too large to index with them.
+
+    Parameters
+    ----------
+    contents :
+        JSON contents.
+    tokens :
+        Structural character and the bracket depth (after the character) of each token.
+    chunk_size :
+        Number of bytes scanned at a time.
+
+    Returns
+    -------
+    :
+        Positions of each token, or None if the contents contain strings.
+    """
+    codes = np.frombuffer(contents, dtype=np.uint8)
+    position_dtype = np.int32 if len(codes) < 2**31 else np.int64
+    positions: List[List[np.ndarray]] = [[] for _ in tokens]
+    depth = 0
+
+    for chunk_start in range(0, len(codes), chunk_size):
+        chunk = codes[chunk_start : chunk_start + chunk_size]
+        if np.any(chunk == ord('"')):
+            return None
+
+        levels = np.cumsum(BRACKET_STEPS[chunk], dtype=np.int8)
+        levels += depth
+        depth = int(levels[-1])
+
+        for token_positions, (character, level) in zip(positions, tokens):
+            mask = chunk == ord(character)
+            mask &= levels == level
+            token_positions.append((np.flatnonzero(mask) + chunk_start).astype(position_dtype))
+            del mask
+
+        del levels
+
+    located = []
+    for token_positions in positions:
+        located.append(
+            np.concatenate(token_positions) if token_positions else np.empty(0, position_dtype)
+        )
+        token_positions.clear()
+
+    return located
+
+
+def skip_bytes(stream: IO[bytes], position: int, target: int, chunk_size: int = 2**20) -> None:
+    """
+    Advance stream from the current position to the target position.
+
+    Parameters
+    ----------
+    stream :
+        Binary stream.
+    position :
+        Current position in the stream.
+    target :
+        Target position in the stream.
+    chunk_size :
+        Number of bytes read at a time if the stream is not seekable.
+    """
+    try:
+        seekable = stream.seekable()
+    except AttributeError:
+        seekable = False
+
+    if seekable:
+        stream.seek(target)
+        return
+
+    while position < target:
+        skipped = len(stream.read(min(chunk_size, target - position)))
+        if not skipped:
+            raise ValueError("Unexpected end of simulation file.")
+        position += skipped
+
+
+def count_brackets(
+    buffer: bytearray, start: int, stop: int, depth: int, chunk_size: int = 2**16
+) -> Tuple[int, Any]:
+    """
+    Count bracket depth over a buffer segment that contains no strings.
+
+    The segment is counted in chunks, so memory use does not grow with the segment length.
+
+    Parameters
+    ----------
+    buffer :
+        Buffer with JSON contents.
+    start :
+        Start position of the segment.
+    stop :
+        Stop position of the segment.
+    depth :
+        Bracket depth at the start of the segment.
+    chunk_size :
+        Number of bytes counted at a time.
+
+    Returns
+    -------
+    :
+        Position after the bracket closing depth zero (or -1) and depth at the segment end.
+    """
+    for chunk_start in range(start, stop, chunk_size):
+        count = min(chunk_size, stop - chunk_start)
+        codes = np.frombuffer(buffer, dtype=np.uint8, count=count, offset=chunk_start)
+        levels = np.cumsum(BRACKET_STEPS[codes]) + depth
+        closed = np.flatnonzero(levels == 0)
+
+        if closed.size:
+            return chunk_start + int(closed[0]) + 1, 0
+        depth = int(levels[-1])
+
+    return -1, depth
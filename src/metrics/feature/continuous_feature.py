@@ -3,7 +3,7 @@ from typing import List, Any, Tuple, Union
 import numpy as np
 import pandas as pd
 from statsmodels.distributions.empirical_distribution import ECDF
-from scipy.stats import entropy, kstest, gaussian_kde
+from scipy.stats import entropy, kstest, kstwo, gaussian_kde
 
 
 from metrics.feature.feature import Feature
@@ -21,6 +21,8 @@ class ContinuousFeature(Feature):
         The SQLite3 type affinity of the feature.
     is_null :
         True if feature data can be null, False otherwise.
+    dtype :
+        The in-memory pandas dtype of the feature, or None to use the default dtype.
     """
 
     feature_type = "continuous"
@@ -52,8 +54,8 @@ class ContinuousFeature(Feature):
             Result of statistical test.
         """
         if self.is_valid_feature_name(simulation_data, sample_data):
-            sample = list(sample_data[self.name])
-            reference = list(simulation_data[self.name])
+            sample = sample_data[self.name].astype(np.float64).tolist()
+            reference = simulation_data[self.name].astype(np.float64).tolist()
 
             reference_cdf = ECDF(reference)
             p_value = kstest(sample, reference_cdf)
@@ -79,8 +81,8 @@ class ContinuousFeature(Feature):
             Result of KL divergence that are keyed by the category.
         """
         if self.is_valid_feature_name(simulation_data, sample_data):
-            sample: list = list(sample_data[self.name])
-            reference: list = list(simulation_data[self.name])
+            sample: list = sample_data[self.name].astype(np.float64).tolist()
+            reference: list = simulation_data[self.name].astype(np.float64).tolist()
 
             sample_prob, reference_prob = self.get_pdfs(sample, reference)
 
@@ -115,6 +117,205 @@ class ContinuousFeature(Feature):
         info_data = self.compare_feature_info(sample_data, simulation_data)
         return [data_list + [None, stats_data, info_data]]
 
+    def write_grouped_feature_data(
+        self,
+        data_lists: List[list],
+        sample_values: np.ndarray,
+        sample_offsets: np.ndarray,
+        reference_values: np.ndarray,
+        reference_offsets: np.ndarray,
+    ) -> List[Any]:
+        """
+        Writes feature data of all groups into lists of data.
+
+        Groups (such as seeds) are given as concatenated values with group offsets, where the
+        values of group ``i`` are ``values[offsets[i] : offsets[i + 1]]``. Rows are the same as
+        calling ``write_feature_data`` on each group.
+
+        Parameters
+        ----------
+        data_lists :
+            List of data in analysis table for each group.
+        sample_values :
+            Concatenated sample values of all groups.
+        sample_offsets :
+            Offsets of the groups in the sample values.
+        reference_values :
+            Concatenated tumor values of all groups.
+        reference_offsets :
+            Offsets of the groups in the tumor values.
+
+        Returns
+        -------
+        :
+            List of data needed for analysis dataframe.
+        """
+        sample_values = np.asarray(sample_values, dtype=np.float64)
+        reference_values = np.asarray(reference_values, dtype=np.float64)
+        sample_offsets = np.asarray(sample_offsets, dtype=np.int64)
+        reference_offsets = np.asarray(reference_offsets, dtype=np.int64)
+
+        valid = self.get_valid_groups(sample_values, sample_offsets) & self.get_valid_groups(
+            reference_values, reference_offsets
+        )
+        stats_data = self.compare_grouped_feature_stat(
+            sample_values, sample_offsets, reference_values, reference_offsets, valid
+        )
+        info_data = self.compare_grouped_feature_info(
+            sample_values, sample_offsets, reference_values, reference_offsets, valid
+        )
+
+        return [
+            data_list + [None, stat, info]
+            for data_list, stat, info in zip(data_lists, stats_data.tolist(), info_data.tolist())
+        ]
+
+    @staticmethod
+    def compare_grouped_feature_stat(
+        sample_values: np.ndarray,
+        sample_offsets: np.ndarray,
+        reference_values: np.ndarray,
+        reference_offsets: np.ndarray,
+        valid: np.ndarray,
+    ) -> np.ndarray:
+        """
+        Uses Kolmogorov-Smirnov test to compare continuous features of all groups.
+
+        Sample values are sorted within groups and merged with the tumor values, so the
+        empirical distribution function of the tumor data is evaluated at every sample value
+        with one cumulative count. Statistics and p-values of all groups are then calculated
+        in one call, matching ``compare_feature_stat`` on each group.
+
+        Parameters
+        ----------
+        sample_values :
+            Concatenated sample values of all groups.
+        sample_offsets :
+            Offsets of the groups in the sample values.
+        reference_values :
+            Concatenated tumor values of all groups.
+        reference_offsets :
+            Offsets of the groups in the tumor values.
+        valid :
+            True for groups with valid data, False otherwise.
+
+        Returns
+        -------
+        :
+            Result of statistical test for each group, or nan for invalid groups.
+        """
+        p_values = np.full(len(valid), np.nan)
+
+        if not valid.any():
+            return p_values
+
+        sample_values, sample_offsets = ContinuousFeature.select_groups(
+            sample_values, sample_offsets, valid
+        )
+        reference_values, reference_offsets = ContinuousFeature.select_groups(
+            reference_values, reference_offsets, valid
+        )
+
+        num_groups = len(sample_offsets) - 1
+        sample_sizes = np.diff(sample_offsets)
+        reference_sizes = np.diff(reference_offsets)
+        sample_groups = np.repeat(np.arange(num_groups), sample_sizes)
+        reference_groups = np.repeat(np.arange(num_groups), reference_sizes)
+
+        # Sort sample values within groups, with nan last as in np.sort
+        sample_values = sample_values[np.lexsort((sample_values, sample_groups))]
+
+        # Count tumor values less than or equal to each sample value, where tumor values sort
+        # before tied sample values and nan counts only for nan sample values
+        is_sample = np.concatenate(
+            [np.zeros(len(reference_values), dtype=bool), np.ones(len(sample_values), dtype=bool)]
+        )
+        merged_order = np.lexsort(
+            (
+                is_sample,
+                np.concatenate([reference_values, sample_values]),
+                np.concatenate([reference_groups, sample_groups]),
+            )
+        )
+        reference_counts = np.cumsum(~is_sample[merged_order])[is_sample[merged_order]]
+        counts = reference_counts - reference_offsets[sample_groups]
+
+        # Evaluate the step function of statsmodels ECDF, with steps np.linspace(1 / M, 1, M)
+        num_reference = reference_sizes[sample_groups].astype(np.float64)
+        start = 1.0 / num_reference
+        with np.errstate(divide="ignore", invalid="ignore"):
+            step = (1.0 - start) / (num_reference - 1)
+            cdf_values = np.where(
+                counts == 0,
+                0.0,
+                np.where(counts == num_reference, 1.0, (counts - 1) * step + start),
+            )
+
+        num_sample = sample_sizes[sample_groups].astype(np.float64)
+        ranks = (np.arange(len(sample_values)) - sample_offsets[sample_groups]).astype(np.float64)
+        d_plus = np.maximum.reduceat((ranks + 1.0) / num_sample - cdf_values, sample_offsets[:-1])
+        d_minus = np.maximum.reduceat(cdf_values - ranks / num_sample, sample_offsets[:-1])
+        statistics = np.where(d_plus > d_minus, d_plus, d_minus)
+
+        p_values[valid] = np.clip(kstwo.sf(statistics, sample_sizes), 0, 1)
+        return p_values
+
+    def compare_grouped_feature_info(
+        self,
+        sample_values: np.ndarray,
+        sample_offsets: np.ndarray,
+        reference_values: np.ndarray,
+        reference_offsets: np.ndarray,
+        valid: np.ndarray,
+    ) -> np.ndarray:
+        """
+        Uses KL divergence to compare continuous features of all groups.
+
+        Probability density functions are estimated for each group, and the divergences of
+        all groups are calculated in one call.
+
+        Parameters
+        ----------
+        sample_values :
+            Concatenated sample values of all groups.
+        sample_offsets :
+            Offsets of the groups in the sample values.
+        reference_values :
+            Concatenated tumor values of all groups.
+        reference_offsets :
+            Offsets of the groups in the tumor values.
+        valid :
+            True for groups with valid data, False otherwise.
+
+        Returns
+        -------
+        :
+            Result of KL divergence for each group, or nan for invalid groups.
+        """
+        if not valid.any():
+            return np.full(len(valid), np.nan)
+
+        pdfs = [
+            self.get_pdfs(
+                sample_values[sample_offsets[group] : sample_offsets[group + 1]].tolist(),
+                reference_values[reference_offsets[group] : reference_offsets[group + 1]].tolist(),
+            )
+            if is_valid
+            else (float("nan"), float("nan"))
+            for group, is_valid in enumerate(valid)
+        ]
+
+        # Groups where the density estimation failed have rows of nan
+        num_bins = max(np.size(sample_prob) for sample_prob, _ in pdfs)
+        sample_probs = np.full((len(pdfs), num_bins), np.nan)
+        reference_probs = np.full((len(pdfs), num_bins), np.nan)
+
+        for group, (sample_prob, reference_prob) in enumerate(pdfs):
+            sample_probs[group] = sample_prob
+            reference_probs[group] = reference_prob
+
+        return entropy(sample_probs, reference_probs, axis=1)
+
     def is_valid_feature_name(
         self, simulation_data: pd.DataFrame, sample_data: pd.DataFrame
     ) -> bool:
@@ -173,3 +374,45 @@ class ContinuousFeature(Feature):
         sample_prob = sample_kde.pdf(x)
 
         return sample_prob, reference_prob
+
+    @staticmethod
+    def get_valid_groups(values: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+        """
+        Parameters
+        ----------
+        values :
+            Concatenated values of all groups.
+        offsets :
+            Offsets of the groups in the values.
+
+        Returns
+        -------
+        :
+            True for each group that contains data, False otherwise.
+        """
+        counts = np.cumsum(np.concatenate([[0], ~np.isnan(values)]))
+        return counts[offsets[1:]] > counts[offsets[:-1]]
+
+    @staticmethod
+    def select_groups(
+        values: np.ndarray, offsets: np.ndarray, selected: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Parameters
+        ----------
+        values :
+            Concatenated values of all groups.
+        offsets :
+            Offsets of the groups in the values.
+        selected :
+            True for each group to select, False otherwise.
+
+        Returns
+        -------
+        :
+            Concatenated values and offsets of the selected groups.
+        """
+        sizes = np.diff(offsets)
+        values = values[np.repeat(selected, sizes)]
+        offsets = np.concatenate([[0], np.cumsum(sizes[selected])])
+        return values, offsets
@@ -1,6 +1,7 @@
-from typing import Dict, List, Any, Union
+from typing import Dict, List, Any, Optional, Union
 
 
+import numpy as np
 import pandas as pd
 from scipy.stats import hypergeom, entropy
 
@@ -19,13 +20,15 @@ class DiscreteFeature(Feature):
         The SQLite3 type affinity of the feature.
     is_null :
         True if feature data can be null, False otherwise.
+    dtype :
+        The in-memory pandas dtype of the feature, or None to use the default dtype.
     """
 
     feature_type = "discrete"
     """string: Type of the feature."""
 
-    def __init__(self, name: str, affinity: str, is_null: bool):
-        super().__init__(name, affinity, is_null)
+    def __init__(self, name: str, affinity: str, is_null: bool, dtype: Optional[str] = None):
+        super().__init__(name, affinity, is_null, dtype)
 
     def __str__(self) -> str:
         return "DISCRETE " + super().__str__()
@@ -142,6 +145,110 @@ class DiscreteFeature(Feature):
 
         return []
 
+    def write_grouped_feature_data(
+        self,
+        data_lists: List[list],
+        sample_values: np.ndarray,
+        sample_offsets: np.ndarray,
+        reference_values: np.ndarray,
+        reference_offsets: np.ndarray,
+    ) -> List[Any]:
+        """
+        Writes feature data of all groups into lists of data.
+
+        Groups (such as seeds) are given as concatenated values with group offsets, where the
+        values of group ``i`` are ``values[offsets[i] : offsets[i + 1]]``. Categories of all
+        groups are counted in one pass, and hypergeometric probabilities and KL divergences of
+        all groups are calculated in one call. Rows are the same as calling
+        ``write_feature_data`` on each group.
+
+        Parameters
+        ----------
+        data_lists :
+            List of data in analysis table for each group.
+        sample_values :
+            Concatenated sample values of all groups.
+        sample_offsets :
+            Offsets of the groups in the sample values.
+        reference_values :
+            Concatenated tumor values of all groups.
+        reference_offsets :
+            Offsets of the groups in the tumor values.
+
+        Returns
+        -------
+        :
+            List of data needed for analysis dataframe.
+        """
+        sample_offsets = np.asarray(sample_offsets, dtype=np.int64)
+        reference_offsets = np.asarray(reference_offsets, dtype=np.int64)
+        num_groups = len(data_lists)
+
+        codes, categories = pd.factorize(
+            np.concatenate([np.asarray(reference_values), np.asarray(sample_values)]), sort=True
+        )
+        num_categories = len(categories)
+        reference_counts = self.count_grouped_categories(
+            codes[: reference_offsets[-1]], reference_offsets, num_categories
+        )
+        sample_counts = self.count_grouped_categories(
+            codes[reference_offsets[-1] :], sample_offsets, num_categories
+        )
+
+        N = np.diff(sample_offsets)[:, None]
+        M = np.diff(reference_offsets)[:, None]
+
+        groups, category_codes = np.nonzero(reference_counts)
+        hypergeom_pmfs = hypergeom.pmf(
+            sample_counts[groups, category_codes],
+            M[groups, 0],
+            reference_counts[groups, category_codes],
+            N[groups, 0],
+        )
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            sample_pdfs = np.where(reference_counts > 0, sample_counts / N, 0.0)
+            simulation_pdfs = reference_counts / M
+
+        info_data = entropy(sample_pdfs, simulation_pdfs, axis=1) if num_groups else []
+
+        return [
+            data_lists[group] + [categories[category_code], value, info_data[group]]
+            for group, category_code, value in zip(
+                groups.tolist(), category_codes.tolist(), hypergeom_pmfs.tolist()
+            )
+        ]
+
+    @staticmethod
+    def count_grouped_categories(
+        codes: np.ndarray, offsets: np.ndarray, num_categories: int
+    ) -> np.ndarray:
+        """
+        Returns the number of each category in each group.
+
+        Parameters
+        ----------
+        codes :
+            Concatenated category codes of all groups, with -1 for missing values.
+        offsets :
+            Offsets of the groups in the codes.
+        num_categories :
+            Number of categories.
+
+        Returns
+        -------
+        :
+            Number of each category (columns) in each group (rows).
+        """
+        num_groups = len(offsets) - 1
+        groups = np.repeat(np.arange(num_groups), np.diff(offsets))
+        is_valid = codes >= 0
+        counts = np.bincount(
+            groups[is_valid] * num_categories + codes[is_valid],
+            minlength=num_groups * num_categories,
+        )
+        return counts.reshape(num_groups, num_categories)
+
     @staticmethod
     def get_count(data: list, category: str) -> int:
         """
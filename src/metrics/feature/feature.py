@@ -1,3 +1,6 @@
+from typing import Optional
+
+
 class Feature:
     """
     Representation of a data feature.
@@ -10,9 +13,11 @@ class Feature:
         The SQLite3 type affinity of the feature.
     is_null :
         True if feature data can be null, False otherwise.
+    dtype :
+        The in-memory pandas dtype of the feature, or None to use the default dtype.
     """
 
-    def __init__(self, name: str, affinity: str, is_null: bool):
+    def __init__(self, name: str, affinity: str, is_null: bool, dtype: Optional[str] = None):
         valid_dtypes = ["NUMERIC", "INTEGER", "REAL", "TEXT", "BLOB"]
         if affinity.upper() not in valid_dtypes:
             raise TypeError(f"Data type must be one of {valid_dtypes}")
@@ -20,12 +25,14 @@ class Feature:
         self.name = name
         self.affinity = affinity
         self.is_null = is_null
+        self.dtype = dtype
 
     def __str__(self) -> str:
         attributes = [
             ("name", self.name),
             ("affinity", self.affinity),
             ("is_null", self.is_null),
+            ("dtype", self.dtype),
         ]
 
         attribute_strings = [f"{key} = {value}" for key, value in attributes]
@@ -1,48 +1,176 @@
 #!/usr/bin/env python3
+import json
+import logging
 import os
+import shutil
 import tarfile
-from typing import Any
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple
 import warnings
 
 import itertools
 
+import click
 import yaml
-from metrics.workflows import run_parse_simulations, run_calculate_analysis
+from metrics.analysis.simulation_cache import SimulationCache
+from metrics.analysis.simulation_decoder import SimulationDecoder
+from metrics.workflows import run_parse_simulations_parallel, run_calculate_analysis_parallel
 
 
 warnings.simplefilter("ignore")
 
 
-def untar_files(folder_path: str) -> None:
+def find_archive_members(folder_path: str) -> Dict[str, Tuple[str, str]]:
     """
-    Untar all files in a specified folder path.
+    Find files in all archives in a specified folder path.
+
+    Archives holding a single file are streamed directly by the seed that reads them. A .tar.xz
+    archive cannot be read from the middle, so each read of a member decompresses the archive
+    from its start. Archives holding the files of more than one seed are therefore extracted
+    once into the folder instead, and their files are read from the extracted folder layout.
 
     Parameters
     ----------
     folder_path : str
         Path to the folder
+
+    Returns
+    -------
+    archive_members : Dict[str, Tuple[str, str]]
+        Archive path and member name, keyed by the file name of the member.
     """
-    for file_name in os.listdir(folder_path):
-        file_path = os.path.join(folder_path, file_name)
+    archive_members: Dict[str, Tuple[str, str]] = {}
+
+    if not os.path.isdir(folder_path):
+        return archive_members
+
+    for file_name in sorted(os.listdir(folder_path)):
         if file_name.endswith(".tar.xz"):
-            with tarfile.open(file_path, "r:xz") as tar:
-                tar.extractall(folder_path)
+            archive_path = os.path.join(folder_path, file_name)
+            member_names = list_archive_members(archive_path)
+
+            if len(member_names) > 1:
+                extract_archive_members(archive_path, member_names, folder_path)
+                continue
+
+            for member_name in member_names:
+                archive_members[os.path.basename(member_name)] = (archive_path, member_name)
 
+    return archive_members
 
-def recursive_file_delete(folder_path: str) -> None:
+
+def extract_archive_members(archive_path: str, member_names: List[str], folder_path: str) -> None:
     """
-    Recursively delete all files in a specified folder path.
+    Extract the file members of an archive into a folder in a single pass.
+
+    Members are extracted by file name, without their folders in the archive. Extracted files
+    newer than the archive are kept, so the archive is only decompressed once per version.
 
     Parameters
     ----------
+    archive_path : str
+        Path to the .tar.xz archive.
+    member_names : List[str]
+        Names of the file members of the archive.
     folder_path : str
-        Path to the folder
+        Path to the folder the members are extracted into.
+    """
+    archive_mtime = os.stat(archive_path).st_mtime_ns
+    targets = {
+        member_name: os.path.join(folder_path, os.path.basename(member_name))
+        for member_name in member_names
+    }
+    pending = {
+        member_name
+        for member_name, target in targets.items()
+        if not os.path.isfile(target) or os.stat(target).st_mtime_ns < archive_mtime
+    }
+
+    if not pending:
+        return
+
+    with tarfile.open(archive_path, "r|xz") as tar:
+        for member in tar:
+            if member.name not in pending:
+                continue
+
+            member_stream = tar.extractfile(member)
+            if member_stream is None:
+                continue
+
+            file_descriptor, temporary_path = tempfile.mkstemp(dir=folder_path, suffix=".tmp")
+            with member_stream, os.fdopen(file_descriptor, "wb") as target_file:
+                shutil.copyfileobj(member_stream, target_file)
+            os.replace(temporary_path, targets[member.name])
+
+
+def list_archive_members(archive_path: str) -> List[str]:
+    """
+    List the file members of an archive, using the sidecar member list when it is current.
+
+    Parameters
+    ----------
+    archive_path : str
+        Path to the .tar.xz archive.
+
+    Returns
+    -------
+    member_names : List[str]
+        Names of the file members, in archive order.
+    """
+    archive_stat = os.stat(archive_path)
+    source = [archive_stat.st_size, archive_stat.st_mtime_ns]
+    members_file = f"{archive_path}.members.json"
+
+    try:
+        with open(members_file, "r", encoding="utf-8") as members_json:
+            members = json.load(members_json)
+        if members["source"] == source:
+            return members["members"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    with tarfile.open(archive_path, "r|xz") as tar:
+        member_names = [member.name for member in tar if member.isfile()]
+
+    try:
+        with open(members_file, "w", encoding="utf-8") as members_json:
+            json.dump({"source": source, "members": member_names}, members_json)
+    except OSError:
+        pass
+
+    return member_names
+
+
+def get_seed_archives(
+    simulation: str, seed: str, archive_members: Dict[str, Dict[str, Tuple[str, str]]]
+) -> Dict[str, Tuple[str, str]]:
+    """
+    Select the archive members of the simulation files for a seed.
+
+    Parameters
+    ----------
+    simulation : str
+        Path to the simulation folder
+    seed : str
+        The seed of simulation file.
+    archive_members : Dict[str, Dict[str, Tuple[str, str]]]
+        Archive members of simulation folders, keyed by file suffix.
+
+    Returns
+    -------
+    seed_archives : Dict[str, Tuple[str, str]]
+        Archive path and member name of the simulation files, keyed by file suffix.
     """
-    for root, _, files in os.walk(folder_path):
-        for file in files:
-            if not file.endswith(".tar.xz"):
-                file_path = os.path.join(root, file)
-                os.remove(file_path)
+    key = os.path.basename(simulation)
+    seed_archives = {}
+
+    for suffix, members in archive_members.items():
+        file_name = f"{key}_{seed}{suffix}.json"
+        if file_name in members:
+            seed_archives[suffix] = members[file_name]
+
+    return seed_archives
 
 
 def make_list_based_on_resolution(resolution: Any, range_param: list, is_seed: bool) -> list:
@@ -82,7 +210,14 @@ def make_list_based_on_resolution(resolution: Any, range_param: list, is_seed: b
     return resolution_list
 
 
-def main() -> None:
+@click.command()
+@click.option(
+    "--jobs",
+    type=int,
+    default=None,
+    help="Number of processes used to parse and analyze seeds (overrides config).",
+)
+def main(jobs: Optional[int]) -> None:
     """
     TODO
     """
@@ -92,6 +227,25 @@ def main() -> None:
         config = yaml.safe_load(f)
         print(config)
 
+    logging.basicConfig(level=config.get("log_level", "INFO"))
+
+    if jobs is None:
+        jobs = config.get("jobs", 1)
+
+    cache = None
+    cache_section = config.get("cache")
+    if cache_section and cache_section.get("path"):
+        size_limit_mb = cache_section.get("size_limit_mb")
+        size_limit = None if size_limit_mb is None else int(size_limit_mb * 2**20)
+        cache = SimulationCache(
+            cache_section["path"], size_limit, cache_section.get("hash_contents", False)
+        )
+
+    decoder_section = config.get("decoder") or {}
+    decoder = SimulationDecoder(
+        decoder_section.get("backend", "auto"), decoder_section.get("mmap", False)
+    )
+
     experiment_section = config["experiment"]
 
     database = experiment_section["database"]
@@ -133,12 +287,24 @@ def main() -> None:
 
         database_path = f"{database}{population}_{context}_{cancer_heterogeneity_level}.db"
 
-        untar_files(simulation)
-        untar_files(f"{simulation}.PARAM")
+        archive_members = {
+            "": find_archive_members(simulation),
+            ".PARAM": find_archive_members(f"{simulation}.PARAM"),
+        }
 
         if config["parse"]:
-            for seed in seeds:
-                run_parse_simulations(database_path, simulation, seed, timepoints)
+            run_parse_simulations_parallel(
+                database_path,
+                simulation,
+                seeds,
+                timepoints,
+                jobs,
+                {seed: get_seed_archives(simulation, seed, archive_members) for seed in seeds},
+                cache,
+                decoder,
+                config.get("ingest", False),
+                config.get("clustered", False),
+            )
 
         if config["analyze"]:
             analysis_params = config["analysis"]
@@ -146,20 +312,21 @@ def main() -> None:
             samples = analysis_params["samples"]
             comparisons = analysis_params["comparisons"]
 
-            for seed in seeds:
-                run_calculate_analysis(
-                    database_path,
-                    simulation,
-                    seed,
-                    features,
-                    timepoints,
-                    observation_timepoints,
-                    samples,
-                    comparisons,
-                )
-
-        recursive_file_delete(simulation)
-        recursive_file_delete(f"{simulation}.PARAM")
+            run_calculate_analysis_parallel(
+                database_path,
+                simulation,
+                seeds,
+                features,
+                timepoints,
+                observation_timepoints,
+                samples,
+                comparisons,
+                jobs,
+                {seed: get_seed_archives(simulation, seed, archive_members) for seed in seeds},
+                decoder,
+                config.get("chunk_size"),
+                config.get("analysis_workers", 1),
+            )
 
 
 if __name__ == "__main__":
@@ -1,5 +1,6 @@
 from typing import List
 
+import numpy as np
 import pandas as pd
 
 from metrics.analysis.simulation import Simulation
@@ -27,7 +28,10 @@ class Sample:
         :
             Extracted sample data.
         """
-        szudzik_coordinates = [Simulation.get_szudzik_pair(u, v) for u, v, _ in coordinates]
+        uvw_coordinates = np.array(coordinates, dtype=np.int64).reshape(-1, 3)
+        szudzik_coordinates = Simulation.get_szudzik_pairs(
+            uvw_coordinates[:, 0], uvw_coordinates[:, 1]
+        )
 
         sample_data = data[data["coordinate"].isin(szudzik_coordinates)]
         sample_data = sample_data.reset_index(drop=True)
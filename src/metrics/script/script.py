@@ -1,8 +1,9 @@
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
 import numpy as np
 import pandas as pd
 
+from metrics.analysis.analysis import Analysis
 from metrics.analysis.database import Database
 
 
@@ -73,19 +74,19 @@ class Script:
         combined_table : pd.DataFrame
             Combined selected dataframe.
         """
-        query_list: List[str] = []
+        filters: Dict[str, Any] = {}
         if reference_time is not None:
-            query_list.append(f"reference_time = {reference_time}")
+            filters["reference_time"] = reference_time
         if observation_time is not None:
-            query_list.append(f"obervation_time = {observation_time}")
+            filters["obervation_time"] = observation_time
         if feature is not None:
-            query_list.append(f"feature = '{feature}'")
+            filters["feature"] = feature
         if comparison is not None:
-            query_list.append(f"comparison_group = '{' | '.join(comparison.values())}'")
+            filters["comparison_group"] = " | ".join(comparison.values())
 
         combined_table: list = []
         for database in database_list:
-            data = database.execute_query(f"SELECT * FROM stats WHERE {' AND '.join(query_list)}")
+            data = database.load("stats", filters, table_spec=Analysis)
 
             # Add context column and change key column
             data["context"] = context
@@ -98,7 +99,6 @@ class Script:
             data = data.drop("key", axis=1)
 
             data["heterogeneity"] = data["heterogeneity"].astype(int)
-            data["divergence"] = data["divergence"].replace("NULL", np.nan).astype(float)
 
             combined_table.append(data)
 
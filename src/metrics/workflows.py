@@ -1,20 +1,38 @@
-from typing import List
+from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+import pandas as pd
 
 from metrics.analysis.analysis import Analysis
+from metrics.analysis.analysis_executor import AnalysisExecutor
+from metrics.analysis.analysis_plan import AnalysisPlan
 from metrics.analysis.database import Database
-from metrics.analysis.experiment import Experiment
 from metrics.analysis.simulation import Simulation
+from metrics.analysis.simulation_cache import SimulationCache
+from metrics.analysis.simulation_decoder import SimulationDecoder
 
 SIMULATION_TABLE = "simulations"
 ANALYSIS_TABLE = "stats"
 
 
 def run_parse_simulations(
-    database_file: str, simulation_path: str, seed: str, timepoints: List[float]
+    database_file: str,
+    simulation_path: str,
+    seed: str,
+    timepoints: List[float],
+    archives: Optional[Dict[str, Tuple[str, str]]] = None,
+    cache: Optional[SimulationCache] = None,
+    decoder: Optional[SimulationDecoder] = None,
+    ingest: bool = False,
+    clustered: bool = False,
+    create_indexes: bool = True,
 ) -> None:
     """
     Parse the simulation and write data into databse file.
 
+    In bulk ingest mode, table indexes are built after the data is loaded.
+
     Parameters
     ----------
     database_file :
@@ -25,19 +43,161 @@ def run_parse_simulations(
         The seed of simulation file.
     timepoints :
         The timepoints to parse the simulation data.
+    archives :
+        Archive and member name of the simulation files, keyed by file suffix.
+    cache :
+        Cache of parsed timepoints.
+    decoder :
+        Decoder for the JSON contents of simulation files.
+    ingest :
+        True to write data in bulk ingest mode, False otherwise.
+    clustered :
+        True to store the simulation table clustered by its primary key, False otherwise.
+    create_indexes :
+        True to create the simulation table indexes, False to leave them to the caller.
     """
     simulation_file = f"{simulation_path}_{seed}.json"
 
     database = Database(database_file)
-    simulation = Simulation(simulation_file)
-    # database.drop_table(SIMULATION_TABLE)
-    database.create_table(SIMULATION_TABLE, simulation)
+    simulation = Simulation(simulation_file, archives, cache, decoder=decoder)
+
+    with database.ingest() if ingest else database.transaction():
+        # database.drop_table(SIMULATION_TABLE)
+        database.create_table(
+            SIMULATION_TABLE, Simulation, create_indexes and not ingest, clustered
+        )
+
+        # print(simulation)
+
+        for simulation_df in simulation.parse_timepoints(timepoints):
+            database.add_dataframe(SIMULATION_TABLE, simulation_df)
+
+        if create_indexes and ingest:
+            database.create_indexes(SIMULATION_TABLE, Simulation, clustered)
+
+
+def run_parse_simulations_parallel(
+    database_file: str,
+    simulation_path: str,
+    seeds: List[str],
+    timepoints: List[float],
+    jobs: int,
+    archives: Optional[Dict[str, Dict[str, Tuple[str, str]]]] = None,
+    cache: Optional[SimulationCache] = None,
+    decoder: Optional[SimulationDecoder] = None,
+    ingest: bool = False,
+    clustered: bool = False,
+) -> None:
+    """
+    Parse simulations of multiple seeds in a process pool and write data into database file.
+
+    Each worker process writes its seed to a separate shard database file, so writes do not
+    contend for the database lock. Shards are then merged into the database file in seed order
+    and removed, and table indexes are built once after all seeds are merged.
+
+    Parameters
+    ----------
+    database_file :
+        File path to the database file.
+    simulation_path :
+        File path to a folder of simulation files.
+    seeds :
+        The seeds of simulation files.
+    timepoints :
+        The timepoints to parse the simulation data.
+    jobs :
+        Number of worker processes.
+    archives :
+        Archive and member name of the simulation files, keyed by seed and file suffix.
+    cache :
+        Cache of parsed timepoints.
+    decoder :
+        Decoder for the JSON contents of simulation files.
+    ingest :
+        True to write data in bulk ingest mode, False otherwise.
+    clustered :
+        True to store the simulation table clustered by its primary key, False otherwise.
+    """
+    archives = archives or {}
+    database = Database(database_file)
+
+    if jobs <= 1:
+        for seed in seeds:
+            run_parse_simulations(
+                database_file,
+                simulation_path,
+                seed,
+                timepoints,
+                archives.get(seed),
+                cache,
+                decoder,
+                ingest,
+                clustered,
+                not ingest,
+            )
+
+        if ingest and seeds:
+            with database.ingest():
+                database.create_indexes(SIMULATION_TABLE, Simulation, clustered)
+
+        return
+
+    shard_files = [get_shard_file(database_file, seed) for seed in seeds]
+    remove_shard_files(shard_files)
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        results = executor.map(
+            run_parse_simulations,
+            shard_files,
+            [simulation_path] * len(seeds),
+            seeds,
+            [timepoints] * len(seeds),
+            [archives.get(seed) for seed in seeds],
+            [cache] * len(seeds),
+            [decoder] * len(seeds),
+            [ingest] * len(seeds),
+            [clustered] * len(seeds),
+            [False] * len(seeds),
+        )
+        list(results)
+
+    database.merge(shard_files, SIMULATION_TABLE, Simulation, clustered, True, ingest)
+    remove_shard_files(shard_files)
+
+
+def get_shard_file(database_file: str, name: str) -> str:
+    """
+    Get file path to a shard of a database file.
+
+    Parameters
+    ----------
+    database_file :
+        File path to the database file.
+    name :
+        Name of the shard, such as the seed written to the shard.
+
+    Returns
+    -------
+    :
+        File path to the shard database file, next to the database file.
+    """
+    root, extension = os.path.splitext(database_file)
+    return f"{root}.shard_{name}{extension}"
 
-    # print(simulation)
 
-    for timepoint in timepoints:
-        simulation_df = simulation.parse_timepoint(timepoint)
-        database.add_dataframe(SIMULATION_TABLE, simulation_df)
+def remove_shard_files(shard_files: List[str]) -> None:
+    """
+    Remove shard database files that have been merged.
+
+    Parameters
+    ----------
+    shard_files :
+        File paths to the shard database files.
+    """
+    for shard_file in shard_files:
+        for file_name in [shard_file, f"{shard_file}-wal", f"{shard_file}-shm"]:
+            if os.path.exists(file_name):
+                os.remove(file_name)
 
 
 def run_calculate_analysis(
@@ -49,10 +209,19 @@ def run_calculate_analysis(
     observation_timepoints: list[float],
     samples: dict,
     comparisons: dict,
+    archives: Optional[Dict[str, Tuple[str, str]]] = None,
+    decoder: Optional[SimulationDecoder] = None,
+    chunk_size: Optional[int] = None,
+    output_path: Optional[str] = None,
+    workers: int = 1,
 ) -> None:
     """
     Run the statistical test on data with the specified feature and sampling method.
 
+    The comparisons and timepoints are expanded into an analysis plan, so each sample is
+    extracted once per timepoint. Simulation data are streamed from the database one timepoint
+    at a time, and the statistics of each timepoint can be calculated in a process pool.
+
     Parameters
     ----------
     database_path :
@@ -71,40 +240,148 @@ def run_calculate_analysis(
         Sample parameter definitions.
     comparisons :
         The comparisons to perform.
+    archives :
+        Archive and member name of the simulation files, keyed by file suffix.
+    decoder :
+        Decoder for the JSON contents of simulation files.
+    chunk_size :
+        Number of rows read from the database per chunk.
+    output_path :
+        File path to the database file for writing stats, if different from the database file
+        for reading simulation.
+    workers :
+        Number of processes used to calculate the statistics of each timepoint.
     """
     simulation_file = f"{simulation_path}_{seed}.json"
 
     database = Database(database_path)
-    simulation = Simulation(simulation_file)
+    output = Database(output_path) if output_path is not None else database
+    simulation = Simulation(simulation_file, archives, lazy=True, decoder=decoder)
 
-    data = database.load_dataframe(SIMULATION_TABLE, simulation.key)
-    data = data[data["seed"] == int(seed)]
+    feature_objects = [Simulation.get_feature_object(feature) for feature in features]
+    plan = AnalysisPlan(
+        simulation, feature_objects, timepoints, observation_timepoints, samples, comparisons
+    )
+
+    filters = {"key": simulation.key, "seed": int(seed), "time": plan.timepoints}
+    columns = Analysis.get_data_columns(feature_objects)
+    groups = database.iter_groups(
+        SIMULATION_TABLE,
+        ["time"],
+        filters,
+        table_spec=Simulation,
+        columns=columns,
+        chunk_size=chunk_size,
+    )
+
+    # Stream one timepoint at a time, keeping results in comparison and timepoint order.
+    results: List[Tuple[int, pd.DataFrame]] = []
+
+    with AnalysisExecutor(plan, workers) as executor:
+        for (time,), data in groups:
+            results.extend(executor.run(data, time))
 
     # database.drop_table(ANALYSIS_TABLE)
 
-    for comparison in comparisons.values():
-        # for key, value in comparison.items():
-        #    print(f"{key} = {value}")
-        # print(f"seed = {seed}")
-        # print(f"reference timepoint | observation timepoint")
-        # print("--------------------------------------------")
-        for timepoint in timepoints:
-            for observation_timepoint in observation_timepoints:
-                if timepoint == observation_timepoint:
-                    experiment = Experiment(comparison, samples, simulation)
-
-                    analysis = Analysis(
-                        simulation.key,
-                        experiment,
-                        timepoint,
-                        observation_timepoint,
-                        [Simulation.get_feature_object(feature) for feature in features],
-                    )
-                    analysis_df = analysis.calculate_features(data)
-
-                    database.create_table(ANALYSIS_TABLE, analysis)
-                    database.add_dataframe(ANALYSIS_TABLE, analysis_df)
-
-                    # print(f"{timepoint}{' ' *(20-len(str(timepoint)))}| {observation_timepoint}")
-
-        # print("\n")
+    with output.transaction():
+        output.create_table(ANALYSIS_TABLE, Analysis)
+
+        for _, analysis_df in sorted(results, key=lambda result: result[0]):
+            output.add_dataframe(ANALYSIS_TABLE, analysis_df)
+
+
+def run_calculate_analysis_parallel(
+    database_path: str,
+    simulation_path: str,
+    seeds: List[str],
+    features: List[str],
+    timepoints: List[float],
+    observation_timepoints: List[float],
+    samples: dict,
+    comparisons: dict,
+    jobs: int,
+    archives: Optional[Dict[str, Dict[str, Tuple[str, str]]]] = None,
+    decoder: Optional[SimulationDecoder] = None,
+    chunk_size: Optional[int] = None,
+    workers: int = 1,
+) -> None:
+    """
+    Run the statistical test on simulations of multiple seeds in a process pool.
+
+    Each worker process reads simulation data from the database file and writes stats of its
+    seed to a separate shard database file. Shards are then merged into the database file in
+    seed order and removed.
+
+    Parameters
+    ----------
+    database_path :
+        File path to the database file for reading simulation and for writing stats.
+    simulation_path :
+        File path to a folder of simulation files.
+    seeds :
+        The seeds of simulation files.
+    features :
+        The name of the features.
+    timepoints :
+        The timepoints to perform statistical test.
+    observation_timepoints :
+        The timepoints of observations to perform statistical test.
+    samples :
+        Sample parameter definitions.
+    comparisons :
+        The comparisons to perform.
+    jobs :
+        Number of worker processes.
+    archives :
+        Archive and member name of the simulation files, keyed by seed and file suffix.
+    decoder :
+        Decoder for the JSON contents of simulation files.
+    chunk_size :
+        Number of rows read from the database per chunk.
+    workers :
+        Number of processes used to calculate the statistics of each timepoint, if seeds are
+        analyzed one at a time.
+    """
+    archives = archives or {}
+
+    if jobs <= 1:
+        for seed in seeds:
+            run_calculate_analysis(
+                database_path=database_path,
+                simulation_path=simulation_path,
+                seed=seed,
+                features=features,
+                timepoints=timepoints,
+                observation_timepoints=observation_timepoints,
+                samples=samples,
+                comparisons=comparisons,
+                archives=archives.get(seed),
+                decoder=decoder,
+                chunk_size=chunk_size,
+                workers=workers,
+            )
+        return
+
+    shard_files = [get_shard_file(database_path, f"stats_{seed}") for seed in seeds]
+    remove_shard_files(shard_files)
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        results = executor.map(
+            run_calculate_analysis,
+            [database_path] * len(seeds),
+            [simulation_path] * len(seeds),
+            seeds,
+            [features] * len(seeds),
+            [timepoints] * len(seeds),
+            [observation_timepoints] * len(seeds),
+            [samples] * len(seeds),
+            [comparisons] * len(seeds),
+            [archives.get(seed) for seed in seeds],
+            [decoder] * len(seeds),
+            [chunk_size] * len(seeds),
+            shard_files,
+        )
+        list(results)
+
+    Database(database_path).merge(shard_files, ANALYSIS_TABLE, Analysis)
+    remove_shard_files(shard_files)
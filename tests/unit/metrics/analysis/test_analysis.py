@@ -41,44 +41,22 @@ class TestAnalysis(unittest.TestCase):
 
         continuous_feature_mock = Mock(spec=ContinuousFeature)
 
-        def side_effect(*args, **kwargs):
-            if continuous_feature_mock.write_feature_data.call_count == 1:
-                return [
-                    [
-                        "comparison_key",
-                        key,
-                        0,
-                        timepoint,
-                        timepoint,
-                        "key",
-                        "key",
-                        feature_name,
-                        None,
-                        1.0,
-                        1.0,
-                    ]
-                ]
-
-            elif continuous_feature_mock.write_feature_data.call_count == 2:
-                return [
-                    [
-                        "comparison_key",
-                        key,
-                        1,
-                        timepoint,
-                        timepoint,
-                        "key",
-                        "key",
-                        feature_name,
-                        None,
-                        1.0,
-                        1.0,
-                    ]
-                ]
-
-        # Set the side effect function on the mock
-
-        continuous_feature_mock.write_feature_data.side_effect = side_effect
+        continuous_feature_mock.write_grouped_feature_data.return_value = [
+            [
+                "comparison_key",
+                key,
+                seed,
+                timepoint,
+                timepoint,
+                "key",
+                "key",
+                feature_name,
+                None,
+                1.0,
+                1.0,
+            ]
+            for seed in [0, 1]
+        ]
         continuous_feature_mock.name = feature_name
 
         simulation_mock = Mock(spec=Simulation)
@@ -107,16 +85,20 @@ class TestAnalysis(unittest.TestCase):
         expected_df = pd.DataFrame(expected_dict)
 
         self.assertTrue(expected_df.equals(returned_df))
-        compare_feature_calls = continuous_feature_mock.compare_feature_info.call_args_list
-
-        for seed, call in enumerate(compare_feature_calls):
-            (sample_arg, tumor_arg), _ = call
-
-            self.assertTrue(sample_data[(sample_data["seed"] == seed)].equals(sample_arg))
-
-            self.assertTrue(
-                data[(data["time"] == timepoint) & (data["seed"] == seed)].equals(tumor_arg)
-            )
+        continuous_feature_mock.write_feature_data.assert_not_called()
+
+        (
+            data_lists,
+            sample_values,
+            sample_offsets,
+            reference_values,
+            reference_offsets,
+        ), _ = continuous_feature_mock.write_grouped_feature_data.call_args
+        self.assertEqual([0, 1], [data_list[2] for data_list in data_lists])
+        self.assertEqual([3001, 2500, 3050, 2550], list(sample_values))
+        self.assertEqual([0, 2, 4], list(sample_offsets))
+        self.assertEqual([3001, 2500, 2600, 3050, 2550, 2650], list(reference_values))
+        self.assertEqual([0, 3, 6], list(reference_offsets))
 
     @mock.patch("metrics.analysis.analysis.Experiment")
     def test_calculate_feature_returns_discrete_feature_data(self, experiment_mock):
@@ -150,7 +132,7 @@ class TestAnalysis(unittest.TestCase):
         needle_sample_mock.get_sample_key.return_value = "key"
 
         discrete_feature_mock = Mock(spec=DiscreteFeature)
-        discrete_feature_mock.write_feature_data.return_value = [
+        discrete_feature_mock.write_grouped_feature_data.return_value = [
             [
                 "comparison_key",
                 key,
@@ -207,3 +189,50 @@ class TestAnalysis(unittest.TestCase):
         expected_df = pd.DataFrame(expected_dict)
 
         self.assertTrue(expected_df.equals(returned_df))
+
+    def test_get_data_columns_returns_grouping_and_feature_columns(self):
+        features = [
+            ContinuousFeature("volume", "REAL", False),
+            DiscreteFeature("state", "TEXT", False),
+            ContinuousFeature("coordinate", "INTEGER", False),
+        ]
+
+        columns = Analysis.get_data_columns(features)
+
+        self.assertEqual(["key", "seed", "time", "coordinate", "volume", "state"], columns)
+
+    @mock.patch("metrics.analysis.analysis.Experiment")
+    def test_calculate_features_extracts_samples_once(self, experiment_mock):
+        key = "SIMULATION_FILE"
+        data = pd.DataFrame(
+            {
+                "key": [key] * 4,
+                "seed": [0, 0, 1, 1],
+                "time": [1.0] * 4,
+                "volume": [1.0, 2.0, 3.0, 4.0],
+                "cycle": [5.0, 6.0, 7.0, 8.0],
+            }
+        )
+
+        punch_sample_mock = Mock(spec=SamplePunch)
+        punch_sample_mock.sample_data.return_value = data.iloc[[0, 2]]
+        punch_sample_mock.get_sample_key.return_value = "punch"
+        experiment_mock.create_experiment_dict.return_value = {
+            "reference": Mock(spec=Simulation),
+            "observation": punch_sample_mock,
+        }
+        experiment_mock.comparison_group = "simulation | punch"
+
+        features = [
+            ContinuousFeature("volume", "REAL", False),
+            ContinuousFeature("cycle", "REAL", True),
+        ]
+        analysis = Analysis(key, experiment_mock, 1.0, 1.0, features)
+
+        returned_df = analysis.calculate_features(data)
+
+        experiment_mock.create_experiment_dict.assert_called_once()
+        punch_sample_mock.select_sample_locations.assert_called_once()
+        punch_sample_mock.sample_data.assert_called_once()
+        self.assertEqual(["volume", "volume", "cycle", "cycle"], list(returned_df["feature"]))
+        self.assertEqual([0, 1, 0, 1], list(returned_df["seed"]))
@@ -0,0 +1,135 @@
+import unittest
+from unittest import mock
+from unittest.mock import Mock
+
+import numpy as np
+import pandas as pd
+
+from metrics.analysis.analysis_executor import AnalysisExecutor
+from metrics.analysis.analysis_plan import AnalysisPlan
+from metrics.analysis.group_index import GroupIndex
+from metrics.analysis.simulation import Simulation
+from metrics.feature.continuous_feature import ContinuousFeature
+from metrics.feature.discrete_feature import DiscreteFeature
+
+
+class TestAnalysisExecutor(unittest.TestCase):
+    def setUp(self):
+        self.data = pd.DataFrame(
+            {
+                "key": ["SIMULATION_FILE"] * 6,
+                "seed": np.array([1, 1, 1, 0, 0, 0], dtype=np.int16),
+                "time": [1.0] * 6,
+                "coordinate": [0, 1, 2, 0, 1, 2],
+                "population": ["A", "B", "A", "B", "B", "A"],
+                "volume": np.array([1.0, 2.0, 3.0, 4.0, 5.0, 6.0], dtype=np.float32),
+                "cycle": np.array([6.0, 5.0, 4.0, 3.0, 2.0, 1.0], dtype=np.float32),
+            }
+        ).astype({"key": "category", "population": "category"})
+
+        simulation = Mock(spec=Simulation)
+        simulation.key = "SIMULATION_FILE"
+        simulation.max_radius = 10
+
+        samples = {
+            "punch_2": {"sample_shape": "punch", "sample_radius": 2, "punch_center": [0, 0, 0]}
+        }
+        comparisons = {
+            0: {"reference": "simulation", "observation": "punch_2"},
+            1: {"reference": "punch_2", "observation": "simulation"},
+        }
+        features = [
+            ContinuousFeature("volume", "REAL", False),
+            DiscreteFeature("population", "TEXT", False),
+            ContinuousFeature("cycle", "REAL", False),
+        ]
+        self.plan = AnalysisPlan(simulation, features, [1.0], [1.0], samples, comparisons)
+
+    def test_share_data_given_data_attaches_without_copying(self):
+        blocks, descriptor = AnalysisExecutor.share_data(self.data)
+
+        try:
+            attached_blocks, attached = AnalysisExecutor.attach_data(descriptor)
+            pd.testing.assert_frame_equal(self.data, attached)
+
+            for block, (name, _) in zip(attached_blocks, attached.items()):
+                values = attached[name]
+                values = values.cat.codes if values.dtype == "category" else values
+                buffer = np.frombuffer(block.buf, dtype=np.uint8)
+                self.assertTrue(np.shares_memory(values.to_numpy(), buffer))
+
+            del attached, values, buffer
+            for block in attached_blocks:
+                block.close()
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+    def test_run_task_returns_feature_data_of_job(self):
+        index = GroupIndex(self.data)
+        expected = self.plan.run(index, 1.0)
+        blocks, descriptor = AnalysisExecutor.share_data(index.data)
+
+        try:
+            AnalysisExecutor.init_worker(self.plan)
+
+            with mock.patch.object(
+                AnalysisPlan, "extract", autospec=True, side_effect=AnalysisPlan.extract
+            ) as extract_mock:
+                for position, (_, expected_df) in enumerate(expected):
+                    frames = [
+                        AnalysisExecutor.run_task(descriptor, 1.0, position, feature_index)
+                        for feature_index in range(3)
+                    ]
+                    pd.testing.assert_frame_equal(expected_df, pd.concat(frames))
+
+            extract_mock.assert_called_once()
+        finally:
+            AnalysisExecutor.release_worker()
+            AnalysisExecutor.init_worker(None)
+
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+    def test_release_worker_closes_attached_blocks(self):
+        blocks, descriptor = AnalysisExecutor.share_data(self.data)
+
+        try:
+            AnalysisExecutor.init_worker(self.plan)
+            AnalysisExecutor.run_task(descriptor, 1.0, 0, 0)
+            attached_blocks = AnalysisExecutor.worker_state["blocks"]
+
+            AnalysisExecutor.release_worker()
+
+            self.assertEqual({}, AnalysisExecutor.worker_state)
+            for block in attached_blocks:
+                self.assertIsNone(block.buf)
+        finally:
+            AnalysisExecutor.init_worker(None)
+
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+    def test_run_task_given_uninitialized_worker_raises_value_error(self):
+        AnalysisExecutor.init_worker(None)
+
+        with self.assertRaises(ValueError):
+            AnalysisExecutor.run_task([], 1.0, 0, 0)
+
+    def test_run_given_one_worker_runs_plan(self):
+        with AnalysisExecutor(self.plan, 1) as executor:
+            self.assertIsNone(executor.executor)
+            results = executor.run(self.data, 1.0)
+
+        self.assertEqual([0, 1], [order for order, _ in results])
+        self.assertEqual(
+            ["volume", "volume", "population"], list(results[0][1]["feature"].iloc[:3])
+        )
+        self.assertEqual(["cycle", "cycle"], list(results[0][1]["feature"].iloc[-2:]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+from unittest import mock
+from unittest.mock import Mock
+
+import pandas as pd
+
+from metrics.analysis.analysis_plan import AnalysisPlan
+from metrics.analysis.group_index import GroupIndex
+from metrics.analysis.simulation import Simulation
+from metrics.feature.continuous_feature import ContinuousFeature
+from metrics.sample.sample_punch import SamplePunch
+
+
+class TestAnalysisPlan(unittest.TestCase):
+    def setUp(self):
+        self.simulation = Mock(spec=Simulation)
+        self.simulation.key = "SIMULATION_FILE"
+        self.simulation.max_radius = 10
+
+        self.samples = {
+            "punch_1": {"sample_shape": "punch", "sample_radius": 1, "punch_center": [0, 0, 0]},
+            "punch_2": {"sample_shape": "punch", "sample_radius": 2, "punch_center": [0, 0, 0]},
+        }
+        self.comparisons = {
+            0: {"reference": "simulation", "observation": "punch_1"},
+            1: {"reference": "punch_2", "observation": "punch_1"},
+            2: {"reference": "simulation", "observation": "punch_1"},
+        }
+        self.features = [ContinuousFeature("volume", "REAL", False)]
+
+    def test_init_deduplicates_timepoints_comparisons_and_samples(self):
+        with mock.patch.object(
+            SamplePunch, "select_sample_locations", autospec=True, return_value=[(0, 0, 0)]
+        ) as select_mock:
+            plan = AnalysisPlan(
+                self.simulation,
+                self.features,
+                [2.0, 1.0, 3.0, 1.0],
+                [1.0, 2.0],
+                self.samples,
+                self.comparisons,
+            )
+
+        self.assertEqual([2.0, 1.0], plan.timepoints)
+        self.assertEqual(2, len(plan.experiments))
+        self.assertEqual(["simulation", "punch_1", "punch_2"], list(plan.sources))
+        self.assertIs(self.simulation, plan.sources["simulation"])
+        self.assertEqual(2, select_mock.call_count)
+        self.assertEqual(["simulation", "punch_1", "punch_2"], plan.extractions[1.0])
+        self.assertEqual([0, 2], [order for order, _ in plan.jobs[2.0]])
+        self.assertEqual([1, 3], [order for order, _ in plan.jobs[1.0]])
+
+    def test_run_extracts_each_sample_once(self):
+        data = pd.DataFrame(
+            {
+                "key": ["SIMULATION_FILE"] * 6,
+                "seed": [0, 0, 0, 1, 1, 1],
+                "time": [1.0] * 6,
+                "coordinate": [0, 1, 2, 0, 1, 2],
+                "volume": [1.0, 2.0, 3.0, 4.0, 5.0, 6.0],
+            }
+        )
+        plan = AnalysisPlan(
+            self.simulation, self.features, [1.0], [1.0], self.samples, self.comparisons
+        )
+
+        with mock.patch.object(
+            SamplePunch, "sample_data", side_effect=lambda _, simulation_data: simulation_data
+        ) as sample_data_mock:
+            results = plan.run(GroupIndex(data), 1.0)
+
+        self.assertEqual(2, sample_data_mock.call_count)
+        self.assertEqual([0, 1], [order for order, _ in results])
+
+        first_df = results[0][1]
+        self.assertEqual(["simulation | punch_1"] * 2, list(first_df["comparison_group"]))
+        self.assertEqual([0, 1], list(first_df["seed"]))
+        self.assertEqual(["punch-R2-(0, 0, 0)"] * 2, list(results[1][1]["reference_key"]))
+
+    def test_run_given_unplanned_timepoint_returns_no_results(self):
+        plan = AnalysisPlan(
+            self.simulation, self.features, [1.0], [1.0], self.samples, self.comparisons
+        )
+
+        self.assertEqual([], plan.run(GroupIndex(pd.DataFrame(columns=GroupIndex.COLUMNS)), 2.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,18 @@
+import os
+import tempfile
+import warnings
+
 import unittest
 from unittest import mock
 
+import numpy as np
 import pandas as pd
 import sqlite3
 
+from metrics.analysis.analysis import Analysis
 from metrics.analysis.database import Database
+from metrics.analysis.database_reader import DatabaseReader
+from metrics.analysis.simulation import Simulation
 from metrics.feature.feature import Feature
 
 
@@ -40,6 +48,127 @@ class TestDatabase(unittest.TestCase):
         sqlite3_mock.connect.assert_called_with(database_name, uri=True)
         self.assertIsInstance(connection, sqlite3.Connection)
 
+    @mock.patch("metrics.analysis.database.sqlite3")
+    def test_context_manager_reuses_connection(self, sqlite3_mock):
+        connection_object = mock.Mock(spec=sqlite3.Connection)
+        sqlite3_mock.connect.return_value = connection_object
+        connection_object.cursor.return_value = mock.Mock(spec=sqlite3.Cursor)
+
+        with Database("test.db") as database:
+            database.drop_table("fake_table")
+            database.delete_data_from_table("fake_table")
+            connection_object.close.assert_not_called()
+
+        sqlite3_mock.connect.assert_called_once_with("test.db", uri=True)
+        connection_object.close.assert_called_once()
+        self.assertIsNone(database.connection)
+
+    @mock.patch("metrics.analysis.database.sqlite3")
+    def test_transaction_commits_once(self, sqlite3_mock):
+        connection_object = mock.Mock(spec=sqlite3.Connection)
+        sqlite3_mock.connect.return_value = connection_object
+        connection_object.cursor.return_value = mock.Mock(spec=sqlite3.Cursor)
+
+        database = Database("test.db")
+        with database.transaction():
+            with database.transaction():
+                database.drop_table("fake_table")
+            database.delete_data_from_table("fake_table")
+            connection_object.commit.assert_not_called()
+
+        sqlite3_mock.connect.assert_called_once()
+        connection_object.commit.assert_called()
+        connection_object.close.assert_called_once()
+
+    def test_transaction_given_exception_rolls_back(self):
+        with tempfile.TemporaryDirectory() as directory:
+            database = Database(os.path.join(directory, "test.db"))
+            database.add_dataframe("fake_table", pd.DataFrame({"x": [1]}))
+
+            with self.assertRaises(RuntimeError), database:
+                with database.transaction():
+                    database.add_dataframe("fake_table", pd.DataFrame({"x": [2, 3]}))
+                    raise RuntimeError()
+
+            data = database.execute_query("SELECT * FROM fake_table")
+
+            self.assertEqual([1], list(data["x"]))
+
+    def test_transaction_given_abandoned_generator_rolls_back(self):
+        with tempfile.TemporaryDirectory() as directory:
+            database = Database(os.path.join(directory, "test.db"))
+            database.add_dataframe("fake_table", pd.DataFrame({"x": [1]}))
+
+            def add_rows():
+                with database.transaction():
+                    database.add_dataframe("fake_table", pd.DataFrame({"x": [2, 3]}))
+                    yield
+
+            with database:
+                rows = add_rows()
+                next(rows)
+                rows.close()
+
+                self.assertEqual(0, database.transaction_depth)
+
+            data = database.execute_query("SELECT * FROM fake_table")
+
+            self.assertEqual([1], list(data["x"]))
+
+    def test_add_dataframe_given_transaction_inserts_rows(self):
+        with tempfile.TemporaryDirectory() as directory:
+            database = Database(os.path.join(directory, "test.db"))
+            dataframe = pd.DataFrame(
+                {
+                    "x": pd.Categorical(["a", "b"]),
+                    "y": pd.array([1.5, None], dtype="float32"),
+                    "z": pd.array([1, 2], dtype="int8"),
+                }
+            )
+
+            with database.transaction() as connection:
+                connection.execute("CREATE TABLE fake_table (x TEXT, y REAL, z INTEGER);")
+                database.add_dataframe("fake_table", dataframe)
+
+            data = database.execute_query("SELECT * FROM fake_table")
+
+            self.assertEqual(["a", "b"], list(data["x"]))
+            self.assertEqual(1.5, data["y"][0])
+            self.assertTrue(pd.isna(data["y"][1]))
+            self.assertEqual([1, 2], list(data["z"]))
+
+    def test_ingest_inserts_batches_and_restores_pragmas(self):
+        with tempfile.TemporaryDirectory() as directory:
+            database = Database(os.path.join(directory, "test.db"))
+            dataframe = pd.DataFrame({"x": range(10), "y": [0.5, float("nan")] * 5})
+
+            with database:
+                settings = [
+                    database.connection.execute(f"PRAGMA {pragma};").fetchone()[0]
+                    for pragma in ["synchronous", "cache_size"]
+                ]
+
+                with self.assertLogs("metrics.analysis.database", "INFO") as logs:
+                    with database.ingest() as connection:
+                        connection.execute("CREATE TABLE fake_table (x INTEGER, y REAL);")
+                        self.assertEqual(
+                            "wal", connection.execute("PRAGMA journal_mode;").fetchone()[0]
+                        )
+                        database.insert_dataframe("fake_table", dataframe, batch_size=4)
+
+                restored = [
+                    database.connection.execute(f"PRAGMA {pragma};").fetchone()[0]
+                    for pragma in ["synchronous", "cache_size"]
+                ]
+
+            data = database.execute_query("SELECT * FROM fake_table")
+
+            self.assertEqual(settings, restored)
+            self.assertEqual(list(range(10)), list(data["x"]))
+            self.assertEqual(5, data["y"].isna().sum())
+            self.assertEqual(4, len(logs.output))
+            self.assertIn("Ingested 10 rows", logs.output[-1])
+
     @mock.patch("metrics.analysis.database.sqlite3")
     def test_create_table_creates_table(self, sqlite3_mock):
         connection_object = mock.Mock(spec=sqlite3.Connection)
@@ -55,6 +184,7 @@ class TestDatabase(unittest.TestCase):
 
         object = mock.Mock()
         object.get_feature_list.return_value = [feature]
+        object.get_index_list.return_value = []
 
         query = f"CREATE TABLE IF NOT EXISTS {table_name} ({feature_string});"
 
@@ -125,40 +255,186 @@ class TestDatabase(unittest.TestCase):
 
         table_name = "fake_table"
         select_key = "y"
-        input_query = f"SELECT * FROM {table_name} WHERE key= '{select_key}';"
+        input_query = f"SELECT * FROM {table_name} WHERE key = ?;"
         data = Database("test.db").load_dataframe(table_name, select_key)
 
         self.assertEqual(dataframe, data)
-        pd_mock.read_sql_query.assert_called_with(sql=input_query, con=connection_object)
+        pd_mock.read_sql_query.assert_called_with(
+            sql=input_query, con=connection_object, params=[select_key]
+        )
         connection_object.commit.assert_called()
         connection_object.close.assert_called()
 
-    def test_make_create_table_query_creates_query(self):
-        table_name = "fake_table"
-        feature_string = "seed integer NOT NULL"
-        feature_string2 = "x y z"
-
-        feature = mock.Mock(spec=Feature)
-        feature.make_query.return_value = feature_string
-        feature2 = mock.Mock(spec=Feature)
-        feature2.make_query.return_value = feature_string2
-
-        fake_object = mock.Mock()
-        fake_object.get_feature_list.return_value = [
-            feature,
-            feature2,
-        ]
-
-        expected = f"CREATE TABLE IF NOT EXISTS {table_name} ({feature_string},{feature_string2});"
-        found = Database.make_create_table_query(table_name, fake_object)
-        self.assertEqual(expected, found)
-
-    def test_make_select_from_query_returns_query(self):
-        table_name = "fake_table"
-        fake_key = "y"
-        expected = f"SELECT * FROM {table_name} WHERE key= '{fake_key}';"
-        found = Database.make_select_from_query(table_name, fake_key)
-        self.assertEqual(expected, found)
+    def test_load_given_filters_and_ranges_returns_selected_rows(self):
+        with tempfile.TemporaryDirectory() as directory:
+            database = Database(os.path.join(directory, "test.db"))
+            dataframe = pd.DataFrame(
+                {
+                    "key": ["A", "A", "A", "B", "A"],
+                    "seed": [0, 0, 1, 0, 0],
+                    "time": [0.5, 1.0, 0.5, 0.5, 2.0],
+                    "coordinate": [3, 8, 3, 3, 20],
+                }
+            )
+            database.add_dataframe("fake_table", dataframe)
+
+            data = database.load(
+                "fake_table",
+                {"key": "A'; DROP TABLE fake_table; --", "seed": np.int16(0)},
+            )
+            self.assertTrue(data.empty)
+
+            data = database.load(
+                "fake_table",
+                {"key": "A", "seed": np.int16(0), "time": [0.5, 2.0]},
+                {"coordinate": (None, 10)},
+            )
+            self.assertEqual([0.5], list(data["time"]))
+
+            data = database.load("fake_table", ranges={"coordinate": (8, None)})
+            self.assertEqual([8, 20], list(data["coordinate"]))
+
+    def test_iter_groups_given_small_chunks_returns_complete_groups(self):
+        with tempfile.TemporaryDirectory() as directory:
+            database = Database(os.path.join(directory, "test.db"))
+            dataframe = pd.DataFrame(
+                {
+                    "key": ["A"] * 7,
+                    "seed": [1, 0, 0, 1, 0, 0, 1],
+                    "time": [0.5, 0.5, 1.0, 0.5, 0.5, 0.5, 1.0],
+                    "volume": [1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0],
+                }
+            )
+            database.add_dataframe("fake_table", dataframe)
+
+            chunks = list(database.iter_chunks("fake_table", {"key": "A"}, chunk_size=3))
+            self.assertEqual([3, 3, 1], [len(chunk) for chunk in chunks])
+
+            groups = list(
+                database.iter_groups(
+                    "fake_table", ["seed", "time"], chunk_size=2, table_spec=Simulation
+                )
+            )
+            self.assertEqual([(0, 0.5), (0, 1.0), (1, 0.5), (1, 1.0)], [key for key, _ in groups])
+            self.assertEqual([2.0, 5.0, 6.0], list(groups[0][1]["volume"]))
+            self.assertEqual([1.0, 4.0], list(groups[2][1]["volume"]))
+            self.assertEqual(np.float32, groups[0][1]["volume"].dtype)
+
+    def test_iter_groups_given_one_group_column_returns_tuple_keys_without_warning(self):
+        with tempfile.TemporaryDirectory() as directory:
+            database = Database(os.path.join(directory, "test.db"))
+            dataframe = pd.DataFrame({"time": [1.0, 0.5, 1.0], "volume": [1.0, 2.0, 3.0]})
+            database.add_dataframe("fake_table", dataframe)
+
+            with warnings.catch_warnings():
+                warnings.simplefilter("error", FutureWarning)
+                groups = list(database.iter_groups("fake_table", ["time"], chunk_size=2))
+
+            self.assertEqual([(0.5,), (1.0,)], [key for key, _ in groups])
+            self.assertEqual([1.0, 3.0], list(groups[1][1]["volume"]))
+
+    def test_merge_given_shards_copies_rows_in_shard_order(self):
+        with tempfile.TemporaryDirectory() as directory:
+            shard_files = [os.path.join(directory, f"shard_{i}.db") for i in range(3)]
+            frames = [
+                pd.DataFrame({"key": ["A"] * 2, "seed": [seed] * 2, "time": [0.5, 1.0]})
+                for seed in [0, 1]
+            ]
+            table_spec = mock.Mock()
+            table_spec.get_feature_list.return_value = [
+                Feature("key", "TEXT", False),
+                Feature("seed", "INTEGER", False),
+                Feature("time", "REAL", False),
+            ]
+            table_spec.get_index_list.return_value = [("key", "seed")]
+
+            for shard_file, frame in zip(shard_files[1:], frames):
+                shard = Database(shard_file)
+                shard.create_table("fake_table", table_spec)
+                shard.add_dataframe("fake_table", frame)
+
+            database = Database(os.path.join(directory, "test.db"))
+            with mock.patch.object(Database, "ATTACH_LIMIT", 2):
+                database.merge(shard_files, "fake_table", table_spec)
+
+            data = database.execute_query("SELECT * FROM fake_table;")
+            indexes = database.execute_query("SELECT name FROM sqlite_master WHERE type = 'index';")
+
+        pd.testing.assert_frame_equal(pd.concat(frames, ignore_index=True), data)
+        self.assertEqual(["fake_table_key_seed"], list(indexes["name"]))
+
+    def test_load_given_table_spec_reads_typed_columns(self):
+        with tempfile.TemporaryDirectory() as directory:
+            database = Database(os.path.join(directory, "test.db"))
+            database.create_table("stats", Analysis)
+            dataframe = pd.DataFrame(
+                {
+                    "comparison_group": ["simulation | punch_3"] * 3,
+                    "key": ["A"] * 3,
+                    "seed": [0, 0, 1],
+                    "reference_time": [1.0] * 3,
+                    "obervation_time": [1.0] * 3,
+                    "reference_key": ["simulation"] * 3,
+                    "obervation_key": ["punch_3"] * 3,
+                    "feature": ["volume", "population", "population"],
+                    "category": [None, "1", "2"],
+                    "pvalue": [0.5, np.nan, np.nan],
+                    "divergence": [np.nan, 0.25, 0.75],
+                }
+            )
+            database.add_dataframe("stats", dataframe)
+
+            data = database.load("stats", {"key": "A"}, table_spec=Analysis)
+            chunks = list(database.iter_chunks("stats", table_spec=Analysis, chunk_size=2))
+
+        self.assertEqual(np.int64, data["seed"].dtype)
+        self.assertEqual(np.float64, data["divergence"].dtype)
+        self.assertEqual([None, "1", "2"], list(data["category"]))
+        pd.testing.assert_frame_equal(dataframe, data)
+        pd.testing.assert_frame_equal(dataframe, pd.concat(chunks, ignore_index=True))
+
+    def test_load_given_table_spec_grows_arrays_without_counting_rows(self):
+        with tempfile.TemporaryDirectory() as directory:
+            database = Database(os.path.join(directory, "test.db"))
+            dataframe = pd.DataFrame({"key": ["A"] * 7, "seed": list(range(7)), "time": [1.0] * 7})
+            database.add_dataframe("simulations", dataframe)
+
+            queries = []
+            with mock.patch.object(DatabaseReader, "BATCH_SIZE", 2), database:
+                database.connection.set_trace_callback(queries.append)
+                data = database.load("simulations", table_spec=Simulation)
+                chunks = list(
+                    database.iter_chunks("simulations", table_spec=Simulation, chunk_size=5)
+                )
+
+        self.assertEqual(list(range(7)), list(data["seed"]))
+        self.assertEqual([5, 2], [len(chunk) for chunk in chunks])
+        self.assertEqual(list(range(7)), list(pd.concat(chunks)["seed"]))
+        self.assertFalse(any("COUNT" in query for query in queries))
+
+    def test_create_table_creates_indexes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            database = Database(os.path.join(directory, "test.db"))
+            database.create_table("simulations", Simulation)
+            database.create_table("stats", Analysis, create_indexes=False)
+
+            indexes = database.execute_query(
+                "SELECT tbl_name, name FROM sqlite_master WHERE type = 'index';"
+            )
+            plan = database.execute_query(
+                "EXPLAIN QUERY PLAN SELECT * FROM simulations WHERE key = 'A' AND seed = 0;"
+            )
+
+            self.assertEqual(["simulations"], list(indexes["tbl_name"]))
+            self.assertEqual(["simulations_key_seed_time_coordinate"], list(indexes["name"]))
+            self.assertIn("USING INDEX simulations_key_seed_time_coordinate", plan["detail"][0])
+
+            database.create_indexes("stats", Analysis)
+            indexes = database.execute_query(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'stats';"
+            )
+
+            self.assertEqual(2, len(indexes))
 
 
 if __name__ == "__main__":
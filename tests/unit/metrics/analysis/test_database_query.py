@@ -0,0 +1,109 @@
+import unittest
+from unittest import mock
+
+from metrics.analysis.analysis import Analysis
+from metrics.analysis.database_query import DatabaseQuery
+from metrics.feature.feature import Feature
+
+
+class TestDatabaseQuery(unittest.TestCase):
+    def test_make_select_query_given_invalid_name_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            DatabaseQuery.make_select_query("fake_table; DROP TABLE x", {"key": "y"})
+        with self.assertRaises(ValueError):
+            DatabaseQuery.make_select_query("fake_table", {"key = key OR 1": "y"})
+
+    def test_make_create_table_query_given_clustered_creates_query(self):
+        table_spec = mock.Mock()
+        table_spec.get_feature_list.return_value = [
+            Feature("key", "TEXT", False),
+            Feature("seed", "INTEGER", False),
+        ]
+        table_spec.get_primary_key.return_value = ("key", "seed")
+
+        query = DatabaseQuery.make_create_table_query("fake_table", table_spec, clustered=True)
+
+        self.assertEqual(
+            "CREATE TABLE IF NOT EXISTS fake_table "
+            "(key TEXT NOT NULL,seed INTEGER NOT NULL,PRIMARY KEY (key,seed)) WITHOUT ROWID;",
+            query,
+        )
+        with self.assertRaises(ValueError):
+            DatabaseQuery.make_create_table_query("fake_table", Analysis, clustered=True)
+
+    def test_make_create_index_queries_creates_queries(self):
+        table_spec = mock.Mock()
+        table_spec.get_index_list.return_value = [("key", "seed"), ("feature",)]
+
+        queries = DatabaseQuery.make_create_index_queries("fake_table", table_spec)
+
+        self.assertEqual(
+            [
+                "CREATE INDEX IF NOT EXISTS fake_table_key_seed ON fake_table (key,seed);",
+                "CREATE INDEX IF NOT EXISTS fake_table_feature ON fake_table (feature);",
+            ],
+            queries,
+        )
+
+        table_spec.get_primary_key.return_value = ("key", "seed", "time")
+        queries = DatabaseQuery.make_create_index_queries("fake_table", table_spec, clustered=True)
+
+        self.assertEqual(
+            ["CREATE INDEX IF NOT EXISTS fake_table_feature ON fake_table (feature);"], queries
+        )
+
+    def test_make_create_table_query_creates_query(self):
+        table_name = "fake_table"
+        feature_string = "seed integer NOT NULL"
+        feature_string2 = "x y z"
+
+        feature = mock.Mock(spec=Feature)
+        feature.make_query.return_value = feature_string
+        feature2 = mock.Mock(spec=Feature)
+        feature2.make_query.return_value = feature_string2
+
+        fake_object = mock.Mock()
+        fake_object.get_feature_list.return_value = [
+            feature,
+            feature2,
+        ]
+
+        expected = f"CREATE TABLE IF NOT EXISTS {table_name} ({feature_string},{feature_string2});"
+        found = DatabaseQuery.make_create_table_query(table_name, fake_object)
+        self.assertEqual(expected, found)
+
+    def test_make_select_query_returns_query(self):
+        table_name = "fake_table"
+        filters = {"key": "y", "seed": 0, "time": [0.5, 1.0]}
+        ranges = {"coordinate": (None, 10), "z": (-1, 1)}
+
+        expected = (
+            f"SELECT * FROM {table_name} WHERE key = ? AND seed = ? AND time IN (?,?) "
+            "AND coordinate <= ? AND z >= ? AND z <= ?;"
+        )
+        found = DatabaseQuery.make_select_query(table_name, filters, ranges)
+
+        self.assertEqual((expected, ["y", 0, 0.5, 1.0, 10, -1, 1]), found)
+        self.assertEqual(
+            (f"SELECT * FROM {table_name};", []), DatabaseQuery.make_select_query(table_name)
+        )
+
+    def test_make_select_query_given_columns_returns_projected_query(self):
+        query, parameters = DatabaseQuery.make_select_query(
+            "fake_table", {"key": "y"}, columns=["key", "volume"]
+        )
+
+        self.assertEqual("SELECT key, volume FROM fake_table WHERE key = ?;", query)
+        self.assertEqual(["y"], parameters)
+
+        with self.assertRaises(ValueError):
+            DatabaseQuery.make_select_query("fake_table", columns=["key", "volume; DROP TABLE x"])
+
+    def test_make_select_query_given_order_returns_ordered_query(self):
+        query, _ = DatabaseQuery.make_select_query("fake_table", order_by=["seed", "time"])
+
+        self.assertEqual("SELECT * FROM fake_table ORDER BY seed, time;", query)
+
+
+if __name__ == "__main__":
+    unittest.main()
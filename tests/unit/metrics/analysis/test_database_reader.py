@@ -0,0 +1,23 @@
+import unittest
+
+import numpy as np
+
+from metrics.analysis.database_reader import DatabaseReader
+from metrics.feature.feature import Feature
+
+
+class TestDatabaseReader(unittest.TestCase):
+    def test_get_affinity_dtype_returns_dtype(self):
+        self.assertEqual(
+            np.int64, DatabaseReader.get_affinity_dtype(Feature("a", "INTEGER", False))
+        )
+        self.assertEqual(
+            np.float64, DatabaseReader.get_affinity_dtype(Feature("a", "INTEGER", True))
+        )
+        self.assertEqual(np.float64, DatabaseReader.get_affinity_dtype(Feature("a", "REAL", False)))
+        self.assertEqual(object, DatabaseReader.get_affinity_dtype(Feature("a", "TEXT", False)))
+        self.assertEqual(object, DatabaseReader.get_affinity_dtype(None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+
+import pandas as pd
+
+from metrics.analysis.group_index import GroupIndex
+
+
+class TestGroupIndex(unittest.TestCase):
+    def setUp(self):
+        self.data = pd.DataFrame(
+            {
+                "key": ["B", "A", "A", "A", "A", "B"],
+                "time": [1.0, 2.0, 1.0, 1.0, 1.0, 1.0],
+                "seed": [0, 0, 1, 0, 0, 0],
+                "volume": [1.0, 2.0, 3.0, 4.0, 5.0, 6.0],
+            }
+        ).astype({"key": "category"})
+
+    def test_init_sorts_data_by_group_columns(self):
+        index = GroupIndex(self.data)
+
+        self.assertEqual([3, 4, 2, 1, 0, 5], list(index.data.index))
+        self.assertEqual(["A", "B"], index.children[()])
+        self.assertEqual([0, 1], index.children[("A", 1.0)])
+
+    def test_init_given_sorted_data_does_not_copy(self):
+        data = self.data.sort_values(["key", "time", "seed"], kind="stable")
+
+        self.assertIs(data, GroupIndex(data).data)
+
+    def test_get_group_returns_group_rows(self):
+        index = GroupIndex(self.data)
+
+        expected = self.data[(self.data["key"] == "A") & (self.data["time"] == 1.0)]
+        pd.testing.assert_frame_equal(
+            expected.sort_values("seed", kind="stable"), index.get_group("A", 1.0)
+        )
+
+        expected = self.data[
+            (self.data["key"] == "A") & (self.data["time"] == 1.0) & (self.data["seed"] == 0)
+        ]
+        pd.testing.assert_frame_equal(expected, index.get_group("A", 1.0, 0))
+
+    def test_get_group_given_missing_group_returns_empty_data(self):
+        index = GroupIndex(self.data)
+
+        group = index.get_group("C", 1.0)
+
+        self.assertTrue(group.empty)
+        self.assertEqual(list(self.data.columns), list(group.columns))
+
+    def test_iter_groups_returns_groups_of_next_column(self):
+        index = GroupIndex(self.data)
+
+        groups = list(index.iter_groups("A", 1.0))
+
+        self.assertEqual([0, 1], [seed for seed, _ in groups])
+        self.assertEqual([4.0, 5.0], list(groups[0][1]["volume"]))
+        self.assertEqual([3.0], list(groups[1][1]["volume"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -10,12 +10,12 @@ import numpy as np
 from metrics.feature.continuous_feature import ContinuousFeature
 from metrics.feature.discrete_feature import DiscreteFeature
 from metrics.analysis.simulation import Simulation
+from metrics.analysis.simulation_cache import SimulationCache
 
 
 class TestSimulation(unittest.TestCase):
     @mock.patch("builtins.open", new_callable=mock_open)
-    @mock.patch("metrics.analysis.simulation.json")
-    def test_init_sets_attributes_from_file_name(self, json_mock, open_mock):
+    def test_init_sets_attributes_from_file_name(self, open_mock):
         key = "TEST_FAKE_JSON"
         seed = 14
         extension = ".json"
@@ -23,7 +23,9 @@ class TestSimulation(unittest.TestCase):
         simulation_file = f"{path}/{key}_{seed:02}{extension}"
 
         simulation_contents = {"seed": seed, "timepoints": [], "config": {"size": {"radius": 34}}}
-        json_mock.load.return_value = simulation_contents
+        open_mock.return_value = mock_open(
+            read_data=json.dumps(simulation_contents).encode()
+        ).return_value
 
         simulation = Simulation(simulation_file)
 
@@ -33,8 +35,7 @@ class TestSimulation(unittest.TestCase):
         self.assertEqual(key, simulation.key)
 
     @mock.patch("builtins.open", new_callable=mock_open)
-    @mock.patch("metrics.analysis.simulation.json")
-    def test_init_sets_attributes_from_file_name_with_suffix(self, json_mock, open_mock):
+    def test_init_sets_attributes_from_file_name_with_suffix(self, open_mock):
         key = "TEST_FAKE_JSON"
         seed = 14
         suffix = ".PARAM"
@@ -43,7 +44,9 @@ class TestSimulation(unittest.TestCase):
         simulation_file = f"{path}/{key}_{seed:02}{suffix}{extension}"
 
         simulation_contents = {"seed": seed, "timepoints": [], "config": {"size": {"radius": 34}}}
-        json_mock.load.return_value = simulation_contents
+        open_mock.return_value = mock_open(
+            read_data=json.dumps(simulation_contents).encode()
+        ).return_value
 
         simulation = Simulation(simulation_file)
 
@@ -53,8 +56,7 @@ class TestSimulation(unittest.TestCase):
         self.assertEqual(key, simulation.key)
 
     @mock.patch("builtins.open", new_callable=mock_open)
-    @mock.patch("metrics.analysis.simulation.json")
-    def test_init_sets_attributes_from_data(self, json_mock, open_mock):
+    def test_init_sets_attributes_from_data(self, open_mock):
         seed = 14
         timepoints = [0.0, 0.5, 1.0]
         max_radius = 34
@@ -65,7 +67,9 @@ class TestSimulation(unittest.TestCase):
             "config": {"size": {"radius": max_radius}},
         }
 
-        json_mock.load.return_value = simulation_contents
+        open_mock.return_value = mock_open(
+            read_data=json.dumps(simulation_contents).encode()
+        ).return_value
         simulation = Simulation(simulation_file)
 
         self.assertCountEqual(timepoints, simulation.timepoints)
@@ -73,53 +77,123 @@ class TestSimulation(unittest.TestCase):
         self.assertEqual(max_radius, simulation.max_radius)
 
     @mock.patch("builtins.open", new_callable=mock_open)
-    @mock.patch("metrics.analysis.simulation.json")
-    def test_load_simulation_loads_existing_file(self, json_mock, open_mock):
+    def test_init_given_lazy_reads_header_on_first_access(self, open_mock):
+        seed = 14
+        timepoints = [0.0, 0.5, 1.0]
+        max_radius = 34
+        simulation_file = f"/path/to/file/SIMULATION_FILE_{seed:02}.json"
+        simulation_contents = {
+            "seed": seed,
+            "timepoints": [{"time": timepoint, "cells": []} for timepoint in timepoints],
+            "config": {"size": {"radius": max_radius}},
+        }
+
+        open_mock.return_value = mock_open(
+            read_data=json.dumps(simulation_contents).encode()
+        ).return_value
+        simulation = Simulation(simulation_file, lazy=True)
+
+        open_mock.assert_not_called()
+        self.assertEqual("SIMULATION_FILE", simulation.key)
+        self.assertEqual(seed, simulation.seed)
+        self.assertEqual(max_radius, simulation.max_radius)
+        self.assertCountEqual(timepoints, simulation.timepoints)
+        open_mock.assert_called_once_with(simulation.get_file_name(), "rb")
+
+    @mock.patch("builtins.open", new_callable=mock_open)
+    def test_load_simulation_loads_existing_file(self, open_mock):
         simulation_file = "/path/to/file/SIMULATION_FILE_00.json"
         simulation_contents = {"seed": 0, "timepoints": [], "config": {"size": {"radius": 34}}}
 
-        json_mock.load.return_value = simulation_contents
+        open_mock.side_effect = lambda *args, **kwargs: mock_open(
+            read_data=json.dumps(simulation_contents).encode()
+        ).return_value
         loaded_simulation = Simulation(simulation_file).load_simulation()
 
-        open_mock.assert_called_with(
-            "/path/to/file/SIMULATION_FILE/SIMULATION_FILE_00.json", "r", encoding="utf-8"
-        )
-        json_mock.load.assert_called_with(open_mock())
+        open_mock.assert_called_with("/path/to/file/SIMULATION_FILE/SIMULATION_FILE_00.json", "rb")
         self.assertDictEqual(simulation_contents, loaded_simulation)
 
     @mock.patch("builtins.open", new_callable=mock_open)
-    @mock.patch("metrics.analysis.simulation.json")
-    def test_load_simulation_loads_existing_file_with_suffix(self, json_mock, open_mock):
+    def test_load_simulation_loads_existing_file_with_suffix(self, open_mock):
         simulation_file = "/path/to/file/SIMULATION_FILE_00.json"
         param_file = "/path/to/file/SIMULATION_FILE_00.PARAM.json"
         simulation_contents = {"seed": 0, "timepoints": [], "config": {"size": {"radius": 34}}}
 
-        json_mock.load.return_value = simulation_contents
+        open_mock.side_effect = lambda *args, **kwargs: mock_open(
+            read_data=json.dumps(simulation_contents).encode()
+        ).return_value
         loaded_simulation = Simulation(simulation_file).load_simulation(suffix=".PARAM")
 
         open_mock.assert_called_with(
-            "/path/to/file/SIMULATION_FILE.PARAM/SIMULATION_FILE_00.PARAM.json",
-            "r",
-            encoding="utf-8",
+            "/path/to/file/SIMULATION_FILE.PARAM/SIMULATION_FILE_00.PARAM.json", "rb"
         )
-        json_mock.load.assert_called_with(open_mock())
         self.assertDictEqual(simulation_contents, loaded_simulation)
 
+    @mock.patch("metrics.analysis.simulation.SimulationReader")
+    def test_get_reader_given_archive_reads_member_from_archive(self, reader_mock):
+        reader_mock.return_value.read_header.return_value = {
+            "timepoints": [],
+            "config": {"size": {"radius": 34}},
+        }
+        archives = {".PARAM": ("/path/to/archive.tar.xz", "SIMULATION_FILE_00.PARAM.json")}
+        simulation = Simulation("/path/to/file/SIMULATION_FILE_00.json", archives)
+
+        simulation.get_reader(".PARAM")
+        reader_mock.assert_called_with(
+            "SIMULATION_FILE_00.PARAM.json",
+            archive_file="/path/to/archive.tar.xz",
+            decoder=simulation.decoder,
+        )
+
+        simulation.get_reader()
+        reader_mock.assert_called_with(
+            "/path/to/file/SIMULATION_FILE/SIMULATION_FILE_00.json", decoder=simulation.decoder
+        )
+
     def test_get_szudzik_pair_returns_correct_pairing_number(self):
         tests = [
             (0, 0, 0),
-            (1, 1, 4),
-            (2, 1, 11),
-            (2, 3, 20),
-            (3, 2, 23),
-            (-5, 4, 49),
-            (5, -4, 58.5),
-            (-6, -3, 68.5),
+            (1, 1, 8),
+            (2, 1, 22),
+            (2, 3, 40),
+            (3, 2, 46),
+            (-5, 4, 98),
+            (5, -4, 117),
+            (-6, -3, 137),
         ]
         for u_given, v_given, expected in tests:
             with self.subTest(u_given=u_given, v_given=v_given):
                 found = Simulation.get_szudzik_pair(u_given, v_given)
                 self.assertEqual(found, expected)
+                self.assertIsInstance(found, int)
+
+    def test_get_szudzik_pairs_returns_unique_exact_pairing_numbers(self):
+        u, v = np.meshgrid(np.arange(-50, 51), np.arange(-50, 51))
+        large_u = np.array([2**30, -(2**30), 2**30 - 1])
+        large_v = np.array([2**30 - 1, 2**30, -(2**30)])
+
+        found = Simulation.get_szudzik_pairs(u.ravel(), v.ravel())
+        found_large = Simulation.get_szudzik_pairs(large_u, large_v)
+
+        self.assertEqual(np.int64, found.dtype)
+        self.assertEqual(u.size, np.unique(found).size)
+        self.assertEqual(
+            [Simulation.get_szudzik_pair(a, b) for a, b in zip(u.ravel(), v.ravel())],
+            found.tolist(),
+        )
+        self.assertEqual(
+            [2**62 + 2**32 - 2, 2**62 + 2**31 - 1, 2**62 - 2**31 - 1],
+            found_large.tolist(),
+        )
+
+    def test_get_szudzik_unpairs_inverts_pairing(self):
+        u = np.array([0, 1, 2, -5, 5, -6, 2**30, -(2**30), 17])
+        v = np.array([0, 1, 3, 4, -4, -3, 2**30 - 1, 2**30, -(2**30)])
+
+        found_u, found_v = Simulation.get_szudzik_unpairs(Simulation.get_szudzik_pairs(u, v))
+
+        self.assertEqual(u.tolist(), found_u.tolist())
+        self.assertEqual(v.tolist(), found_v.tolist())
 
     @mock.patch("builtins.open")
     def test_parse_timepoint_given_one_location_one_cell_returns_dataframe(self, open_mock):
@@ -171,7 +245,7 @@ class TestSimulation(unittest.TestCase):
             ),
         }
         open_mock.side_effect = lambda fname, *args, **kwargs: mock_open(
-            read_data=mock_contents[fname]
+            read_data=mock_contents[fname].encode()
         ).return_value
 
         expected_dict = {
@@ -186,13 +260,13 @@ class TestSimulation(unittest.TestCase):
             "p": [0],
             "population": ["4"],
             "state": ["6"],
-            "volume": [2250],
+            "volume": [2250.0],
             "cycle": [float("nan")],
             "max_height": [max_height],
             "meta_pref": [meta_pref],
             "migra_threshold": [migra_threshold],
         }
-        expected_df = pd.DataFrame(expected_dict)
+        expected_df = Simulation.set_feature_dtypes(pd.DataFrame(expected_dict))
 
         returned_df = Simulation(simulation_file).parse_timepoint(time)
 
@@ -258,7 +332,7 @@ class TestSimulation(unittest.TestCase):
             ),
         }
         open_mock.side_effect = lambda fname, *args, **kwargs: mock_open(
-            read_data=mock_contents[fname]
+            read_data=mock_contents[fname].encode()
         ).return_value
 
         expected_dict = {
@@ -276,13 +350,13 @@ class TestSimulation(unittest.TestCase):
             "p": [1, 2],
             "population": ["0", "3"],
             "state": ["0", "1"],
-            "volume": [3200, 3000],
+            "volume": [3200.0, 3000.0],
             "cycle": [np.round(np.mean([1440, 1350])), np.round(np.mean([1300, 1460]))],
             "max_height": max_heights,
             "meta_pref": meta_prefs,
             "migra_threshold": migra_thresholds,
         }
-        expected_df = pd.DataFrame(expected_dict)
+        expected_df = Simulation.set_feature_dtypes(pd.DataFrame(expected_dict))
 
         returned_df = Simulation(simulation_file).parse_timepoint(timepoint=time)
 
@@ -355,7 +429,7 @@ class TestSimulation(unittest.TestCase):
         }
 
         open_mock.side_effect = lambda fname, *args, **kwargs: mock_open(
-            read_data=mock_contents[fname]
+            read_data=mock_contents[fname].encode()
         ).return_value
 
         expected_dict = {
@@ -370,23 +444,20 @@ class TestSimulation(unittest.TestCase):
             "p": [4, 0],
             "population": ["1", "0"],
             "state": ["3", "1"],
-            "volume": [3001, 2500],
+            "volume": [3001.0, 2500.0],
             "cycle": [np.round(np.mean([1320, 1440])), np.round(np.mean([1440]))],
             "max_height": max_heights,
             "meta_pref": meta_prefs,
             "migra_threshold": migra_thresholds,
         }
-        expected_df = pd.DataFrame(expected_dict)
+        expected_df = Simulation.set_feature_dtypes(pd.DataFrame(expected_dict))
 
         returned_df = Simulation(simulation_file).parse_timepoint(timepoint=time)
 
         self.assertTrue(expected_df.equals(returned_df))
 
     @mock.patch("builtins.open", new_callable=mock_open)
-    @mock.patch("metrics.analysis.simulation.json")
-    def test_parse_timepoint_given_nonexistent_timepoint_raises_value_error(
-        self, json_mock, open_mock
-    ):
+    def test_parse_timepoint_given_nonexistent_timepoint_raises_value_error(self, open_mock):
         seed = 0
         time = 1.0
         key = "SIMULATION_FILE"
@@ -395,11 +466,139 @@ class TestSimulation(unittest.TestCase):
             "config": {"size": {"radius": 34}},
             "timepoints": [{"time": time, "cells": [[]]}],
         }
-        json_mock.load.return_value = simulation_contents
+        open_mock.return_value = mock_open(
+            read_data=json.dumps(simulation_contents).encode()
+        ).return_value
 
         with self.assertRaises(ValueError):
             Simulation(f"/path/to/file/{key}_{seed:02}.json").parse_timepoint(timepoint=0.0)
 
+    @staticmethod
+    def mock_simulation_files(open_mock, times, param_times=None, param_values=None):
+        param_times = times if param_times is None else param_times
+        param_values = [None] * 10 if param_values is None else param_values
+
+        simulation_contents = {
+            "seed": 0,
+            "config": {"size": {"radius": 34}},
+            "timepoints": [
+                {
+                    "time": time,
+                    "cells": [[[3, 0, -3, 0], [[0, 4, 6, 0, 2250 + index, [1440]]]]],
+                }
+                for index, time in enumerate(times)
+            ],
+        }
+
+        simulation_param_contents = {
+            "seed": 0,
+            "config": {"size": {"radius": 34}},
+            "timepoints": [
+                {"time": time, "cells": [[[3, 0, -3, 0], [[0, 4, 6, 0, param_values]]]]}
+                for time in param_times
+            ],
+        }
+
+        mock_contents = {
+            "/path/to/file/SIMULATION_FILE/SIMULATION_FILE_00.json": json.dumps(
+                simulation_contents
+            ),
+            "/path/to/file/SIMULATION_FILE.PARAM/SIMULATION_FILE_00.PARAM.json": json.dumps(
+                simulation_param_contents
+            ),
+        }
+        open_mock.side_effect = lambda fname, *args, **kwargs: mock_open(
+            read_data=mock_contents[fname].encode()
+        ).return_value
+
+    @mock.patch("builtins.open")
+    def test_parse_timepoints_given_multiple_timepoints_loads_files_once(self, open_mock):
+        times = [0.0, 0.5]
+        param_values = [None] * 10
+        param_values[3] = 8.7
+        param_values[8] = 0.4
+        param_values[9] = 3.0
+        self.mock_simulation_files(open_mock, times, param_values=param_values)
+
+        simulation = Simulation("/path/to/file/SIMULATION_FILE_00.json")
+        open_mock.reset_mock()
+
+        returned_dfs = list(simulation.parse_timepoints(list(reversed(times))))
+
+        self.assertEqual(2, open_mock.call_count)
+        self.assertEqual([0.5, 0.0], [df["time"][0] for df in returned_dfs])
+        self.assertEqual([2251, 2250], [df["volume"][0] for df in returned_dfs])
+
+    @mock.patch("builtins.open")
+    def test_parse_timepoints_given_missing_param_timepoints_raises_value_error(self, open_mock):
+        self.mock_simulation_files(open_mock, [0.0, 0.5], param_times=[0.0])
+
+        simulation = Simulation("/path/to/file/SIMULATION_FILE_00.json")
+
+        with self.assertRaises(ValueError) as context:
+            list(simulation.parse_timepoints([0.0, 0.5]))
+
+        self.assertIn("SIMULATION_FILE_00.PARAM.json", str(context.exception))
+
+    @mock.patch("builtins.open")
+    def test_parse_timepoints_given_cached_timepoints_reads_only_missing(self, open_mock):
+        times = [0.0, 0.5]
+        self.mock_simulation_files(open_mock, times)
+
+        cached_df = pd.DataFrame({"time": [0.0]})
+        cache_mock = mock.Mock(spec=SimulationCache)
+        cache_mock.load.side_effect = lambda _, time: cached_df if time == 0.0 else None
+
+        simulation = Simulation("/path/to/file/SIMULATION_FILE_00.json", cache=cache_mock)
+        simulation.source_hash = "hash"
+
+        returned_dfs = list(simulation.parse_timepoints(times))
+        open_mock.reset_mock()
+        cached_dfs = list(simulation.parse_timepoints([0.0]))
+
+        self.assertTrue(cached_df.equals(returned_dfs[0]))
+        self.assertEqual([0.5], list(returned_dfs[1]["time"]))
+        cache_mock.save.assert_called_once_with("hash", 0.5, returned_dfs[1])
+        self.assertTrue(cached_df.equals(cached_dfs[0]))
+        open_mock.assert_not_called()
+
+    def test_set_feature_dtypes_converts_to_compact_dtypes(self):
+        dataframe = pd.DataFrame(
+            {
+                "key": ["A", "A"],
+                "u": [3, -34],
+                "z": [0, 1],
+                "population": ["4", "1"],
+                "volume": [2250.0, 1300.0],
+                "extra": [1, 2],
+            }
+        )
+
+        returned_df = Simulation.set_feature_dtypes(dataframe)
+
+        self.assertEqual("category", returned_df["key"].dtype)
+        self.assertEqual(np.int16, returned_df["u"].dtype)
+        self.assertEqual(np.int8, returned_df["z"].dtype)
+        self.assertEqual("category", returned_df["population"].dtype)
+        self.assertEqual(np.float32, returned_df["volume"].dtype)
+        self.assertEqual(np.int64, returned_df["extra"].dtype)
+        self.assertEqual([3, -34], list(returned_df["u"]))
+        self.assertEqual(["4", "1"], list(returned_df["population"]))
+
+    @mock.patch("builtins.open", new_callable=mock_open)
+    def test_parse_timepoints_given_nonexistent_timepoint_raises_value_error(self, open_mock):
+        simulation_contents = {
+            "seed": 0,
+            "config": {"size": {"radius": 34}},
+            "timepoints": [{"time": 1.0, "cells": [[]]}],
+        }
+        open_mock.return_value = mock_open(
+            read_data=json.dumps(simulation_contents).encode()
+        ).return_value
+
+        with self.assertRaises(ValueError):
+            Simulation("/path/to/file/SIMULATION_FILE_00.json").parse_timepoints([1.0, 0.0])
+
     def test_get_feature_object_given_nonexistent_feature_raises_value_error(self):
         with self.assertRaises(ValueError):
             Simulation.get_feature_object("nonexistent_feature")
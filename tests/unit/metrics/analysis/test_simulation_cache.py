@@ -0,0 +1,112 @@
+import os
+import tempfile
+import time
+
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from metrics.analysis.simulation_cache import SimulationCache
+
+
+class TestSimulationCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.directory.name, "cache")
+        self.dataframe = pd.DataFrame(
+            {
+                "key": np.array(["SIMULATION_FILE"] * 3, dtype=object),
+                "seed": np.array([0, 0, 0], dtype=np.int64),
+                "time": [0.5] * 3,
+                "population": np.array(["0", "3", "1"], dtype=object),
+                "cycle": [1440.0, float("nan"), 1300.0],
+            }
+        )
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_load_given_saved_timepoint_returns_equal_dataframe(self):
+        cache = SimulationCache(self.cache_path)
+        cache.save("hash", 0.5, self.dataframe)
+
+        loaded_df = cache.load("hash", 0.5)
+
+        self.assertTrue(self.dataframe.equals(loaded_df))
+        self.assertIsNone(cache.load("hash", 1.0))
+        self.assertIsNone(cache.load("other_hash", 0.5))
+
+    def test_hash_files_given_changed_metadata_returns_different_hash(self):
+        file_name = os.path.join(self.directory.name, "file.json")
+        with open(file_name, "wb") as file:
+            file.write(b"[1, 2]")
+        os.utime(file_name, ns=(0, 10**9))
+        first_hash = SimulationCache.hash_files([file_name])
+        member_hash = SimulationCache.hash_files([file_name], "member.json")
+
+        os.utime(file_name, ns=(0, 2 * 10**9))
+        second_hash = SimulationCache.hash_files([file_name])
+
+        self.assertNotEqual(first_hash, second_hash)
+        self.assertNotEqual(first_hash, member_hash)
+
+    def test_hash_files_given_hash_contents_returns_different_hash_for_same_metadata(self):
+        file_name = os.path.join(self.directory.name, "file.json")
+        with open(file_name, "wb") as file:
+            file.write(b"[1, 2]")
+        os.utime(file_name, ns=(0, 10**9))
+        first_hash = SimulationCache.hash_files([file_name])
+        first_contents_hash = SimulationCache.hash_files([file_name], hash_contents=True)
+
+        with open(file_name, "wb") as file:
+            file.write(b"[1, 3]")
+        os.utime(file_name, ns=(0, 10**9))
+
+        self.assertEqual(first_hash, SimulationCache.hash_files([file_name]))
+        self.assertNotEqual(
+            first_contents_hash, SimulationCache.hash_files([file_name], hash_contents=True)
+        )
+
+    def test_save_given_size_limit_evicts_least_recently_used_entries(self):
+        unlimited_cache = SimulationCache(self.cache_path)
+        unlimited_cache.save("hash", 0.0, self.dataframe)
+        entry_size = os.path.getsize(unlimited_cache.get_entry_path("hash", 0.0))
+
+        cache = SimulationCache(self.cache_path, int(entry_size * 2.5))
+        cache.save("hash", 1.0, self.dataframe)
+        os.utime(cache.get_entry_path("hash", 0.0), (time.time() - 20, time.time() - 20))
+        os.utime(cache.get_entry_path("hash", 1.0), (time.time() - 10, time.time() - 10))
+        cache.load("hash", 0.0)
+        cache.save("hash", 2.0, self.dataframe)
+
+        self.assertTrue(os.path.exists(cache.get_entry_path("hash", 0.0)))
+        self.assertFalse(os.path.exists(cache.get_entry_path("hash", 1.0)))
+        self.assertTrue(os.path.exists(cache.get_entry_path("hash", 2.0)))
+
+    def test_save_given_size_within_limit_walks_cache_once(self):
+        cache = SimulationCache(self.cache_path, 2**30)
+
+        with mock.patch("os.walk", wraps=os.walk) as walk_mock:
+            for timepoint in [0.0, 1.0, 2.0]:
+                cache.save("hash", timepoint, self.dataframe)
+            cache.save("hash", 0.0, self.dataframe)
+
+        entry_size = os.path.getsize(cache.get_entry_path("hash", 0.0))
+        self.assertEqual(1, walk_mock.call_count)
+        self.assertEqual(3 * entry_size, cache.total_size)
+
+    def test_save_given_evicted_directory_keeps_directory(self):
+        cache = SimulationCache(self.cache_path, 1)
+
+        cache.save("hash", 0.0, self.dataframe)
+        cache.save("hash", 1.0, self.dataframe)
+
+        self.assertTrue(os.path.isdir(os.path.join(self.cache_path, "hash")))
+        self.assertFalse(os.path.exists(cache.get_entry_path("hash", 1.0)))
+        self.assertEqual(0, cache.total_size)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import io
+import json
+import os
+import tempfile
+
+import unittest
+from unittest import mock
+
+from metrics.analysis.simulation_decoder import SimulationDecoder
+
+
+class TestSimulationDecoder(unittest.TestCase):
+    def setUp(self):
+        self.contents = {"seed": 0, "timepoints": [{"time": 0.5, "cells": [[[0, 0, 0, 0], []]]}]}
+        self.encoded = json.dumps(self.contents).encode()
+
+    def test_init_given_invalid_backend_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            SimulationDecoder("invalid_backend")
+
+    def test_decode_given_backend_returns_contents(self):
+        for backend in ["auto", "json", "orjson"]:
+            with self.subTest(backend=backend):
+                decoder = SimulationDecoder(backend)
+                self.assertDictEqual(self.contents, decoder.decode(self.encoded))
+                self.assertDictEqual(self.contents, decoder.decode(memoryview(self.encoded)))
+
+    @mock.patch("metrics.analysis.simulation_decoder.importlib.util.find_spec")
+    def test_get_backend_name_given_missing_backend_uses_json(self, find_spec_mock):
+        find_spec_mock.return_value = None
+
+        self.assertEqual("json", SimulationDecoder("auto").get_backend_name())
+        self.assertEqual("json", SimulationDecoder("orjson").get_backend_name())
+
+    def test_load_given_mmap_returns_contents_and_logs_time(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file_name = os.path.join(directory, "file.json")
+            with open(file_name, "wb") as json_file:
+                json_file.write(self.encoded)
+
+            for use_mmap in [True, False]:
+                decoder = SimulationDecoder("json", use_mmap)
+
+                with self.subTest(use_mmap=use_mmap), open(file_name, "rb") as json_file:
+                    with self.assertLogs("metrics.analysis.simulation_decoder", "INFO") as logs:
+                        loaded = decoder.load(json_file)
+
+                    self.assertDictEqual(self.contents, loaded)
+                    self.assertIn(f"{file_name} ({len(self.encoded)} bytes)", logs.output[0])
+
+    def test_load_given_stream_without_file_reads_bytes(self):
+        decoder = SimulationDecoder("json", use_mmap=True)
+
+        with self.assertLogs("metrics.analysis.simulation_decoder", "INFO") as logs:
+            loaded = decoder.load(io.BytesIO(self.encoded), "member.json")
+
+        self.assertDictEqual(self.contents, loaded)
+        self.assertIn("member.json", logs.output[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
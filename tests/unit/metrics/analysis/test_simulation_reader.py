@@ -0,0 +1,283 @@
+import io
+import json
+import os
+import tarfile
+import tempfile
+import tracemalloc
+
+import unittest
+from unittest.mock import mock_open
+from unittest import mock
+
+import numpy as np
+
+from metrics.analysis.simulation_decoder import SimulationDecoder
+from metrics.analysis.simulation_reader import SimulationReader, extract_cell_fields
+
+
+class TestSimulationReader(unittest.TestCase):
+    def setUp(self):
+        self.contents = {
+            "seed": 0,
+            "config": {"size": {"radius": 34}, "name": 'odd [{"name\\\\"},]'},
+            "timepoints": [
+                {"time": 0.0, "cells": [[[3, 0, -3, 0], [[0, 4, 6, 0, 2250.5, []]]]]},
+                {
+                    "time": 0.5,
+                    "cells": [
+                        [[5, 1, -6, 1], [[1, 0, 0, 1, 3200, [1440, 1350]]]],
+                        [[6, 1, -7, 1], [[1, 3, 1, 2, 3000, [1300, 1460]]]],
+                    ],
+                },
+                {"cells": [], "time": 1.0},
+            ],
+        }
+
+    def test_read_timepoints_given_no_index_returns_decoded_timepoints(self):
+        encoded = json.dumps(self.contents, indent=1).encode()
+
+        for chunk_size in [1, 2, 7, 64, 2**20]:
+            with self.subTest(chunk_size=chunk_size), mock.patch(
+                "builtins.open", mock_open(read_data=encoded)
+            ) as open_mock:
+                reader = SimulationReader("/path/to/file.json", chunk_size)
+                timepoints = list(reader.read_timepoints(range(3)))
+
+                open_mock.assert_called_with("/path/to/file.json", "rb")
+                self.assertEqual(list(enumerate(self.contents["timepoints"])), timepoints)
+
+    def test_read_header_excludes_cells(self):
+        encoded = json.dumps(self.contents).encode()
+        expected = {
+            "seed": 0,
+            "config": self.contents["config"],
+            "timepoints": [{"time": 0.0}, {"time": 0.5}, {"time": 1.0}],
+        }
+
+        for chunk_size in [3, 2**20]:
+            with self.subTest(chunk_size=chunk_size), mock.patch(
+                "builtins.open", mock_open(read_data=encoded)
+            ):
+                header = SimulationReader("/path/to/file.json", chunk_size).read_header()
+                self.assertDictEqual(expected, header)
+
+    def test_read_timepoints_given_archive_reads_member(self):
+        encoded = json.dumps(self.contents).encode()
+
+        with tempfile.TemporaryDirectory() as directory:
+            archive_file = os.path.join(directory, "archive.tar.xz")
+            with tarfile.open(archive_file, "w:xz") as archive:
+                for name, data in [("other.json", b"{}"), ("folder/file.json", encoded)]:
+                    info = tarfile.TarInfo(name)
+                    info.size = len(data)
+                    archive.addfile(info, io.BytesIO(data))
+
+            reader = SimulationReader("folder/file.json", 64, archive_file=archive_file)
+            timepoints = list(reader.read_timepoints(range(3)))
+            missing_reader = SimulationReader("missing.json", archive_file=archive_file)
+
+            self.assertEqual(list(enumerate(self.contents["timepoints"])), timepoints)
+            self.assertNotIn("file.json", os.listdir(directory))
+            self.assertNotIn("folder", os.listdir(directory))
+            with self.assertRaises(FileNotFoundError):
+                missing_reader.read_header()
+
+    def test_read_timepoints_given_file_uses_index(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file_name = os.path.join(directory, "file.json")
+            with open(file_name, "w", encoding="utf-8") as json_file:
+                json.dump(self.contents, json_file, indent=2)
+
+            reader = SimulationReader(file_name, 8)
+            timepoints = list(reader.read_timepoints([2, 0, 2]))
+
+            with open(reader.get_index_file(), "r", encoding="utf-8") as index_file:
+                index = json.load(index_file)
+
+            with open(file_name, "rb") as json_file:
+                contents = json_file.read()
+                for (start, end), timepoint in zip(index["offsets"], self.contents["timepoints"]):
+                    self.assertEqual(timepoint, json.loads(contents[start:end]))
+
+            self.assertEqual(
+                [(0, self.contents["timepoints"][0]), (2, self.contents["timepoints"][2])],
+                timepoints,
+            )
+            self.assertEqual(
+                [{"time": 0.0}, {"time": 0.5}, {"time": 1.0}], index["header"]["timepoints"]
+            )
+
+    def test_read_timepoints_given_no_index_reads_file_once(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file_name = os.path.join(directory, "file.json")
+            with open(file_name, "w", encoding="utf-8") as json_file:
+                json.dump(self.contents, json_file)
+
+            reader = SimulationReader(file_name, 8)
+            with mock.patch.object(reader, "open_file", wraps=reader.open_file) as open_mock:
+                timepoints = list(reader.read_timepoints([1, 0]))
+                header = reader.read_header()
+
+            self.assertEqual(1, open_mock.call_count)
+            self.assertEqual(list(enumerate(self.contents["timepoints"]))[:2], timepoints)
+            self.assertEqual([{"time": 0.0}, {"time": 0.5}, {"time": 1.0}], header["timepoints"])
+            self.assertIsNotNone(reader.load_index())
+
+    def test_read_timepoints_given_stale_index_rebuilds_index(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file_name = os.path.join(directory, "file.json")
+            with open(file_name, "w", encoding="utf-8") as json_file:
+                json.dump(self.contents, json_file)
+
+            reader = SimulationReader(file_name)
+            reader.read_header()
+
+            self.contents["timepoints"][1]["time"] = 0.75
+            with open(file_name, "w", encoding="utf-8") as json_file:
+                json.dump(self.contents, json_file, indent=4)
+
+            timepoints = list(reader.read_timepoints([1]))
+            header = reader.read_header()
+
+            self.assertEqual([(1, self.contents["timepoints"][1])], timepoints)
+            self.assertEqual(0.75, header["timepoints"][1]["time"])
+
+    def test_read_timepoints_given_mmap_decoder_reads_mapped_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file_name = os.path.join(directory, "file.json")
+            with open(file_name, "w", encoding="utf-8") as json_file:
+                json.dump(self.contents, json_file, indent=2)
+
+            reader = SimulationReader(file_name, decoder=SimulationDecoder("json", use_mmap=True))
+            reader.read_header()
+
+            with mock.patch.object(
+                SimulationDecoder, "map_stream", wraps=SimulationDecoder.map_stream
+            ) as map_mock:
+                timepoints = list(reader.read_timepoints([2, 0]))
+                partial_timepoints = reader.read_timepoints([0, 1])
+                first_timepoint = next(partial_timepoints)
+                partial_timepoints.close()
+
+            self.assertEqual(2, map_mock.call_count)
+            self.assertEqual(
+                [(0, self.contents["timepoints"][0]), (2, self.contents["timepoints"][2])],
+                timepoints,
+            )
+            self.assertEqual((0, self.contents["timepoints"][0]), first_timepoint)
+
+    def test_read_timepoints_given_archive_uses_index(self):
+        encoded = json.dumps(self.contents).encode()
+
+        with tempfile.TemporaryDirectory() as directory:
+            archive_file = os.path.join(directory, "archive.tar.xz")
+            with tarfile.open(archive_file, "w:xz") as archive:
+                info = tarfile.TarInfo("folder/file.json")
+                info.size = len(encoded)
+                archive.addfile(info, io.BytesIO(encoded))
+
+            reader = SimulationReader("folder/file.json", 16, archive_file=archive_file)
+            timepoints = list(reader.read_timepoints([1, 2]))
+
+            self.assertEqual(list(enumerate(self.contents["timepoints"]))[1:], timepoints)
+            self.assertTrue(os.path.isfile(f"{archive_file}.file.json.index.json"))
+
+    def test_read_cell_fields_returns_selected_fields(self):
+        param_contents = {
+            "seed": 0,
+            "timepoints": [
+                {"time": 0.0, "cells": []},
+                {
+                    "cells": [
+                        [[5, 1, -6, 1], [[1, 0, 0, 1, [0.5, None, 3, 1e-3]]]],
+                        [
+                            [6, 1, -7, 1],
+                            [[1, 3, 1, 2, [2, 4.5, [1, 2], -7]], [1, 3, 1, 2, [8, 0, 0, None]]],
+                        ],
+                    ],
+                    "time": 0.5,
+                },
+            ],
+        }
+        expected = np.array([[1e-3, 0.5, np.nan], [-7, 2, 4.5], [np.nan, 8, 0]])
+
+        for indent in [None, 2]:
+            encoded = json.dumps(param_contents, indent=indent).encode()
+
+            with self.subTest(indent=indent), mock.patch(
+                "builtins.open", mock_open(read_data=encoded)
+            ):
+                fields = list(
+                    SimulationReader("/path/to/file.json").read_cell_fields([0, 1], [3, 0, 1])
+                )
+
+            self.assertEqual((0, 3), fields[0][1].shape)
+            self.assertEqual(1, fields[1][0])
+            np.testing.assert_array_equal(expected, fields[1][1])
+
+    def test_extract_cell_fields_given_chunk_sizes_returns_same_fields(self):
+        cells = [
+            [[5, 1, -6, 1], [[1, 0, 0, 1, [0.5, None, 3, 1e-3]]]],
+            [[6, 1, -7, 1], [[[1], 3, 1, 2, [2, 4.5, [1, 2], -7]], [1, 3, 1, 2, [8, 0, 0, None]]]],
+        ]
+        timepoint = json.dumps({"time": 0.5, "cells": cells}, indent=1).encode()
+        expected = np.array([[1e-3, 0.5, np.nan], [-7, 2, 4.5], [np.nan, 8, 0]])
+
+        for chunk_size in [1, 2, 7, 64, 2**20]:
+            with self.subTest(chunk_size=chunk_size):
+                fields = extract_cell_fields(timepoint, [3, 0, 1], chunk_size)
+                np.testing.assert_array_equal(expected, fields)
+
+    def test_extract_cell_fields_allocates_less_than_json_decoding(self):
+        cells = [
+            [[i, -i, 0, 0], [[j, 1, 2, j, [i + k / 8 for k in range(12)]] for j in range(3)]]
+            for i in range(2000)
+        ]
+        timepoint = json.dumps({"time": 0.5, "cells": cells}).encode()
+
+        tracemalloc.start()
+        try:
+            fields = extract_cell_fields(timepoint, [3, 8, 9], 2**14)
+            _, extract_peak = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            decoded = json.loads(timepoint)
+            _, decode_peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        expected = [cell[4][3] for _, location_cells in decoded["cells"] for cell in location_cells]
+        np.testing.assert_array_equal(expected, fields[:, 0])
+        self.assertLess(extract_peak, decode_peak / 2)
+
+    def test_extract_cell_fields_given_missing_field_raises_value_error(self):
+        timepoint = b'{"time": 0.0, "cells": [[[0, 0, 0, 0], [[1, 0, 0, 1, [0.5, 1.5]]]]]}'
+
+        np.testing.assert_array_equal([[1.5, 0.5]], extract_cell_fields(timepoint, [1, 0]))
+        with self.assertRaises(ValueError):
+            extract_cell_fields(timepoint, [2])
+
+    def test_extract_cell_fields_given_other_nested_lists_reads_parameter_field(self):
+        cells = [[[0, 0, 0, 0], [[[7, 8], 0, 0, 1, [0.5, 1.5], [9, 9]]]]]
+        timepoint = json.dumps({"cells": cells}).encode()
+        quoted_cells = [[[0, 0, 0, 0], [[["a", "b"], 0, 0, 1, [0.5, 1.5], [9, 9]]]]]
+        quoted_timepoint = json.dumps({"cells": quoted_cells}).encode()
+
+        np.testing.assert_array_equal([[1.5, 0.5]], extract_cell_fields(timepoint, [1, 0]))
+        np.testing.assert_array_equal([[1.5, 0.5]], extract_cell_fields(quoted_timepoint, [1, 0]))
+
+    def test_extract_cell_fields_given_no_parameter_list_raises_value_error(self):
+        timepoint = b'{"cells": [[[0, 0, 0, 0], [[1, [0.5, 1.5], 0, 1, 2]]]]}'
+
+        with self.assertRaises(ValueError):
+            extract_cell_fields(timepoint, [0])
+
+    def test_read_timepoints_given_truncated_file_raises_value_error(self):
+        encoded = json.dumps(self.contents).encode()[:-10]
+
+        with mock.patch("builtins.open", mock_open(read_data=encoded)):
+            with self.assertRaises(ValueError):
+                list(SimulationReader("/path/to/file.json", 16).read_timepoints(range(3)))
+
+
+if __name__ == "__main__":
+    unittest.main()
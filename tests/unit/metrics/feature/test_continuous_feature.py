@@ -129,6 +129,45 @@ class TestContinuousFeature(unittest.TestCase):
 
         self.assertEqual(output_list, expected_list)
 
+    def test_write_grouped_feature_data_matches_write_feature_data(self):
+        feature_name = "feature_name"
+        continuous_feature = ContinuousFeature(feature_name, "REAL", False)
+
+        sample_groups = [
+            [3001.0, 2500.0, 2600.0],
+            [2600.0, np.nan, 2400.0, 2600.0],
+            [3050.0],
+            [np.nan, np.nan],
+        ]
+        reference_groups = [
+            [3002.0, 2400.0, 2900.0, 2600.0, 2500.0],
+            [2550.0, 2600.0, np.nan, 2650.0],
+            [3050.0, 2550.0, 2650.0],
+            [2500.0, 2600.0],
+        ]
+        data_lists = [["col1", seed] for seed in range(len(sample_groups))]
+
+        expected_list = []
+        for data_list, sample, reference in zip(data_lists, sample_groups, reference_groups):
+            expected_list.extend(
+                continuous_feature.write_feature_data(
+                    data_list,
+                    pd.DataFrame({feature_name: sample}),
+                    pd.DataFrame({feature_name: reference}),
+                )
+            )
+
+        output_list = continuous_feature.write_grouped_feature_data(
+            data_lists,
+            np.concatenate(sample_groups),
+            np.cumsum([0] + [len(sample) for sample in sample_groups]),
+            np.concatenate(reference_groups),
+            np.cumsum([0] + [len(reference) for reference in reference_groups]),
+        )
+
+        self.assertTrue(pd.DataFrame(expected_list).equals(pd.DataFrame(output_list)))
+        self.assertTrue(math.isnan(output_list[3][3]))
+
 
 if __name__ == "__main__":
     unittest.main()
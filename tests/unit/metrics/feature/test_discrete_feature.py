@@ -1,6 +1,7 @@
 import unittest
 import math
 
+import numpy as np
 import pandas as pd
 
 from metrics.feature.discrete_feature import DiscreteFeature
@@ -147,6 +148,34 @@ class TestDiscreteFeature(unittest.TestCase):
 
         self.assertEqual(output_list, expected_list)
 
+    def test_write_grouped_feature_data_matches_write_feature_data(self):
+        feature_name = "population"
+        discrete_feature = DiscreteFeature(feature_name, "TEXT", False)
+
+        sample_groups = [["0", "0", "1", "1"], ["2", "1"], ["0"]]
+        reference_groups = [["0", "0", "0", "1", "1", "1"], ["1", "0", "1"], ["2", "2"]]
+        data_lists = [["col1", seed] for seed in range(len(sample_groups))]
+
+        expected_list = []
+        for data_list, sample, reference in zip(data_lists, sample_groups, reference_groups):
+            expected_list.extend(
+                discrete_feature.write_feature_data(
+                    data_list,
+                    pd.DataFrame({feature_name: sample}),
+                    pd.DataFrame({feature_name: reference}),
+                )
+            )
+
+        output_list = discrete_feature.write_grouped_feature_data(
+            data_lists,
+            np.concatenate(sample_groups).astype(object),
+            np.cumsum([0] + [len(sample) for sample in sample_groups]),
+            np.concatenate(reference_groups).astype(object),
+            np.cumsum([0] + [len(reference) for reference in reference_groups]),
+        )
+
+        self.assertTrue(pd.DataFrame(expected_list).equals(pd.DataFrame(output_list)))
+
 
 if __name__ == "__main__":
     unittest.main()
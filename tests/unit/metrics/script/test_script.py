@@ -76,7 +76,7 @@ class ScriptTests(unittest.TestCase):
         # Insert test data into the database
         comparison = {"reference": "simulation", "observation": "punch_10"}
 
-        db_mock.execute_query.return_value = pd.DataFrame(
+        db_mock.load.return_value = pd.DataFrame(
             {
                 "comparison_group": [
                     "simulation | punch_10",
@@ -89,7 +89,7 @@ class ScriptTests(unittest.TestCase):
                 "reference_key": ["simulation"] * 2,
                 "obervation_key": ["punch-R10-(0, 0, 0)"] * 2,
                 "feature": ["feature_name"] * 2,
-                "category": ["NULL"] * 2,
+                "category": [None] * 2,
                 "pvalue": [1.0, 1.0],
                 "divergence": [2.0, 2.0],
             }
@@ -120,7 +120,7 @@ class ScriptTests(unittest.TestCase):
                 "reference_key": ["simulation"] * 2,
                 "obervation_key": ["punch-R10-(0, 0, 0)"] * 2,
                 "feature": ["feature_name"] * 2,
-                "category": ["NULL"] * 2,
+                "category": [None] * 2,
                 "pvalue": [1.0, 1.0],
                 "divergence": [2.0, 2.0],
                 "context": ["test_context"] * 2,
@@ -130,6 +130,16 @@ class ScriptTests(unittest.TestCase):
         )
         print(selected_data)
         pd.testing.assert_frame_equal(selected_data, expected_data)
+        db_mock.load.assert_called_with(
+            "stats",
+            {
+                "reference_time": 8.0,
+                "obervation_time": 8.0,
+                "feature": "feature_name",
+                "comparison_group": "simulation | punch_10",
+            },
+            table_spec=Analysis,
+        )
 
     def test_find_unique_variables(self):
         data = pd.DataFrame({"category": ["A", "B", "C", "C"], "value": [1, 2, 3, 4]})